@@ -1,13 +1,66 @@
+import io
 
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin
+from django.core.exceptions import PermissionDenied
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+
+from .bulk_import import PROFILE_FIELDS, ImportFormatError, UserImporter, read_csv
 from .models import User
 
+# Rejected rows shown on the import page; the command can write them all to a file
+SHOWN_IMPORT_ERRORS = 100
+
+
+class UserImportForm(forms.Form):
+    csv_file = forms.FileField(label='CSV file')
+
+
 class CustomUserAdmin(UserAdmin):
     list_display = ('username','email','first_name','last_name','role','is_verified')
     fieldsets = UserAdmin.fieldsets + (
         ('MediCare Info', {'fields': ('role','phone','specialization','experience',
                                      'consultation_fee','bio','rating','blood_group','is_verified')}),
+        ('Working Hours', {'fields': ('work_start','work_end','slot_minutes','working_days')}),
     )
 
+    def get_urls(self):
+        return [
+            path('import/', self.admin_site.admin_view(self.import_users),
+                 name=f'{self.opts.app_label}_{self.opts.model_name}_import'),
+            *super().get_urls(),
+        ]
+
+    def import_users(self, request):
+        """Upload a CSV of users; the same import as `manage.py import_users`."""
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+        form = UserImportForm(request.POST or None, request.FILES or None)
+        errors = []
+        if form.is_valid():
+            upload = io.TextIOWrapper(form.cleaned_data['csv_file'].file, encoding='utf-8-sig', newline='')
+            try:
+                result = UserImporter().run(read_csv(upload))
+            except ImportFormatError as exc:
+                form.add_error('csv_file', str(exc))
+            else:
+                errors = result.error_lines()
+                self.message_user(request, f"Created {result.created} users; {len(result.errors)} rows rejected.",
+                                  messages.WARNING if result.errors else messages.SUCCESS)
+                if not errors:
+                    return redirect(f'admin:{self.opts.app_label}_{self.opts.model_name}_changelist')
+        return TemplateResponse(request, 'admin/accounts/user/import_users.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.opts,
+            'title': 'Import users',
+            'form': form,
+            'optional_columns': ['role', 'specialization', 'experience', 'consultation_fee', 'address',
+                                 'phone', 'bio', 'age', *PROFILE_FIELDS],
+            'errors': errors[:SHOWN_IMPORT_ERRORS],
+            'more_errors': max(0, len(errors) - SHOWN_IMPORT_ERRORS),
+        })
+
 admin.site.register(User, CustomUserAdmin)
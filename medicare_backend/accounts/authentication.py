@@ -0,0 +1,149 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import router
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+User = get_user_model()
+
+# Claims CustomTokenObtainPairSerializer.get_token adds, as User fields
+CLAIM_FIELDS = ('username', 'email', 'role', 'is_verified')
+VERSION_CLAIM = 'ver'
+
+
+def version_key(user_id):
+    return f'auth:token_version:{user_id}'
+
+
+def publish_token_version(user):
+    """
+    Record a bumped token_version where every process checks it. Tokens only
+    live ACCESS_TOKEN_LIFETIME, so the key can expire after that.
+    """
+    timeout = settings.SIMPLE_JWT['ACCESS_TOKEN_LIFETIME'].total_seconds()
+    cache.set(version_key(user.pk), user.token_version, timeout=timeout)
+
+
+def current_token_version(user_id):
+    """
+    The user's token_version as published, or read from the database when the
+    cache doesn't have it (expired, evicted, or another process's LocMemCache)
+    and published from there. None if the user no longer exists.
+    """
+    version = cache.get(version_key(user_id))
+    if version is None:
+        # The primary: a lagging replica could still have the version a revocation replaced
+        users = User.objects.using(router.db_for_write(User))
+        version = users.filter(pk=user_id).values_list('token_version', flat=True).first()
+        if version is not None:
+            # add(), not set(): a bump published meanwhile must win over this read
+            timeout = settings.SIMPLE_JWT['ACCESS_TOKEN_LIFETIME'].total_seconds()
+            cache.add(version_key(user_id), version, timeout=timeout)
+    return version
+
+
+class UserCache:
+    """
+    Per-process LRU of User rows with a short TTL. It stores field values, not
+    instances, so every hit is a fresh User that a request may modify freely.
+    Entries are dropped on save/delete in this process (accounts/signals.py);
+    other processes see the change once their entry expires.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize, self.ttl = maxsize, ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # pk -> (expires, field names, values)
+
+    def get(self, pk):
+        with self.lock:
+            entry = self.entries.get(pk)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self.entries[pk]
+                return None
+            self.entries.move_to_end(pk)
+        return User.from_db('default', entry[1], entry[2])
+
+    def put(self, user):
+        names = [field.attname for field in User._meta.concrete_fields]
+        values = [getattr(user, name) for name in names]
+        with self.lock:
+            self.entries[user.pk] = (time.monotonic() + self.ttl, names, values)
+            self.entries.move_to_end(user.pk)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def discard(self, pk):
+        with self.lock:
+            self.entries.pop(pk, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+user_cache = UserCache(settings.AUTH_USER_CACHE_SIZE, settings.AUTH_USER_CACHE_TTL)
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication without a user query on most requests.
+
+    GET/HEAD/OPTIONS get a User built from the token claims (id, username,
+    email, role, is_verified); any other field is loaded from the database on
+    first access, so a view reading more than the claims is still correct,
+    just not free. Writes get the full row from the per-process UserCache.
+
+    Changing a user's role, verification or active flag bumps
+    User.token_version; tokens carrying an older 'ver' claim are rejected.
+    The version is checked against the cache, falling back to the database on
+    a miss, so revocation doesn't depend on the cache being shared or keeping
+    its entries. Tokens issued before the claim existed take the stock
+    database path.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            # simplejwt writes the id claim as a string
+            user_id = User._meta.pk.to_python(validated_token[api_settings.USER_ID_CLAIM])
+        except (KeyError, ValidationError):
+            raise InvalidToken('Token contained no recognizable user identification')
+        if any(name not in validated_token for name in (VERSION_CLAIM, *CLAIM_FIELDS)):
+            return super().get_user(validated_token)
+
+        version = validated_token[VERSION_CLAIM]
+        current = current_token_version(user_id)
+        if current is None:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+        if version < current:
+            raise AuthenticationFailed('Token has been revoked', code='token_revoked')
+        if self.request_is_safe:
+            return self.claims_user(user_id, validated_token)
+
+        user = user_cache.get(user_id)
+        if user is None or user.token_version < version:  # missing, or older than the token
+            user = super().get_user(validated_token)
+            user_cache.put(user)
+        if not user.is_active or version < user.token_version:
+            raise AuthenticationFailed('Token has been revoked', code='token_revoked')
+        return user
+
+    def claims_user(self, user_id, token):
+        known = {'id': user_id, 'is_active': True, 'token_version': token[VERSION_CLAIM],
+                 **{name: token[name] for name in CLAIM_FIELDS}}
+        # from_db() wants the values in model field order
+        names = [field.attname for field in User._meta.concrete_fields if field.attname in known]
+        return User.from_db('default', names, [known[name] for name in names])
+
+    def authenticate(self, request):
+        self.request_is_safe = request.method in ('GET', 'HEAD', 'OPTIONS')
+        return super().authenticate(request)
@@ -0,0 +1,46 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.db.models import Q
+
+from .models import EMAIL_KEY
+
+User = get_user_model()
+
+
+def find_login_user(identifier):
+    """
+    The user whose username or (case-insensitive) email is `identifier`, in one
+    query over the username and 'unique_user_email_ci' indexes. An exact
+    username match wins if the two point at different users.
+    """
+    candidates = (
+        User.objects.alias(email_key=EMAIL_KEY)
+        .filter(Q(username=identifier) | Q(email_key=identifier.lower()))[:2]
+    )
+    return min(candidates, key=lambda user: user.username != identifier, default=None)
+
+
+def email_in_use(email, exclude=None):
+    """Same case-insensitive test as the 'unique_user_email_ci' constraint."""
+    users = User.objects.alias(email_key=EMAIL_KEY).filter(email_key=email.lower())
+    if exclude is not None:
+        users = users.exclude(pk=exclude.pk)
+    return bool(email) and users.exists()
+
+
+class EmailOrUsernameBackend(ModelBackend):
+    """Log in with either the username or the email address (the frontend sends email)."""
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        user = find_login_user(username)
+        if user is None:
+            # Hash anyway so unknown accounts take as long as wrong passwords
+            User().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
@@ -0,0 +1,191 @@
+"""
+Bulk user import from CSV, for onboarding a hospital group's doctors (or a
+practice's patients) at once.
+
+Registering through RegisterSerializer costs an email query, a password hash
+and an INSERT per user. Here rows are validated a batch at a time (one query
+checks every email in the batch), passwords are hashed in worker processes
+while the previous batch is written, and each batch is written with
+bulk_create in its own transaction: users, then the patients'
+PatientProfile rows. A row that fails is reported by line number and skipped;
+the rest of the file still imports.
+
+Imported users are what registration creates (username = email, doctors not
+yet verified), so the doctor directory and search index need no update.
+"""
+import csv
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import get_hasher
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from rest_framework import serializers
+
+from api.models import PatientProfile
+from .authentication import user_cache, version_key
+from .hashing import hash_passwords, hash_pool
+from .models import EMAIL_KEY
+from .serializers import EMAIL_TAKEN, RegisterSerializer
+
+User = get_user_model()
+
+REQUIRED_COLUMNS = ('email', 'password', 'first_name', 'last_name')
+PROFILE_FIELDS = ['date_of_birth', 'blood_group', 'allergies', 'medical_history']
+
+
+class ImportFormatError(ValueError):
+    """The file as a whole can't be imported (not CSV, required columns missing)."""
+
+
+class ImportRowSerializer(RegisterSerializer):
+    """RegisterSerializer's checks for one row, without its per-row email query, plus the patient profile."""
+    date_of_birth = serializers.DateField(required=False)
+    blood_group = serializers.CharField(max_length=5, required=False)
+    allergies = serializers.CharField(required=False)
+    medical_history = serializers.CharField(required=False)
+
+    class Meta(RegisterSerializer.Meta):
+        fields = RegisterSerializer.Meta.fields + PROFILE_FIELDS
+
+    def validate_email(self, value):
+        return value  # UserImporter.validate checks the whole batch in one query
+
+
+def read_csv(handle):
+    """(line number, row) for every data line; blank cells are left out so they take the defaults."""
+    reader = csv.DictReader(handle)
+    try:
+        columns = set(reader.fieldnames or ())
+    except (csv.Error, UnicodeDecodeError) as exc:
+        raise ImportFormatError(f"Not a readable CSV file: {exc}") from exc
+    missing = [column for column in REQUIRED_COLUMNS if column not in columns]
+    if missing:
+        raise ImportFormatError(f"Missing column(s): {', '.join(missing)}.")
+    try:
+        for row in reader:
+            yield reader.line_num, {key: value.strip() for key, value in row.items()
+                                    if key and isinstance(value, str) and value.strip()}
+    except (csv.Error, UnicodeDecodeError) as exc:
+        raise ImportFormatError(f"Unreadable after line {reader.line_num}: {exc}") from exc
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.errors = []  # [(line number, {field: [messages]})], in file order per batch
+
+    def error_lines(self):
+        """One 'line N: field: message' string per problem."""
+        return [f"line {line}: {name}: {message}"
+                for line, fields in self.errors for name, messages in fields.items() for message in messages]
+
+
+class UserImporter:
+    def __init__(self, batch_size=1000, workers=None):
+        self.batch_size = batch_size
+        self.workers = workers
+        self.hasher = get_hasher()  # settings.PASSWORD_HASHERS[0], as make_password uses
+        # One instance for every row, as a ListSerializer validates with its child
+        self.serializer = ImportRowSerializer()
+
+    def run(self, rows):
+        """Import (line number, row) pairs, e.g. from read_csv(). Returns an ImportResult."""
+        self.result = ImportResult()
+        self.seen = set()  # lowercased emails of earlier rows in this file
+        rows = iter(rows)
+        pool = hash_pool(self.workers)
+        try:
+            pending = None
+            # Batch N hashes in the pool while batch N-1 is written
+            while batch := list(islice(rows, self.batch_size)):
+                valid = self.validate(batch)
+                hashing = hash_passwords(self.hasher, [row['password'] for _, row in valid], pool)
+                if pending:
+                    self.save(*pending)
+                pending = valid, hashing
+            if pending:
+                self.save(*pending)
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+        return self.result
+
+    def validate(self, batch):
+        """The rows of `batch` that can be created, as (line, validated data); the rest become errors."""
+        valid = []
+        for line, row in batch:
+            try:
+                valid.append((line, self.serializer.run_validation(row)))
+            except serializers.ValidationError as exc:
+                self.result.errors.append((line, {name: [str(message) for message in messages]
+                                                  for name, messages in exc.detail.items()}))
+
+        taken = self.taken([data['email'] for _, data in valid])
+        available = []
+        for line, data in valid:
+            key = data['email'].lower()
+            if key in taken or key in self.seen:
+                self.result.errors.append((line, {'email': [EMAIL_TAKEN]}))
+                continue
+            self.seen.add(key)
+            available.append((line, data))
+        return available
+
+    def taken(self, emails):
+        """Lowercased `emails` some user already has as email (any case) or username."""
+        if not emails:
+            return set()
+        users = (User.objects.alias(email_key=EMAIL_KEY)
+                 .filter(Q(email_key__in=[email.lower() for email in emails]) | Q(username__in=emails))
+                 .values_list('email', 'username'))
+        return {value.lower() for pair in users for value in pair if value}
+
+    def save(self, rows, passwords):
+        passwords = list(passwords)  # waits for the pool
+        if not rows:
+            return
+        try:
+            with transaction.atomic():
+                self.insert(rows, passwords)
+            self.result.created += len(rows)
+        except IntegrityError:
+            # Someone registered one of these emails since validate(): find it row by row
+            for row, password in zip(rows, passwords):
+                try:
+                    with transaction.atomic():
+                        self.insert([row], [password])
+                    self.result.created += 1
+                except IntegrityError:
+                    self.result.errors.append((row[0], {'email': [EMAIL_TAKEN]}))
+
+    def insert(self, rows, passwords):
+        users = User.objects.bulk_create([self.user(data, password) for (_, data), password in zip(rows, passwords)])
+        if users[0].pk is None:  # MySQL doesn't return the ids of a bulk insert
+            ids = dict(User.objects.filter(username__in=[user.username for user in users]).values_list('username', 'pk'))
+            for user in users:
+                user.pk = ids[user.username]
+        PatientProfile.objects.bulk_create([
+            PatientProfile(user=user, **{name: data[name] for name in PROFILE_FIELDS if name in data})
+            for user, (_, data) in zip(users, rows) if user.role == 'patient'
+        ])
+        transaction.on_commit(lambda: self.forget([user.pk for user in users]))
+
+    def user(self, data, password):
+        # The fields RegisterSerializer.create sets, with the same defaults
+        return User(
+            username=data['email'], email=data['email'], password=password,
+            first_name=data['first_name'], last_name=data['last_name'],
+            role=data.get('role', 'patient'), specialization=data.get('specialization', ''),
+            experience=data.get('experience', 0), consultation_fee=data.get('consultation_fee', 0),
+            address=data.get('address', ''), phone=data.get('phone', ''), bio=data.get('bio', ''),
+            age=data.get('age'),
+        )
+
+    def forget(self, pks):
+        # What drop_cached_user does for a created user, which bulk_create skips:
+        # a reused id must not inherit a deleted user's cache entry or revocations
+        for pk in pks:
+            user_cache.discard(pk)
+        cache.delete_many([version_key(pk) for pk in pks])
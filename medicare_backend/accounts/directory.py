@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.utils.http import urlencode
+
+from api.conditional import Validators
+
+User = get_user_model()
+
+DIRECTORY_VERSION_KEY = 'doctors:version'
+
+# User fields the directory neither filters on nor renders: saves of only these keep the cache
+UNLISTED_FIELDS = frozenset({'last_login', 'password', 'token_version', 'clinic_geohash'})
+
+# Filter name -> ORM lookup on User
+FILTER_LOOKUPS = {
+    'specialization': 'specialization__iexact',
+    'min_fee': 'consultation_fee__gte',
+    'max_fee': 'consultation_fee__lte',
+    'min_experience': 'experience__gte',
+    'min_rating': 'rating__gte',
+}
+
+
+def directory_cache():
+    return caches[settings.DOCTOR_DIRECTORY_CACHE]
+
+
+def directory_version():
+    return directory_cache().get_or_set(DIRECTORY_VERSION_KEY, 1, timeout=None)
+
+
+def invalidate_directory():
+    """Orphan every cached directory page by bumping the version in their keys."""
+    cache = directory_cache()
+    cache.add(DIRECTORY_VERSION_KEY, 1, timeout=None)
+    try:
+        cache.incr(DIRECTORY_VERSION_KEY)
+    except ValueError:  # evicted between add() and incr()
+        cache.set(DIRECTORY_VERSION_KEY, 2, timeout=None)
+
+
+def doctor_queryset(filters):
+    lookups = {FILTER_LOOKUPS[name]: value for name, value in filters.items()}
+    return User.objects.filter(role='doctor', is_verified=True, **lookups).order_by('id')
+
+
+def get_doctors(filters, serialize, representation=()):
+    """
+    Read-through cache of the serialized doctor list for one set of validated
+    filters. `serialize` turns the doctors into response data on a miss;
+    `representation` (?view=, ?fields=) is part of the key since it changes the output.
+    Returns (data, Validators); the validators are cached with the data, so a
+    cache hit answers conditional requests without touching the database.
+    """
+    params = urlencode(sorted((name, str(value).lower()) for name, value in filters.items()))
+    params += '|' + urlencode([('r', value) for value in representation])
+    key = f'doctors:v{directory_version()}:{params}'
+    cache = directory_cache()
+    entry = cache.get(key)
+    if entry is None:
+        doctors = list(doctor_queryset(filters))
+        entry = {'data': serialize(doctors), **Validators.for_instances(doctors, key=params).to_dict()}
+        cache.set(key, entry, timeout=settings.DOCTOR_DIRECTORY_CACHE_TIMEOUT)
+    return entry['data'], Validators.from_dict(entry)
@@ -0,0 +1,141 @@
+"""
+"Doctors near me" without a spatial database.
+
+Each doctor's clinic coordinates are stored with their geohash: a string whose
+prefixes are ever larger grid cells, so all clinics in a cell are one range of
+an ordinary B-tree index. A nearby query covers the circle's bounding box with
+the finest cells that need at most MAX_CELLS ranges, reads only those, and
+checks each row against the exact great-circle distance. The search starts
+with a small circle and widens it only until enough doctors are found.
+"""
+import math
+
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+# Stored length: cells of about 4.8 x 4.8 m
+PRECISION = 9
+# Most index ranges one nearby query reads
+MAX_CELLS = 16
+# Nearby searches start this wide (km) and widen by RING_GROWTH until full
+FIRST_RING_KM = 1
+RING_GROWTH = 2
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def encode(lat, lon, precision=PRECISION):
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        # Bits alternate longitude, latitude, starting with longitude
+        interval, coordinate = (lon_range, lon) if even else (lat_range, lat)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even, bits = not even, bits + 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """(degrees of latitude, degrees of longitude) covered by one cell."""
+    lon_bits = (5 * precision + 1) // 2
+    return 180 / 2 ** (5 * precision - lon_bits), 360 / 2 ** lon_bits
+
+
+def distance_km(lat1, lon1, lat2, lon2):
+    """Haversine distance."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(lat, lon, radius_km):
+    """(min_lat, max_lat, min_lon, max_lon); None for longitude when the box reaches a pole or wraps."""
+    dlat = radius_km / KM_PER_DEGREE
+    min_lat, max_lat = lat - dlat, lat + dlat
+    if min_lat <= -90 or max_lat >= 90:
+        return max(min_lat, -90), min(max_lat, 90), None, None
+    dlon = math.degrees(math.asin(min(1.0, math.sin(math.radians(dlat)) / math.cos(math.radians(lat)))))
+    if lon - dlon < -180 or lon + dlon > 180:
+        return min_lat, max_lat, None, None
+    return min_lat, max_lat, lon - dlon, lon + dlon
+
+
+def covering_cells(lat, lon, radius_km):
+    """Geohash prefixes whose cells together cover the circle, or None if it is too big for that."""
+    min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_km)
+    if min_lon is None:
+        return None
+    # Finer cells read fewer rows outside the circle but need more ranges
+    for precision in range(PRECISION, 0, -1):
+        lat_step, lon_step = cell_size(precision)
+        rows = range(math.floor((min_lat + 90) / lat_step), math.floor((max_lat + 90) / lat_step) + 1)
+        columns = range(math.floor((min_lon + 180) / lon_step), math.floor((max_lon + 180) / lon_step) + 1)
+        if len(rows) * len(columns) <= MAX_CELLS:
+            return sorted({
+                encode(min(-90 + (row + 0.5) * lat_step, 90), min(-180 + (column + 0.5) * lon_step, 180), precision)
+                for row in rows for column in columns
+            })
+    return None
+
+
+def cell_ranges(cells):
+    """Sorted same-length cells as (first, last) runs of neighbours in geohash order."""
+    runs = []
+    for cell in cells:
+        if runs and cell[:-1] == runs[-1][1][:-1] and BASE32.index(cell[-1]) == BASE32.index(runs[-1][1][-1]) + 1:
+            runs[-1][1] = cell
+        else:
+            runs.append([cell, cell])
+    return runs
+
+
+def within(lat, lon, radius):
+    """Sorted (distance_km, pk) of verified doctors within `radius` km."""
+    User = get_user_model()
+    doctors = User.objects.filter(role='doctor', is_verified=True, is_active=True)
+    cells = covering_cells(lat, lon, radius)
+    if cells is not None:
+        # Ranges rather than LIKE: SQLite's case-insensitive LIKE can't use the index
+        in_cells = Q()
+        for first, last in cell_ranges(cells):
+            in_cells |= Q(clinic_geohash__gte=first, clinic_geohash__lt=last + '~')
+        doctors = doctors.filter(in_cells)
+    else:
+        doctors = doctors.exclude(clinic_geohash='')
+    min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius)
+    doctors = doctors.filter(clinic_latitude__range=(min_lat, max_lat))
+    if min_lon is not None:
+        doctors = doctors.filter(clinic_longitude__range=(min_lon, max_lon))
+
+    found = []
+    for pk, clinic_lat, clinic_lon in doctors.values_list('pk', 'clinic_latitude', 'clinic_longitude'):
+        distance = distance_km(lat, lon, clinic_lat, clinic_lon)
+        if distance <= radius:
+            found.append((distance, pk))
+    return sorted(found)
+
+
+def nearby_doctors(lat, lon, radius, limit):
+    """Up to `limit` (distance_km, doctor) pairs of verified doctors within `radius` km, nearest first."""
+    # Grow the search from a small ring: in a city the nearest `limit` are
+    # usually within it, and a big ring would read thousands of rows to keep a few.
+    ring = min(radius, FIRST_RING_KM)
+    while True:
+        found = within(lat, lon, ring)
+        if len(found) >= limit or ring >= radius:
+            break
+        ring = min(radius, ring * RING_GROWTH)
+    found = found[:limit]
+    rows = get_user_model().objects.in_bulk([pk for _, pk in found])
+    return [(distance, rows[pk]) for distance, pk in found if pk in rows]
@@ -0,0 +1,37 @@
+"""
+Password hashing in worker processes, for bulk imports.
+
+Kept free of model imports: spawned workers import this module without
+Django being set up. The hasher is resolved in the parent (from its
+PASSWORD_HASHERS) and pickled to the workers with each call.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+
+def hash_password(hasher, password):
+    # What make_password() does once it has the hasher
+    return hasher.encode(password, hasher.salt())
+
+
+def hash_pool(workers=None):
+    """A pool of `workers` processes (default: one per CPU), or None to hash in this process."""
+    workers = os.cpu_count() if workers is None else workers
+    if workers <= 1:
+        return None
+    # spawn, not fork: forking a threaded server process can copy held locks
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+
+def hash_passwords(hasher, passwords, pool=None, chunksize=16):
+    """
+    Hashes of `passwords` in order. With a pool this returns at once (an
+    iterator the hashes arrive on) and the caller can work meanwhile.
+    """
+    if pool is None:
+        return [hash_password(hasher, password) for password in passwords]
+    # Small chunks: one PBKDF2 hash is a fraction of a second, and a batch's
+    # last chunk shouldn't leave the other workers idle for long
+    return pool.map(partial(hash_password, hasher), passwords, chunksize=chunksize)
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.27 on 2026-10-18 19:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_remove_user_about_remove_user_phone_number_user_age_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['role', 'is_verified', 'specialization'], name='user_directory_idx'),
+        ),
+    ]
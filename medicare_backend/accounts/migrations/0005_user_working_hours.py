@@ -0,0 +1,34 @@
+# Generated by Django 4.2.27 on 2026-10-18 19:23
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_user_directory_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='slot_minutes',
+            field=models.PositiveSmallIntegerField(default=30, help_text='Appointment length, multiple of 15'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='work_end',
+            field=models.TimeField(default=datetime.time(17, 0)),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='work_start',
+            field=models.TimeField(default=datetime.time(9, 0)),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='working_days',
+            field=models.PositiveSmallIntegerField(default=31, help_text='Weekday bitmask, bit 0 = Monday'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.27 on 2026-10-18 19:46
+
+import accounts.models
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+def check_duplicate_emails(apps, schema_editor):
+    User = apps.get_model('accounts', 'User')
+    seen, duplicates = set(), set()
+    for email in User.objects.exclude(email='').values_list('email', flat=True).iterator():
+        key = email.lower()
+        (duplicates if key in seen else seen).add(key)
+    if duplicates:
+        raise RuntimeError(
+            "These emails belong to more than one user (ignoring case); fix them before migrating: "
+            + ', '.join(sorted(duplicates))
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_user_token_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_emails, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='user',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower(accounts.models.BlankToNull('email')), name='unique_user_email_ci'),
+        ),
+    ]
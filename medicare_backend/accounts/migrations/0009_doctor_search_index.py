@@ -0,0 +1,95 @@
+# Generated by Django 4.2.27 on 2026-10-18 19:53
+
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# A copy of accounts.search as of this migration, so later changes there
+# don't change what it does.
+FIELD_WEIGHTS = {'first_name': 3, 'last_name': 3, 'specialization': 3, 'address': 1, 'bio': 1}
+STOP_WORDS = {'dr', 'the', 'and', 'of', 'in', 'at', 'for', 'with'}
+MAX_TERM_LENGTH = 64
+
+
+def tokenize(text):
+    decomposed = unicodedata.normalize('NFKD', (text or '').lower())
+    normalized = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    words = re.findall(r'\w+', normalized)
+    return [word[:MAX_TERM_LENGTH] for word in words if len(word) > 1 and word not in STOP_WORDS]
+
+
+def trigrams(term):
+    padded = f'${term}$'
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def index_existing_doctors(apps, schema_editor):
+    User = apps.get_model('accounts', 'User')
+    SearchTerm = apps.get_model('accounts', 'SearchTerm')
+    SearchTrigram = apps.get_model('accounts', 'SearchTrigram')
+
+    vocabulary = set()
+    postings = []
+    doctors = User.objects.filter(role='doctor', is_verified=True, is_active=True)
+    for doctor in doctors.only(*FIELD_WEIGHTS, 'rating', 'experience').iterator(chunk_size=1000):
+        terms = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            for term in tokenize(getattr(doctor, field)):
+                terms[term] = max(weight, terms.get(term, 0))
+        for term, weight in terms.items():
+            postings.append(SearchTerm(term=term, doctor_id=doctor.pk, weight=weight,
+                                       rating=doctor.rating, experience=doctor.experience))
+            vocabulary.add(term)
+        if len(postings) >= 1000:
+            SearchTerm.objects.bulk_create(postings)
+            postings = []
+    SearchTerm.objects.bulk_create(postings)
+    SearchTrigram.objects.bulk_create(
+        [SearchTrigram(trigram=gram, term=term) for term in vocabulary for gram in trigrams(term)],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_user_email_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.PositiveSmallIntegerField()),
+                ('rating', models.DecimalField(decimal_places=1, max_digits=3)),
+                ('experience', models.IntegerField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SearchTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('term', models.CharField(max_length=64)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='searchtrigram',
+            constraint=models.UniqueConstraint(fields=('trigram', 'term'), name='unique_search_trigram_term'),
+        ),
+        migrations.AddField(
+            model_name='searchterm',
+            name='doctor',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='searchterm',
+            constraint=models.UniqueConstraint(fields=('term', 'doctor'), name='unique_search_term_doctor'),
+        ),
+        migrations.RunPython(index_existing_doctors, migrations.RunPython.noop),
+    ]
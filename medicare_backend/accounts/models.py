@@ -1,5 +1,23 @@
+import datetime
+
 from django.contrib.auth.models import AbstractUser
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.db.models import Func
+from django.db.models.functions import Lower
+
+from . import geo
+
+
+class BlankToNull(Func):
+    # The '' is SQL text rather than a query parameter, so a lookup on this
+    # expression matches the index expression exactly (SQLite binds parameters).
+    template = "NULLIF(%(expressions)s, '')"
+
+
+# Case-insensitive email key; blank emails become NULL so they never collide.
+# Lookups must use this exact expression to hit the 'unique_user_email_ci' index.
+EMAIL_KEY = Lower(BlankToNull('email'))
 
 class User(AbstractUser):
     ROLE_CHOICES = (
@@ -15,6 +33,12 @@ class User(AbstractUser):
     bio = models.TextField(blank=True, help_text="Short bio/description")
     age = models.IntegerField(null=True, blank=True)  # ✅ You added this (Good!)
     address = models.TextField(blank=True, null=True, help_text="Clinic Address") # ✅ RE-ADDED THIS (Essential!)
+    clinic_latitude = models.FloatField(null=True, blank=True,
+                                        validators=[MinValueValidator(-90), MaxValueValidator(90)])
+    clinic_longitude = models.FloatField(null=True, blank=True,
+                                         validators=[MinValueValidator(-180), MaxValueValidator(180)])
+    # Derived from the coordinates by save(); what /users/doctors/nearby/ looks up (accounts/geo.py)
+    clinic_geohash = models.CharField(max_length=12, blank=True, editable=False)
 
     # --- Doctor Specifics ---
     specialization = models.CharField(max_length=100, blank=True)
@@ -22,9 +46,105 @@ class User(AbstractUser):
     consultation_fee = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     rating = models.DecimalField(max_digits=3, decimal_places=1, default=0)
     is_verified = models.BooleanField(default=False)
+
+    # --- Doctor Working Hours (used by the availability engine) ---
+    work_start = models.TimeField(default=datetime.time(9, 0))
+    work_end = models.TimeField(default=datetime.time(17, 0))
+    slot_minutes = models.PositiveSmallIntegerField(default=30, help_text="Appointment length, multiple of 15")
+    working_days = models.PositiveSmallIntegerField(default=0b0011111, help_text="Weekday bitmask, bit 0 = Monday")
     
     # --- Patient Specifics ---
     blood_group = models.CharField(max_length=5, blank=True)
-    
+
+    # Bumped on every save() that writes the row (not on last_login-only saves)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Bumped by save() when role/verification/active change; older JWTs are then rejected
+    token_version = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Doctor directory: role='doctor' AND is_verified AND specialization=...
+            models.Index(fields=['role', 'is_verified', 'specialization'], name='user_directory_idx'),
+            # Nearby doctors: role='doctor' AND is_verified AND clinic_geohash in a few prefix ranges
+            models.Index(fields=['role', 'is_verified', 'clinic_geohash'], name='user_doctor_geo_idx'),
+        ]
+        constraints = [
+            # Login by email (accounts.backends) looks users up through this index
+            models.UniqueConstraint(EMAIL_KEY, name='unique_user_email_ci'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored role so signals can tell when someone stops being a doctor
+        if 'role' in field_names:
+            instance._loaded_role = values[field_names.index('role')]
+        if {'role', 'is_verified', 'is_active'} <= set(field_names):
+            instance._loaded_access = instance.access_state()
+        if set(cls.SEARCH_STATE_FIELDS) <= set(field_names):
+            instance._loaded_search = instance.search_state()
+        return instance
+
+    # What the doctor search index (accounts/search.py) is built from
+    SEARCH_STATE_FIELDS = ('role', 'is_verified', 'is_active', 'first_name', 'last_name',
+                           'specialization', 'bio', 'address', 'rating', 'experience')
+
+    def search_state(self):
+        return tuple(getattr(self, name) for name in self.SEARCH_STATE_FIELDS)
+
+    def access_state(self):
+        # What the token claims and the permission checks rely on
+        return (self.role, self.is_verified, self.is_active)
+
+    def clinic_location_hash(self):
+        if self.clinic_latitude is None or self.clinic_longitude is None:
+            return ''
+        return geo.encode(self.clinic_latitude, self.clinic_longitude)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        loaded = getattr(self, '_loaded_access', None)
+        if loaded is not None and loaded != self.access_state():
+            self.token_version += 1
+            if update_fields is not None:
+                kwargs['update_fields'] = update_fields = {*update_fields, 'token_version'}
+        if update_fields is None or {'clinic_latitude', 'clinic_longitude'} & set(update_fields):
+            self.clinic_geohash = self.clinic_location_hash()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'clinic_geohash'}
+        super().save(*args, **kwargs)
+        self._loaded_access = self.access_state()
+
+    def works_on(self, day):
+        return bool(self.working_days & (1 << day.weekday()))
+
     def __str__(self):
-        return f"{self.username} ({self.role})"
\ No newline at end of file
+        return f"{self.username} ({self.role})"
+
+
+class SearchTerm(models.Model):
+    """Posting of the doctor search index: `term` occurs in `doctor`'s searchable fields."""
+    term = models.CharField(max_length=64)
+    doctor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    # Best field the term occurs in: names/specialization outrank bio/address
+    weight = models.PositiveSmallIntegerField()
+    # Copied from the doctor so ranking needs no join
+    rating = models.DecimalField(max_digits=3, decimal_places=1)
+    experience = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            # Also the index for exact and prefix (range) scans on term
+            models.UniqueConstraint(fields=['term', 'doctor'], name='unique_search_term_doctor'),
+        ]
+
+
+class SearchTrigram(models.Model):
+    """Trigrams of every indexed term, for typo-tolerant lookups."""
+    trigram = models.CharField(max_length=3)
+    term = models.CharField(max_length=64)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['trigram', 'term'], name='unique_search_trigram_term'),
+        ]
@@ -0,0 +1,334 @@
+"""
+Doctor search: an inverted index over the searchable fields of verified doctors.
+
+Each field is split into lowercase, accent-free terms. A query word matches a
+term exactly, as a prefix ("cardi" -> "cardiology"), or within a few typos
+("cardiolgy"). Typo candidates come from the term's trigrams, so neither
+lookup scans the doctors table; edits are then counted in Python.
+
+Every query word must match (AND). Doctors are ranked by how well and in
+which fields the words matched, then by rating and experience; postings
+carry the doctor's rating/experience, so only the rows returned are loaded.
+
+The index is kept current by accounts/signals.py. Two backends, chosen by
+settings.DOCTOR_SEARCH_BACKEND:
+
+    DatabaseIndex   SearchTerm/SearchTrigram tables, written in the same
+                    transaction as the doctor
+    MemoryIndex     dicts in this process, built from the database on first
+                    use; for SQLite test runs and single-process setups (other
+                    processes don't see its updates)
+
+`python manage.py rebuild_search_index` rebuilds either from scratch.
+"""
+import heapq
+import re
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Count
+from django.utils.module_loading import import_string
+
+from .models import SearchTerm, SearchTrigram
+
+User = get_user_model()
+
+# Field -> weight of a term found in it
+FIELD_WEIGHTS = {'first_name': 3, 'last_name': 3, 'specialization': 3, 'address': 1, 'bio': 1}
+STOP_WORDS = {'dr', 'the', 'and', 'of', 'in', 'at', 'for', 'with'}
+MAX_TERM_LENGTH = 64
+
+# Match quality per query word
+EXACT, PREFIX, PER_TYPO = 1.0, 0.8, 0.6
+MIN_PREFIX_LENGTH = 2
+
+
+def normalize(text):
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text):
+    words = re.findall(r'\w+', normalize(text or ''))
+    return [word[:MAX_TERM_LENGTH] for word in words if len(word) > 1 and word not in STOP_WORDS]
+
+
+def doctor_terms(doctor):
+    """{term: weight} for one doctor, keeping the best field per term."""
+    terms = {}
+    for field, weight in FIELD_WEIGHTS.items():
+        for term in tokenize(getattr(doctor, field)):
+            terms[term] = max(weight, terms.get(term, 0))
+    return terms
+
+
+def trigrams(term):
+    padded = f'${term}$'
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def allowed_typos(word):
+    return 0 if len(word) < 4 else 1 if len(word) < 8 else 2
+
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance, or limit + 1 once it is certain to exceed `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous, current = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+    return current[-1]
+
+
+def searchable(doctor):
+    return doctor.role == 'doctor' and doctor.is_verified and doctor.is_active
+
+
+class SearchIndex:
+    """Matching shared by the backends; they supply the term and posting lookups."""
+
+    def index(self, doctor):
+        raise NotImplementedError
+
+    def remove(self, doctor_id):
+        raise NotImplementedError
+
+    def rebuild(self):
+        raise NotImplementedError
+
+    def similar_terms(self, grams, min_shared):
+        """Indexed terms sharing at least `min_shared` of `grams`."""
+        raise NotImplementedError
+
+    def postings(self, word, terms):
+        """(term, doctor_id, weight, rating, experience) for terms starting with `word` and for `terms`."""
+        raise NotImplementedError
+
+    def typo_terms(self, word):
+        """{term: quality} for indexed terms within allowed_typos(word) edits."""
+        limit = allowed_typos(word)
+        if not limit:
+            return {}
+        grams = trigrams(word)
+        # One edit changes at most three trigrams, a transposition four
+        candidates = self.similar_terms(grams, max(1, len(grams) - 4 * limit))
+        found = {}
+        for term in candidates:
+            distance = edit_distance(word, term, limit)
+            if 0 < distance <= limit:
+                found[term] = PER_TYPO ** distance
+        return found
+
+    def matches(self, word, ranks):
+        """{doctor_id: score} of doctors with a term matching one query word; fills `ranks`."""
+        typos = self.typo_terms(word)
+        best = {}
+        for term, doctor_id, weight, rating, experience in self.postings(word, typos):
+            if term == word:
+                quality = EXACT
+            elif term.startswith(word) and len(word) >= MIN_PREFIX_LENGTH:
+                quality = PREFIX
+            else:
+                quality = typos.get(term, 0)
+            score = quality * weight
+            if score > best.get(doctor_id, 0):
+                best[doctor_id] = score
+                ranks[doctor_id] = (rating, experience)
+        return best
+
+    def scores(self, words):
+        """({doctor_id: score} of doctors matching every word, {doctor_id: (rating, experience)})."""
+        scores, ranks = None, {}
+        for word in sorted(words, key=len, reverse=True):  # longer words usually narrow it most
+            matched = self.matches(word, ranks)
+            if scores is None:
+                scores = matched
+            else:
+                scores = {pk: score + matched[pk] for pk, score in scores.items() if pk in matched}
+            if not scores:
+                break
+        return scores, ranks
+
+    def search(self, query, limit):
+        """Up to `limit` verified doctors matching every word of `query`, best first."""
+        words = list(dict.fromkeys(tokenize(query)))
+        if not words:
+            return []
+        scores, ranks = self.scores(words)
+        best = heapq.nsmallest(limit, scores, key=lambda pk: (-round(scores[pk], 3), -ranks[pk][0], -ranks[pk][1], pk))
+        doctors = User.objects.filter(role='doctor', is_verified=True, is_active=True).in_bulk(best)
+        return [doctors[pk] for pk in best if pk in doctors]
+
+
+def posting(doctor, term, weight):
+    return SearchTerm(term=term, doctor_id=doctor.pk, weight=weight, rating=doctor.rating, experience=doctor.experience)
+
+
+class DatabaseIndex(SearchIndex):
+
+    def index(self, doctor):
+        old = set(SearchTerm.objects.filter(doctor=doctor).values_list('term', flat=True))
+        terms = doctor_terms(doctor) if searchable(doctor) else {}
+        SearchTerm.objects.filter(doctor=doctor).delete()
+        SearchTerm.objects.bulk_create([posting(doctor, term, weight) for term, weight in terms.items()])
+        new = terms.keys() - old
+        if new:
+            SearchTrigram.objects.bulk_create(
+                [SearchTrigram(trigram=gram, term=term) for term in new for gram in trigrams(term)],
+                ignore_conflicts=True,
+            )
+        self.drop_unused_terms(old - terms.keys())
+
+    def remove(self, doctor_id):
+        old = set(SearchTerm.objects.filter(doctor_id=doctor_id).values_list('term', flat=True))
+        if old:
+            SearchTerm.objects.filter(doctor_id=doctor_id).delete()
+            self.drop_unused_terms(old)
+
+    def drop_unused_terms(self, terms):
+        if terms:
+            still_used = SearchTerm.objects.filter(term__in=terms).values_list('term', flat=True)
+            SearchTrigram.objects.filter(term__in=set(terms) - set(still_used)).delete()
+
+    def rebuild(self, batch_size=1000):
+        SearchTerm.objects.all().delete()
+        SearchTrigram.objects.all().delete()
+        vocabulary = set()
+        doctors = (User.objects.filter(role='doctor', is_verified=True, is_active=True)
+                   .only(*FIELD_WEIGHTS, 'rating', 'experience'))
+        postings = []
+        for doctor in doctors.iterator(chunk_size=batch_size):
+            for term, weight in doctor_terms(doctor).items():
+                postings.append(posting(doctor, term, weight))
+                vocabulary.add(term)
+            if len(postings) >= batch_size:
+                SearchTerm.objects.bulk_create(postings, batch_size=batch_size)
+                postings = []
+        SearchTerm.objects.bulk_create(postings, batch_size=batch_size)
+        SearchTrigram.objects.bulk_create(
+            (SearchTrigram(trigram=gram, term=term) for term in vocabulary for gram in trigrams(term)),
+            batch_size=batch_size,
+        )
+
+    def similar_terms(self, grams, min_shared):
+        return (SearchTrigram.objects.filter(trigram__in=grams).values('term')
+                .annotate(shared=Count('pk')).filter(shared__gte=min_shared)
+                .values_list('term', flat=True))
+
+    def postings(self, word, terms):
+        lookup = SearchTerm.objects.filter(term__in=[word, *terms])
+        if len(word) >= MIN_PREFIX_LENGTH:
+            # A range rather than LIKE: SQLite's case-insensitive LIKE can't use the index
+            lookup = lookup | SearchTerm.objects.filter(term__gte=word, term__lt=word + '\uffff')
+        return lookup.values_list('term', 'doctor_id', 'weight', 'rating', 'experience')
+
+
+class MemoryIndex(SearchIndex):
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.loaded = False
+        self.reset()
+
+    def reset(self):
+        """Forget everything; the next search reloads from the database."""
+        with self.lock:
+            self.postings_by_term = defaultdict(dict)  # term -> {doctor_id: weight}
+            self.terms_by_doctor = {}                  # doctor_id -> {term: weight}
+            self.ranks = {}                            # doctor_id -> (rating, experience)
+            self.vocabulary = []                       # sorted terms, for prefix scans
+            self.terms_by_gram = defaultdict(set)
+            self.loaded = False
+
+    def rebuild(self):
+        with self.lock:
+            self.reset()
+            doctors = (User.objects.filter(role='doctor', is_verified=True, is_active=True)
+                       .only(*FIELD_WEIGHTS, 'rating', 'experience'))
+            for doctor in doctors.iterator():
+                self.add(doctor)
+            self.loaded = True
+
+    def index(self, doctor):
+        with self.lock:
+            if not self.loaded:
+                return  # picked up by the first search's rebuild
+            self.discard(doctor.pk)
+            if searchable(doctor):
+                self.add(doctor)
+
+    def remove(self, doctor_id):
+        with self.lock:
+            if self.loaded:
+                self.discard(doctor_id)
+
+    def add(self, doctor):
+        doctor_id, terms = doctor.pk, doctor_terms(doctor)
+        self.terms_by_doctor[doctor_id] = terms
+        self.ranks[doctor_id] = (doctor.rating, doctor.experience)
+        for term, weight in terms.items():
+            if term not in self.postings_by_term:
+                insort(self.vocabulary, term)
+                for gram in trigrams(term):
+                    self.terms_by_gram[gram].add(term)
+            self.postings_by_term[term][doctor_id] = weight
+
+    def discard(self, doctor_id):
+        self.ranks.pop(doctor_id, None)
+        for term in self.terms_by_doctor.pop(doctor_id, ()):
+            postings = self.postings_by_term[term]
+            postings.pop(doctor_id, None)
+            if not postings:
+                del self.postings_by_term[term]
+                del self.vocabulary[bisect_left(self.vocabulary, term)]
+                for gram in trigrams(term):
+                    self.terms_by_gram[gram].discard(term)
+
+    def similar_terms(self, grams, min_shared):
+        shared = defaultdict(int)
+        for gram in grams:
+            for term in self.terms_by_gram.get(gram, ()):
+                shared[term] += 1
+        return [term for term, count in shared.items() if count >= min_shared]
+
+    def postings(self, word, terms):
+        terms = set(terms)
+        if word in self.postings_by_term:
+            terms.add(word)
+        if len(word) >= MIN_PREFIX_LENGTH:
+            i = bisect_left(self.vocabulary, word)
+            while i < len(self.vocabulary) and self.vocabulary[i].startswith(word):
+                terms.add(self.vocabulary[i])
+                i += 1
+        return [(term, doctor_id, weight, *self.ranks[doctor_id])
+                for term in terms for doctor_id, weight in self.postings_by_term.get(term, {}).items()]
+
+    def scores(self, words):
+        with self.lock:
+            if not self.loaded:
+                self.rebuild()
+            return super().scores(words)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_search_index():
+    path = settings.DOCTOR_SEARCH_BACKEND
+    with _indexes_lock:
+        if path not in _indexes:
+            _indexes[path] = import_string(path)()
+        return _indexes[path]
@@ -1,11 +1,18 @@
+from decimal import Decimal
+
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from api.metrics import TimedSerializerMixin
+from api.serializers import SparseFieldsMixin
+from .backends import email_in_use
+
+EMAIL_TAKEN = "A user with this email already exists."
 
 User = get_user_model()
 
 # --- 1. User Serializer (For Updates & Profile View) ---
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=False)
 
     class Meta:
@@ -14,7 +21,8 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 'role', 
                   'specialization', 'experience', 'consultation_fee', 'rating', 
                   'is_verified', 'password', 
-                  'address', 'phone', 'bio', 'age'] 
+                  'address', 'phone', 'bio', 'age', 'clinic_latitude', 'clinic_longitude',
+                  'work_start', 'work_end', 'slot_minutes', 'working_days'] 
         extra_kwargs = {
             'first_name': {'required': True},
             'last_name': {'required': True},
@@ -26,6 +34,32 @@ class UserSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Password must be at least 8 characters long.")
         return value
 
+    def validate_email(self, value):
+        if email_in_use(value, exclude=self.instance):
+            raise serializers.ValidationError(EMAIL_TAKEN)
+        return value
+
+    def validate_slot_minutes(self, value):
+        if value <= 0 or value % 15:
+            raise serializers.ValidationError("Slot length must be a positive multiple of 15 minutes.")
+        return value
+
+    def validate_working_days(self, value):
+        if not 0 <= value <= 0b1111111:
+            raise serializers.ValidationError("Working days must be a 7-bit weekday mask.")
+        return value
+
+    def validate(self, attrs):
+        start = attrs.get('work_start', getattr(self.instance, 'work_start', None))
+        end = attrs.get('work_end', getattr(self.instance, 'work_end', None))
+        if start and end and start >= end:
+            raise serializers.ValidationError({'work_end': "Working hours must end after they start."})
+        lat = attrs.get('clinic_latitude', getattr(self.instance, 'clinic_latitude', None))
+        lon = attrs.get('clinic_longitude', getattr(self.instance, 'clinic_longitude', None))
+        if (lat is None) != (lon is None):
+            raise serializers.ValidationError("Clinic latitude and longitude must be set together.")
+        return attrs
+
     def create(self, validated_data):
         password = validated_data.pop('password', None)
         user = User.objects.create(**validated_data)
@@ -40,13 +74,23 @@ class UserSerializer(serializers.ModelSerializer):
             instance.set_password(password)
         return super().update(instance, validated_data)
 
-class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+class UserSummarySerializer(UserSerializer):
+    """Compact list rows (?view=summary): no bio, address, phone or working hours."""
+
+    class Meta(UserSerializer.Meta):
+        fields = ['id', 'username', 'first_name', 'last_name', 'role', 'specialization',
+                  'experience', 'consultation_fee', 'rating', 'is_verified']
+
+class CustomTokenObtainPairSerializer(TimedSerializerMixin, TokenObtainPairSerializer):
     @classmethod
     def get_token(cls, user):
         token = super().get_token(user)
         token['role'] = user.role
         token['username'] = user.username
         token['email'] = user.email
+        # Lets ClaimsJWTAuthentication skip the user query on reads
+        token['is_verified'] = user.is_verified
+        token['ver'] = user.token_version
         return token
 
 # --- 2. Register Serializer (For New Users) ---
@@ -70,6 +114,11 @@ class RegisterSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Password must be at least 8 characters long.")
         return value
 
+    def validate_email(self, value):
+        if email_in_use(value):
+            raise serializers.ValidationError(EMAIL_TAKEN)
+        return value
+
     def create(self, validated_data):
         # We use objects.create_user to handle hashing automatically
         user = User.objects.create_user(
@@ -88,4 +137,29 @@ class RegisterSerializer(serializers.ModelSerializer):
             bio=validated_data.get('bio', ''),
             age=validated_data.get('age', None)
         )
-        return user
\ No newline at end of file
+        return user
+
+# --- 3. Doctor Directory Filters (Query params for /users/doctors/) ---
+class DoctorFilterSerializer(TimedSerializerMixin, serializers.Serializer):
+    specialization = serializers.CharField(required=False, max_length=100)
+    min_fee = serializers.DecimalField(required=False, max_digits=10, decimal_places=2, min_value=Decimal('0'))
+    max_fee = serializers.DecimalField(required=False, max_digits=10, decimal_places=2, min_value=Decimal('0'))
+    min_experience = serializers.IntegerField(required=False, min_value=0)
+    min_rating = serializers.DecimalField(required=False, max_digits=3, decimal_places=1, min_value=Decimal('0'))
+
+    def validate(self, attrs):
+        if 'min_fee' in attrs and 'max_fee' in attrs and attrs['min_fee'] > attrs['max_fee']:
+            raise serializers.ValidationError("min_fee cannot be greater than max_fee.")
+        return attrs
+
+# --- 4. Doctor Search (Query params for /users/doctors/search/) ---
+class DoctorSearchSerializer(TimedSerializerMixin, serializers.Serializer):
+    q = serializers.CharField(max_length=200, trim_whitespace=True)
+    limit = serializers.IntegerField(required=False, default=20, min_value=1, max_value=100)
+
+# --- 5. Nearby Doctors (Query params for /users/doctors/nearby/) ---
+class DoctorNearbySerializer(TimedSerializerMixin, serializers.Serializer):
+    lat = serializers.FloatField(min_value=-90, max_value=90)
+    lon = serializers.FloatField(min_value=-180, max_value=180)
+    radius = serializers.FloatField(required=False, default=10, min_value=0.1, max_value=500, help_text="km")
+    limit = serializers.IntegerField(required=False, default=20, min_value=1, max_value=100)
@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .authentication import publish_token_version, user_cache, version_key
+from .directory import UNLISTED_FIELDS, invalidate_directory
+from .search import get_search_index, searchable
+
+
+@receiver([post_save, post_delete], sender=settings.AUTH_USER_MODEL)
+def doctor_changed(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= UNLISTED_FIELDS:
+        return  # e.g. last_login on every login
+    if instance.role == 'doctor' or getattr(instance, '_loaded_role', None) == 'doctor':
+        invalidate_directory()
+
+
+@receiver([post_save, post_delete], sender=settings.AUTH_USER_MODEL)
+def drop_cached_user(sender, instance, signal, created=False, **kwargs):
+    user_cache.discard(instance.pk)
+    if signal is post_delete:
+        cache.delete(version_key(instance.pk))  # its tokens now find no user
+    elif created or instance.token_version:
+        publish_token_version(instance)  # on create: a reused id must not inherit revocations
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def index_doctor(sender, instance, **kwargs):
+    loaded = getattr(instance, '_loaded_search', None)
+    if loaded == instance.search_state():
+        return  # e.g. a last_login or fee update
+    was_searchable = loaded is not None and loaded[:3] == ('doctor', True, True)
+    # Entries a save without the snapshot misses are harmless: search re-checks the row
+    if searchable(instance) or was_searchable:
+        get_search_index().index(instance)
+    instance._loaded_search = instance.search_state()
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def unindex_doctor(sender, instance, **kwargs):
+    # Before the delete: afterwards the cascade has removed the postings we look up
+    if instance.role == 'doctor':
+        get_search_index().remove(instance.pk)
@@ -1,3 +1,479 @@
-from django.test import TestCase
+import io
+import os
+import random
+import tempfile
+from unittest.mock import patch
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api.tests import QueryBudgetTestCase
+from api.models import PatientProfile
+from .authentication import ClaimsJWTAuthentication, user_cache
+from .bulk_import import UserImporter, read_csv
+from .geo import distance_km
+from .models import SearchTrigram, User
+from .search import get_search_index
+from .throttling import login_buckets
+
+
+class UserQueryBudgetTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        for i in range(10):
+            self.make_user(f'doctor{i}', role='doctor', is_verified=True, specialization='Cardiology')
+        self.patient = self.make_user('patient')
+
+    def test_doctor_directory(self):
+        response = self.assertWithinBudget('user-doctors', self.client_for(None).get, '/api/users/doctors/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 10)
+
+    def test_profile(self):
+        response = self.assertWithinBudget('user-profile', self.client_for(self.patient).get, '/api/users/profile/')
+        self.assertEqual(response.data['username'], 'patient')
+
+    def test_user_list_keyset_pagination(self):
+        client = self.client_for(None)
+        self.assertEqual(len(client.get('/api/users/').data), 11)
+        first = client.get('/api/users/?page_size=4').data
+        self.assertEqual(len(first['results']), 4)
+        second = client.get(first['next']).data
+        self.assertLess(first['results'][-1]['id'], second['results'][0]['id'])
+
+
+class DoctorDirectoryTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        self.cardio = self.make_user('house', role='doctor', is_verified=True, specialization='Cardiology',
+                                     consultation_fee=500, experience=12, rating=4.8)
+        self.make_user('wilson', role='doctor', is_verified=True, specialization='Oncology',
+                       consultation_fee=300, experience=5, rating=4.1)
+        self.make_user('unverified', role='doctor', specialization='Cardiology')
+        self.client = self.client_for(None)
+
+    def usernames(self, query=''):
+        return [doc['username'] for doc in self.client.get(f'/api/users/doctors/{query}').data]
+
+    def test_filters(self):
+        self.assertEqual(self.usernames(), ['house', 'wilson'])
+        self.assertEqual(self.usernames('?specialization=cardiology'), ['house'])
+        self.assertEqual(self.usernames('?min_fee=200&max_fee=400'), ['wilson'])
+        self.assertEqual(self.usernames('?min_experience=10'), ['house'])
+        self.assertEqual(self.usernames('?min_rating=4.5'), ['house'])
+
+    def test_invalid_filters(self):
+        self.assertEqual(self.client.get('/api/users/doctors/?min_fee=500&max_fee=100').status_code, 400)
+        self.assertEqual(self.client.get('/api/users/doctors/?min_rating=abc').status_code, 400)
+
+    def test_served_from_cache_until_a_doctor_changes(self):
+        self.usernames('?specialization=Cardiology')
+        with self.assertNumQueries(0):
+            self.usernames('?specialization=Cardiology')
+
+        self.make_user('patient')  # not a doctor: cache stays warm
+        with self.assertNumQueries(0):
+            self.usernames('?specialization=Cardiology')
+
+        self.cardio.last_login = timezone.now()
+        self.cardio.save(update_fields=['last_login'])  # a login: nothing the directory shows
+        with self.assertNumQueries(0):
+            self.usernames('?specialization=Cardiology')
+
+        self.cardio.specialization = 'Neurology'
+        self.cardio.save()
+        self.assertEqual(self.usernames('?specialization=Cardiology'), [])
+
+    def test_doctor_becoming_patient_invalidates(self):
+        self.usernames()
+        doctor = type(self.cardio).objects.get(pk=self.cardio.pk)
+        doctor.role = 'patient'
+        doctor.save()
+        self.assertEqual(self.usernames(), ['wilson'])
+
+    def test_file_based_cache_backend(self):
+        with tempfile.TemporaryDirectory() as location:
+            backend = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}
+            with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                                           'directory': backend},
+                                   DOCTOR_DIRECTORY_CACHE='directory'):
+                self.assertEqual(self.usernames(), ['house', 'wilson'])
+                with self.assertNumQueries(0):
+                    self.assertEqual(self.usernames(), ['house', 'wilson'])
+
+    def test_conditional_get(self):
+        response = self.client.get('/api/users/doctors/')
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/users/doctors/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertNotEqual(self.client.get('/api/users/doctors/?view=summary')['ETag'], etag)
+
+        self.cardio.rating = 4.9
+        self.cardio.save()
+        self.assertEqual(self.client.get('/api/users/doctors/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ProfileConditionalGetTests(QueryBudgetTestCase):
+
+    def test_profile_not_modified_until_saved(self):
+        user = self.make_user('patient')
+        client = self.client_for(user)
+        response = client.get('/api/users/profile/')
+        self.assertIn('no-cache', response['Cache-Control'])
+        etag, last_modified = response['ETag'], response['Last-Modified']
+
+        self.assertEqual(client.get('/api/users/profile/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(client.get('/api/users/profile/', HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        client.patch('/api/users/profile/', {'phone': '555-0100'})
+        response = client.get('/api/users/profile/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['phone'], '555-0100')
+
+
+class ClaimsAuthenticationTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        user_cache.clear()
+        self.doctor = self.make_user('drhouse', role='doctor', is_verified=True)
+        self.client = self.client_for(self.doctor)
+
+    def test_reads_build_the_user_from_claims(self):
+        with patch.object(JWTAuthentication, 'get_user') as get_user:
+            self.assertEqual(self.client.get('/api/appointments/').status_code, 200)
+        get_user.assert_not_called()
+
+        authentication = ClaimsJWTAuthentication()
+        authentication.request_is_safe = True
+        token = authentication.get_validated_token(self.client._credentials['HTTP_AUTHORIZATION'].split()[1])
+        user = authentication.get_user(token)
+        self.assertEqual((user.role, user.username), ('doctor', 'drhouse'))
+        with self.assertNumQueries(1):  # fields outside the claims load on demand
+            self.assertEqual(user.first_name, 'Drhouse')
+
+    def test_writes_use_the_user_cache(self):
+        # JWTAuthentication.get_user is the database lookup ClaimsJWTAuthentication falls back to
+        with patch.object(JWTAuthentication, 'get_user', autospec=True, side_effect=JWTAuthentication.get_user) as get_user:
+            for _ in range(2):
+                self.client.post('/api/appointments/bulk-delete/', {'ids': [1]}, format='json')
+        self.assertEqual(get_user.call_count, 1)
+
+    def test_role_change_revokes_tokens(self):
+        self.doctor.role = 'patient'
+        self.doctor.save()
+        self.assertEqual(self.client.get('/api/appointments/').status_code, 401)
+        self.assertEqual(self.client.post('/api/appointments/bulk-delete/', {'ids': [1]}, format='json').status_code, 401)
+        self.assertEqual(self.client_for(self.doctor).get('/api/appointments/').status_code, 200)
+
+    def test_revocation_survives_a_cache_miss(self):
+        self.doctor.role = 'patient'
+        self.doctor.save()
+        cache.clear()  # evicted, or published to another process's cache
+        self.assertEqual(self.client.get('/api/appointments/').status_code, 401)
+        with self.assertNumQueries(0):  # the database's version is cached again
+            self.assertEqual(self.client.get('/api/appointments/').status_code, 401)
+
+    def test_deleted_user_is_rejected(self):
+        self.doctor.delete()
+        self.assertEqual(self.client.get('/api/appointments/').status_code, 401)
+
+    def test_profile_edits_keep_tokens_valid(self):
+        self.client.patch('/api/users/profile/', {'bio': 'Diagnostician'})
+        self.assertEqual(self.client.get('/api/users/profile/').data['bio'], 'Diagnostician')
+
+    def test_tokens_without_claims_use_the_database(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.doctor).access_token}')
+        self.assertEqual(client.get('/api/users/profile/').data['username'], 'drhouse')
+
+
+class LoginTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        login_buckets.clear()
+        self.user = self.make_user('drhouse', role='doctor')  # email drhouse@medicare.com
+        self.client = APIClient()
+
+    def login(self, username, password='Secret@123', **extra):
+        return self.client.post('/api/auth/login/', {'username': username, 'password': password}, **extra)
+
+    def test_email_or_username_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.login('DrHouse@Medicare.com')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('access', response.data)
+        self.assertEqual(self.login('drhouse').status_code, 200)
+        self.assertEqual(self.login('drhouse', password='wrong').status_code, 401)
+        self.assertEqual(self.login('nobody@medicare.com').status_code, 401)
+
+    @override_settings(LOGIN_RATE_LIMIT={'capacity': 3, 'rate': 0.01})
+    def test_rate_limited_per_username_and_ip(self):
+        for _ in range(3):
+            self.login('drhouse', password='wrong')
+        response = self.login('drhouse')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        # Another client IP still can't hammer the same account...
+        self.assertEqual(self.login('drhouse', REMOTE_ADDR='10.0.0.2').status_code, 429)
+        # ...and this IP is out of attempts for any account.
+        self.assertEqual(self.login('other@medicare.com').status_code, 429)
+
+    @override_settings(LOGIN_RATE_LIMIT={'capacity': 3, 'rate': 0.01})
+    def test_successful_logins_dont_spend_the_username_limit(self):
+        for i in range(5):
+            self.assertEqual(self.login('drhouse', REMOTE_ADDR=f'10.0.0.{i}').status_code, 200)
+
+    @override_settings(LOGIN_RATE_LIMIT={'capacity': 3, 'rate': 0.01})
+    def test_forwarded_for_is_not_trusted_without_proxies(self):
+        for i in range(3):
+            self.login(f'nobody{i}', HTTP_X_FORWARDED_FOR=f'10.0.0.{i}')
+        self.assertEqual(self.login('drhouse', HTTP_X_FORWARDED_FOR='10.0.0.9').status_code, 429)
+
+    def test_email_is_unique_ignoring_case(self):
+        response = self.client.post('/api/users/', {'username': 'house2', 'email': 'DRHOUSE@medicare.com',
+                                                    'password': 'Secret@123', 'first_name': 'G', 'last_name': 'H'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('email', response.data)
+
+
+class DoctorSearchTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        self.house = self.make_user('house', role='doctor', is_verified=True, specialization='Cardiology',
+                                    experience=12, rating=4.8, address='221B Baker Street, Princeton')
+        self.cuddy = self.make_user('cuddy', role='doctor', is_verified=True, specialization='Cardiology',
+                                    experience=20, rating=4.9, bio='Dean of medicine')
+        self.wilson = self.make_user('wilson', role='doctor', is_verified=True, specialization='Oncology',
+                                     experience=5, rating=4.1, bio='Works with cardiology on trials')
+        self.make_user('unverified', role='doctor', specialization='Cardiology')
+        self.make_user('patient', bio='Cardiology patient')
+        self.client = self.client_for(None)
+
+    def search(self, query):
+        response = self.client.get('/api/users/doctors/search/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [doctor['username'] for doctor in response.data]
+
+    def test_ranked_by_field_then_rating(self):
+        # Specialization outranks a bio mention; ties go to the higher rating
+        self.assertEqual(self.search('cardiology'), ['cuddy', 'house', 'wilson'])
+        self.assertEqual(self.search('Dr. House cardiology'), ['house'])
+        self.assertEqual(self.search('princeton'), ['house'])
+
+    def test_prefix_and_typos(self):
+        self.assertEqual(self.search('cardio'), ['cuddy', 'house', 'wilson'])
+        self.assertEqual(self.search('cardiolgy'), ['cuddy', 'house', 'wilson'])
+        self.assertEqual(self.search('oncolgoy wislon'), ['wilson'])
+        self.assertEqual(self.search('bakr'), ['house'])
+        self.assertEqual(self.search('xyzzy'), [])
+
+    def test_kept_in_sync_with_doctors(self):
+        self.wilson.specialization = 'Neurology'
+        self.wilson.save()
+        self.assertEqual(self.search('neuro'), ['wilson'])
+        self.assertEqual(self.search('oncology'), [])
+
+        self.house.is_verified = False
+        self.house.save()
+        self.assertEqual(self.search('princeton'), [])
+        self.cuddy.delete()
+        self.assertEqual(self.search('dean'), [])
+
+    def test_validation_and_limit(self):
+        self.assertEqual(self.client.get('/api/users/doctors/search/').status_code, 400)
+        self.assertEqual(self.client.get('/api/users/doctors/search/?q=x&limit=500').status_code, 400)
+        response = self.client.get('/api/users/doctors/search/?q=cardiology&limit=1&view=summary')
+        self.assertEqual([doctor['username'] for doctor in response.data], ['cuddy'])
+        self.assertNotIn('bio', response.data[0])
+
+    def test_query_count(self):
+        with self.assertNumQueries(5):  # trigrams + postings per word, then the rows shown
+            self.search('cardiolgy princeton')
+
+    def test_unused_trigrams_are_dropped(self):
+        self.house.address = ''
+        self.house.save()
+        self.assertFalse(SearchTrigram.objects.filter(term='princeton').exists())
+
+
+@override_settings(DOCTOR_SEARCH_BACKEND='accounts.search.MemoryIndex')
+class MemoryDoctorSearchTests(DoctorSearchTests):
+
+    def setUp(self):
+        get_search_index().reset()  # earlier tests' rows were rolled back
+        super().setUp()
+
+    def test_query_count(self):
+        self.search('cardiology')  # first search loads the index
+        with self.assertNumQueries(1):
+            self.search('cardiolgy princeton')
+
+    def test_unused_trigrams_are_dropped(self):
+        index = get_search_index()
+        self.search('princeton')
+        self.house.address = ''
+        self.house.save()
+        self.assertNotIn('princeton', index.terms_by_gram['pri'])
+        self.assertNotIn('princeton', index.vocabulary)
+
+
+class NearbyDoctorTests(QueryBudgetTestCase):
+    MUMBAI = (19.0760, 72.8777)
+
+    def setUp(self):
+        self.house = self.make_user('house', role='doctor', is_verified=True,
+                                    clinic_latitude=19.0760, clinic_longitude=72.8777)
+        self.cuddy = self.make_user('cuddy', role='doctor', is_verified=True,
+                                    clinic_latitude=19.1000, clinic_longitude=72.8900)  # ~3 km away
+        self.wilson = self.make_user('wilson', role='doctor', is_verified=True,
+                                     clinic_latitude=18.5204, clinic_longitude=73.8567)  # Pune, ~120 km
+        self.make_user('unverified', role='doctor', clinic_latitude=19.0761, clinic_longitude=72.8777)
+        self.nowhere = self.make_user('nowhere', role='doctor', is_verified=True)
+        self.client = self.client_for(None)
+
+    def nearby(self, radius, lat=MUMBAI[0], lon=MUMBAI[1]):
+        response = self.client.get('/api/users/doctors/nearby/',
+                                   {'lat': lat, 'lon': lon, 'radius': radius, 'limit': 100})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_nearest_first_within_radius(self):
+        with self.assertNumQueries(5):  # 1, 2, 4 and 5 km rings, then the rows shown
+            doctors = self.nearby(5)
+        self.assertEqual([doctor['username'] for doctor in doctors], ['house', 'cuddy'])
+        self.assertEqual(doctors[0]['distance_km'], 0)
+        self.assertAlmostEqual(doctors[1]['distance_km'], 2.93, places=1)
+        self.assertEqual([doctor['username'] for doctor in self.nearby(200)], ['house', 'cuddy', 'wilson'])
+
+    def test_matches_brute_force(self):
+        rng = random.Random(17)
+        clinics = {}
+        for i in range(60):
+            lat, lon = self.MUMBAI[0] + rng.uniform(-0.5, 0.5), self.MUMBAI[1] + rng.uniform(-0.5, 0.5)
+            clinics[self.make_user(f'doctor{i}', role='doctor', is_verified=True,
+                                   clinic_latitude=lat, clinic_longitude=lon).username] = (lat, lon)
+        for radius in (1, 7.5, 20, 45):
+            for _ in range(3):
+                lat, lon = self.MUMBAI[0] + rng.uniform(-0.3, 0.3), self.MUMBAI[1] + rng.uniform(-0.3, 0.3)
+                expected = {name for name, point in clinics.items() if distance_km(lat, lon, *point) <= radius}
+                found = {doctor['username'] for doctor in self.nearby(radius, lat, lon)
+                         if doctor['username'] in clinics}
+                self.assertEqual(found, expected)
+
+    def test_coordinates_from_profile(self):
+        client = self.client_for(self.nowhere)
+        self.assertEqual(client.patch('/api/users/profile/', {'clinic_latitude': 19.08}).status_code, 400)
+        response = client.patch('/api/users/profile/', {'clinic_latitude': 19.08, 'clinic_longitude': 72.88})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('nowhere', [doctor['username'] for doctor in self.nearby(2)])
+
+        self.nowhere.refresh_from_db()
+        self.nowhere.clinic_latitude = self.nowhere.clinic_longitude = None
+        self.nowhere.save()
+        self.assertEqual(self.nowhere.clinic_geohash, '')
+
+    def test_invalid_params(self):
+        self.assertEqual(self.client.get('/api/users/doctors/nearby/?lon=72.8').status_code, 400)
+        self.assertEqual(self.client.get('/api/users/doctors/nearby/?lat=95&lon=72.8').status_code, 400)
+        self.assertEqual(self.client.get('/api/users/doctors/nearby/?lat=19&lon=72.8&radius=0').status_code, 400)
+
+    def test_import_csv(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'clinics.csv')
+            with open(path, 'w') as handle:
+                handle.write('username,lat,lon\nnowhere,19.0765,72.8780\nghost,1,1\nhouse,abc,1\n')
+            call_command('import_clinic_coordinates', path, stdout=open(os.devnull, 'w'),
+                         stderr=open(os.devnull, 'w'))
+        self.assertEqual([doctor['username'] for doctor in self.nearby(1)], ['house', 'nowhere'])
+
+
+class UserImportTests(QueryBudgetTestCase):
+    CSV = (
+        'email,password,first_name,last_name,role,specialization,experience,blood_group,date_of_birth\n'
+        'grey@medicare.com,Secret@123,Meredith,Grey,doctor,Surgery,12,,\n'
+        'jane@example.com,Secret@123,Jane,Doe,,,,O+,1990-04-01\n'
+        'DRHOUSE@medicare.com,Secret@123,Greg,House,doctor,,,,\n'   # taken (any case)
+        'Grey@Medicare.com,Secret@123,Other,Grey,doctor,,,,\n'      # repeats line 2
+        'short@example.com,short,Short,Password,,,,,\n'
+        'nolast@example.com,Secret@123,No,,,,,,\n'
+        'bad@example.com,Secret@123,Bad,Role,surgeon,,ten,,\n'
+    )
+
+    def setUp(self):
+        login_buckets.clear()
+        self.make_user('drhouse', role='doctor')
+
+    def run_import(self, text, **kwargs):
+        return UserImporter(**{'workers': 1, **kwargs}).run(read_csv(io.StringIO(text)))
+
+    def test_creates_valid_rows_and_reports_the_rest(self):
+        # Per batch: the email check, the users, the profiles, however many rows
+        with self.assertNumQueries(3 + 2):  # + the savepoint pair around the batch
+            result = self.run_import(self.CSV)
+        self.assertEqual(result.created, 2)
+        self.assertEqual({line: sorted(fields) for line, fields in result.errors},
+                         {4: ['email'], 5: ['email'], 6: ['password'], 7: ['last_name'], 8: ['experience', 'role']})
+
+        grey = User.objects.get(email='grey@medicare.com')
+        self.assertEqual((grey.username, grey.role, grey.specialization, grey.experience, grey.is_verified),
+                         ('grey@medicare.com', 'doctor', 'Surgery', 12, False))
+        self.assertTrue(grey.check_password('Secret@123'))
+        self.assertFalse(PatientProfile.objects.filter(user=grey).exists())
+        jane = User.objects.get(email='jane@example.com')
+        self.assertEqual(jane.role, 'patient')
+        self.assertEqual((jane.profile.blood_group, str(jane.profile.date_of_birth)), ('O+', '1990-04-01'))
+        self.assertEqual(self.client.post('/api/auth/login/', {'username': 'jane@example.com',
+                                                                'password': 'Secret@123'}).status_code, 200)
+
+    def test_batches_and_process_pool(self):
+        rows = ''.join(f'user{i}@example.com,Secret@{i:04d},User,{i}\n' for i in range(25))
+        result = self.run_import('email,password,first_name,last_name\n' + rows, batch_size=10, workers=2)
+        self.assertEqual((result.created, result.errors), (25, []))
+        user = User.objects.get(email='user7@example.com')
+        self.assertTrue(user.check_password('Secret@0007'))
+        self.assertEqual(PatientProfile.objects.filter(user__email__startswith='user').count(), 25)
+
+    def test_email_taken_after_validation(self):
+        rows = 'email,password,first_name,last_name\nnew@example.com,Secret@123,New,User\n'
+        with patch.object(UserImporter, 'taken', return_value=set()):
+            result = self.run_import(rows + 'drhouse@medicare.com,Secret@123,Greg,House\n')
+        self.assertEqual(result.created, 1)
+        self.assertEqual(result.errors, [(3, {'email': ['A user with this email already exists.']})])
+        self.assertTrue(User.objects.filter(email='new@example.com').exists())
+
+    def test_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path, errors = os.path.join(directory, 'users.csv'), os.path.join(directory, 'errors.csv')
+            with open(path, 'w', newline='') as handle:
+                handle.write(self.CSV)
+            out = io.StringIO()
+            call_command('import_users', path, '--workers', '1', '--errors', errors, stdout=out, stderr=io.StringIO())
+            self.assertIn('Created 2 users', out.getvalue())
+            with open(errors, newline='') as handle:
+                self.assertEqual(len(handle.read().splitlines()), 1 + 6)
+
+            with open(path, 'w') as handle:
+                handle.write('email,password\nx@example.com,Secret@123\n')
+            with self.assertRaisesMessage(CommandError, 'first_name, last_name'):
+                call_command('import_users', path, stdout=io.StringIO())
+
+    def test_admin_upload(self):
+        admin_user = self.make_user('root', is_staff=True, is_superuser=True)
+        self.client.force_login(admin_user)
+        self.assertContains(self.client.get('/admin/accounts/user/'), '/admin/accounts/user/import/')
+        upload = SimpleUploadedFile('users.csv', self.CSV.encode())
+        with patch('accounts.admin.UserImporter', lambda: UserImporter(workers=1)):
+            response = self.client.post('/admin/accounts/user/import/', {'csv_file': upload})
+        self.assertContains(response, 'Created 2 users; 5 rows rejected.')
+        self.assertContains(response, 'line 6: password: Password must be at least 8 characters long.')
+
+        self.client.force_login(self.make_user('staff', is_staff=True))
+        self.assertEqual(self.client.get('/admin/accounts/user/import/').status_code, 403)
@@ -0,0 +1,84 @@
+import threading
+import time
+
+from django.conf import settings
+from rest_framework.throttling import BaseThrottle
+
+
+class TokenBucket:
+    """
+    In-memory token buckets, one per key, for this process only. Each key
+    holds up to `capacity` tokens and regains `rate` per second; a request
+    spends one. Full (idle) buckets are forgotten once there are too many keys.
+    """
+    max_keys = 100_000
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets = {}  # key -> (tokens, timestamp)
+
+    def take(self, key, capacity, rate, spend=True):
+        """
+        Spend a token; returns 0 if allowed, else seconds until one is available.
+        With spend=False only checks that one is available.
+        """
+        now = time.monotonic()
+        with self.lock:
+            tokens, stamp = self.buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - stamp) * rate)
+            if tokens < 1:
+                self.buckets[key] = (tokens, now)
+                return (1 - tokens) / rate
+            if not spend:
+                return 0
+            self.buckets[key] = (tokens - 1, now)
+            if len(self.buckets) > self.max_keys:
+                self.forget_idle(now, capacity, rate)
+            return 0
+
+    def forget_idle(self, now, capacity, rate):
+        for key, (tokens, stamp) in list(self.buckets.items()):
+            if tokens + (now - stamp) * rate >= capacity:
+                del self.buckets[key]
+
+    def clear(self):
+        with self.lock:
+            self.buckets.clear()
+
+
+login_buckets = TokenBucket()
+
+
+def username_key(request):
+    username = request.data.get('username') if hasattr(request.data, 'get') else None
+    return f'user:{username.lower()}' if isinstance(username, str) and username else None
+
+
+class LoginRateThrottle(BaseThrottle):
+    """
+    Limits login attempts per client IP (REMOTE_ADDR, or X-Forwarded-For as
+    far as REST_FRAMEWORK['NUM_PROXIES'] trusts it) and failed logins per
+    submitted username/email, using settings.LOGIN_RATE_LIMIT =
+    {'capacity': burst, 'rate': tokens per second} (None disables it). The
+    login view reports failures with failed_login(); a user who keeps logging
+    in successfully, from however many devices, is never held back.
+    """
+
+    def allow_request(self, request, view):
+        limit = settings.LOGIN_RATE_LIMIT
+        self.delay = 0
+        if not limit:
+            return True
+        self.delay = login_buckets.take(f'ip:{self.get_ident(request)}', limit['capacity'], limit['rate'])
+        if key := username_key(request):
+            self.delay = max(self.delay, login_buckets.take(key, limit['capacity'], limit['rate'], spend=False))
+        return self.delay == 0
+
+    @staticmethod
+    def failed_login(request):
+        limit = settings.LOGIN_RATE_LIMIT
+        if limit and (key := username_key(request)):
+            login_buckets.take(key, limit['capacity'], limit['rate'])
+
+    def wait(self):
+        return self.delay
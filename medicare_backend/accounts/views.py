@@ -1,26 +1,47 @@
 from rest_framework import viewsets, permissions, status # Added status
 from rest_framework.decorators import action
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.response import Response
 from django.contrib.auth import get_user_model
-from .serializers import UserSerializer, CustomTokenObtainPairSerializer
+from django.utils.decorators import method_decorator
+from django.views.decorators.cache import never_cache
+from .serializers import UserSerializer, UserSummarySerializer, CustomTokenObtainPairSerializer, DoctorFilterSerializer, DoctorSearchSerializer, DoctorNearbySerializer
+from .directory import get_doctors
+from .geo import nearby_doctors
+from .search import get_search_index
+from api.conditional import Validators, conditional_response, representation_key
 from rest_framework_simplejwt.views import TokenObtainPairView
+from api.pagination import UserKeysetPagination
+from api.routers import ReplicaReadsMixin
+from .throttling import LoginRateThrottle
 
 User = get_user_model()
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(ReplicaReadsMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = UserKeysetPagination
+    # GET only; a profile PATCH still goes to the primary
+    replica_actions = ('doctors', 'search_doctors', 'nearby_doctors', 'profile')
+
+    def get_serializer_class(self):
+        # ?view=summary: compact rows for the user list and doctor directory
+        if self.action in ('list', 'doctors', 'search_doctors', 'nearby_doctors') and self.request.query_params.get('view') == 'summary':
+            return UserSummarySerializer
+        return UserSerializer
     
     # --- UPDATED: Methods now include 'patch' and 'put' ---
     @action(detail=False, methods=['get', 'patch', 'put'], permission_classes=[permissions.IsAuthenticated])
     def profile(self, request):
-        user = request.user
+        # The full, current row: request.user may be built from token claims
+        # (GET) or come from the short-lived per-process user cache (writes).
+        user = User.objects.get(pk=request.user.pk)
         
-        # 1. Handle GET (View Profile)
+        # 1. Handle GET (View Profile) -- 304 if the client's copy is current
         if request.method == 'GET':
-            serializer = self.get_serializer(user)
-            return Response(serializer.data)
+            validators = Validators.for_instance(user, key=representation_key(request))
+            return conditional_response(request, validators, lambda: Response(self.get_serializer(user).data))
 
         # 2. Handle PATCH/PUT (Save Changes)
         elif request.method in ['PATCH', 'PUT']:
@@ -33,19 +54,45 @@ class UserViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def doctors(self, request):
-        doctors = User.objects.filter(role='doctor', is_verified=True)
-        serializer = self.get_serializer(doctors, many=True)
-        return Response(serializer.data)
+        # Optional filters: ?specialization=&min_fee=&max_fee=&min_experience=&min_rating=
+        filters = DoctorFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        data, validators = get_doctors(
+            filters.validated_data,
+            lambda doctors: self.get_serializer(doctors, many=True).data,
+            representation=[request.query_params.get(name, '') for name in ('view', 'fields')],
+        )
+        return conditional_response(request, validators, lambda: Response(data), private=False)
+
+    @action(detail=False, methods=['get'], url_path='doctors/search')
+    def search_doctors(self, request):
+        # ?q=cardio smth&limit=20 -- prefix and typo tolerant, best match first
+        params = DoctorSearchSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        doctors = get_search_index().search(params.validated_data['q'], params.validated_data['limit'])
+        return Response(self.get_serializer(doctors, many=True).data)
+
+    @action(detail=False, methods=['get'], url_path='doctors/nearby')
+    def nearby_doctors(self, request):
+        # ?lat=&lon=&radius=<km>&limit= -- nearest first, each with its distance_km
+        params = DoctorNearbySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        found = nearby_doctors(**params.validated_data)
+        data = self.get_serializer([doctor for _, doctor in found], many=True).data
+        for row, (distance, _) in zip(data, found):
+            row['distance_km'] = round(distance, 2)
+        return Response(data)
     
+@method_decorator(never_cache, name='dispatch')  # no-store: tokens also stay uncompressed (BREACH)
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
+    # 'username' may also be an email: accounts.backends.EmailOrUsernameBackend
+    # resolves both in one query.
+    throttle_classes = [LoginRateThrottle]
 
     def post(self, request, *args, **kwargs):
-        login_input = request.data.get('username')
-        
-        if login_input:
-            user = User.objects.filter(email=login_input).first()
-            if user:
-                request.data['username'] = user.username
-        
-        return super().post(request, *args, **kwargs)
\ No newline at end of file
+        try:
+            return super().post(request, *args, **kwargs)
+        except AuthenticationFailed:  # wrong password, or no such active account
+            LoginRateThrottle.failed_login(request)
+            raise
@@ -2,7 +2,9 @@ from django.contrib import admin
 
 # Register your models here.
 from django.contrib import admin
-from .models import Appointment, PatientProfile
+from django.utils import timezone
+
+from .models import Appointment, Job, PatientProfile
 
 @admin.register(Appointment)
 class AppointmentAdmin(admin.ModelAdmin):
@@ -12,4 +14,19 @@ class AppointmentAdmin(admin.ModelAdmin):
 
 @admin.register(PatientProfile)
 class PatientProfileAdmin(admin.ModelAdmin):
-    list_display = ('user', 'blood_group', 'date_of_birth')
\ No newline at end of file
+    list_display = ('user', 'blood_group', 'date_of_birth')
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'task', 'status', 'attempts', 'max_attempts', 'run_at', 'finished_at')
+    list_filter = ('status', 'task')
+    search_fields = ('task', 'key')
+    readonly_fields = ('attempts', 'locked_by', 'locked_at', 'last_error', 'created_at', 'finished_at')
+    actions = ['retry']
+
+    @admin.action(description="Retry selected jobs now")
+    def retry(self, request, queryset):
+        retried = queryset.exclude(status=Job.RUNNING).update(
+            status=Job.QUEUED, run_at=timezone.now(), attempts=0, locked_by='', locked_at=None, finished_at=None,
+        )
+        self.message_user(request, f"Queued {retried} jobs.")
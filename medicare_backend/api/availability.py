@@ -0,0 +1,189 @@
+"""
+Per-doctor, per-day occupancy bitmaps.
+
+A day is split into 96 fifteen-minute granules; bit i of a DoctorDaySlots
+bitmap is set when an active appointment covers granule i. Answering "which
+slots are free" is then one indexed read per range plus a few integer ANDs
+per day, instead of scanning Appointment rows.
+
+Bitmaps are kept up to date by the Appointment signals in api/signals.py:
+new bookings OR their bits in; cancellations, deletes and reschedules
+rebuild only the affected doctor-day. A doctor's bits depend on their
+slot_minutes, so changing their hours rebuilds all their upcoming days.
+"""
+import datetime
+import math
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+GRANULE_MINUTES = 15
+GRANULES_PER_DAY = 24 * 60 // GRANULE_MINUTES
+BITMAP_BYTES = GRANULES_PER_DAY // 8
+FULL_DAY = (1 << GRANULES_PER_DAY) - 1
+
+
+def to_int(bitmap):
+    return int.from_bytes(bytes(bitmap or b''), 'little')
+
+
+def to_bytes(bits):
+    return (bits & FULL_DAY).to_bytes(BITMAP_BYTES, 'little')
+
+
+def span_mask(start, minutes):
+    """Bits covering `minutes` from time `start` (clipped at midnight)."""
+    first = (start.hour * 60 + start.minute) // GRANULE_MINUTES
+    count = max(1, math.ceil(minutes / GRANULE_MINUTES))
+    return (((1 << count) - 1) << first) & FULL_DAY
+
+
+def day_slots(doctor):
+    """(start time, mask) for every bookable slot in the doctor's working day."""
+    slots = []
+    step = datetime.timedelta(minutes=doctor.slot_minutes)
+    current = datetime.datetime.combine(datetime.date.min, doctor.work_start)
+    end = datetime.datetime.combine(datetime.date.min, doctor.work_end)
+    while current + step <= end:
+        slots.append((current.time(), span_mask(current.time(), doctor.slot_minutes)))
+        current += step
+    return slots
+
+
+def rebuild_bits(appointments, slot_minutes):
+    bits = 0
+    for start in appointments:
+        bits |= span_mask(start, slot_minutes)
+    return bits
+
+
+class SlotUnavailable(Exception):
+    pass
+
+
+def lock_day(doctor, day):
+    """
+    Lock (creating if needed) the doctor-day row. Every booking that touches the
+    same doctor-day queues on this row lock, so conflicting claims serialize.
+    """
+    from .models import DoctorDaySlots
+
+    # Write before reading: the no-op UPDATE takes the row lock on MySQL and the
+    # database write lock on SQLite up front, so waiters queue on the busy timeout
+    # instead of failing a read-to-write lock upgrade.
+    rows = DoctorDaySlots.objects.filter(doctor=doctor, date=day)
+    if not rows.update(occupied=F('occupied')):
+        DoctorDaySlots.objects.get_or_create(doctor=doctor, date=day)
+    return rows.select_for_update().get()
+
+
+def claim_slot(doctor, day, start, replacing=None):
+    """
+    Check, under the doctor-day lock, that [start, start + slot) is free.
+    Must run inside transaction.atomic(); the booking is then saved in the same
+    transaction and the lock is released on commit. `replacing` is the
+    (doctor_id, date, time) the booking being moved currently holds.
+    """
+    bits = to_int(lock_day(doctor, day).occupied)
+    if replacing and replacing[:2] == (doctor.pk, day):
+        bits &= ~span_mask(replacing[2], doctor.slot_minutes)
+    if bits & span_mask(start, doctor.slot_minutes):
+        raise SlotUnavailable
+
+
+def occupy(doctor, day, start):
+    """OR one new booking into the doctor-day bitmap."""
+    with transaction.atomic():
+        row = lock_day(doctor, day)
+        row.occupied = to_bytes(to_int(row.occupied) | span_mask(start, doctor.slot_minutes))
+        row.save(update_fields=['occupied'])
+
+
+_batch = threading.local()
+
+
+@contextmanager
+def batched_rebuilds():
+    """
+    Collect the rebuild_day() calls made inside the block (e.g. one per deleted
+    appointment) and rebuild each distinct doctor-day once when it exits.
+    """
+    if getattr(_batch, 'days', None) is not None:
+        yield
+        return
+    _batch.days = {}
+    try:
+        yield
+        days = _batch.days
+    finally:
+        _batch.days = None
+    for (_, day), doctor in days.items():
+        rebuild_day(doctor, day)
+
+
+def rebuild_day(doctor, day):
+    """Recompute one doctor-day from its active appointments (one indexed query)."""
+    from .models import Appointment, DoctorDaySlots
+
+    if getattr(_batch, 'days', None) is not None:
+        _batch.days[(doctor.pk, day)] = doctor
+        return
+
+    times = Appointment.objects.filter(doctor=doctor, date=day, holds_slot=True).values_list('time', flat=True)
+    bits = rebuild_bits(times, doctor.slot_minutes)
+    # update() rather than update_or_create(): while a doctor is being deleted the
+    # cascade fires these rebuilds and must not re-insert rows pointing at them.
+    updated = DoctorDaySlots.objects.filter(doctor=doctor, date=day).update(occupied=to_bytes(bits))
+    if not updated and bits:
+        DoctorDaySlots.objects.create(doctor=doctor, date=day, occupied=to_bytes(bits))
+
+
+def rebuild_doctor(doctor, since=None):
+    """Recompute the doctor's days from `since` (default today), e.g. after their slot length changed."""
+    from .models import Appointment, DoctorDaySlots
+
+    since = since or timezone.localdate()
+    starts = defaultdict(list)
+    booked = Appointment.objects.filter(doctor=doctor, date__gte=since, holds_slot=True).values_list('date', 'time')
+    for day, start in booked:
+        starts[day].append(start)
+    stored = set(DoctorDaySlots.objects.filter(doctor=doctor, date__gte=since).values_list('date', flat=True))
+    with transaction.atomic():
+        for day in stored | set(starts):
+            bits = to_bytes(rebuild_bits(starts.get(day, ()), doctor.slot_minutes))
+            if day in stored:
+                DoctorDaySlots.objects.filter(doctor=doctor, date=day).update(occupied=bits)
+            else:
+                DoctorDaySlots.objects.create(doctor=doctor, date=day, occupied=bits)
+
+
+def free_slots(doctor, start, end):
+    """
+    Free slot start times per day in [start, end], read from the stored bitmaps.
+    Days in the past, non-working days and already-passed slots today are empty.
+    """
+    from .models import DoctorDaySlots
+
+    occupied = {
+        row.date: to_int(row.occupied)
+        for row in DoctorDaySlots.objects.filter(doctor=doctor, date__range=(start, end))
+    }
+    now = timezone.localtime()
+    slots = day_slots(doctor)
+    days = []
+    day = start
+    while day <= end:
+        free = []
+        if day >= now.date() and doctor.works_on(day):
+            bits = occupied.get(day, 0)
+            free = [
+                slot.strftime('%H:%M') for slot, mask in slots
+                if not bits & mask and (day > now.date() or slot > now.time())
+            ]
+        days.append({'date': day.isoformat(), 'slots': free})
+        day += datetime.timedelta(days=1)
+    return days
@@ -0,0 +1,99 @@
+"""
+Appointment change feed.
+
+Every save and delete of an Appointment appends an AppointmentChange row in
+the same transaction. A client keeps a local copy current by asking for the
+entries after its cursor (the id of the last entry it has seen):
+
+    GET /api/appointments/changes/            -> {"cursor": N, "changes": []}
+    GET /api/appointments/                    -> full list, once
+    GET /api/appointments/changes/?since=N    -> upserts and delete tombstones after N
+
+Ids are handed out when a row is inserted, not when its transaction commits,
+so a slow transaction can commit an id lower than one a reader has already
+passed. Entries younger than CHANGE_FEED_SETTLE are therefore held back, and
+a page stops at the first one, so the cursor never moves past them.
+"""
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .models import Appointment, AppointmentChange
+
+
+class CursorExpired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = 'Cursor is older than the change log retention; reload the full list.'
+    default_code = 'cursor_expired'
+
+
+def record_save(appointment):
+    """Log a saved appointment; a change of patient/doctor also tombstones it for the old pair."""
+    previous = getattr(appointment, '_stored_parties', None)
+    current = (appointment.patient_id, appointment.doctor_id)
+    entries = []
+    if previous and previous != current:
+        entries.append(AppointmentChange(appointment_id=appointment.pk, patient_id=previous[0],
+                                         doctor_id=previous[1], action=AppointmentChange.DELETE))
+    entries.append(AppointmentChange(appointment_id=appointment.pk, patient_id=current[0],
+                                     doctor_id=current[1], action=AppointmentChange.UPSERT))
+    AppointmentChange.objects.bulk_create(entries)
+    appointment._stored_parties = current
+
+
+def record_delete(appointment):
+    AppointmentChange.objects.create(appointment_id=appointment.pk, patient_id=appointment.patient_id,
+                                     doctor_id=appointment.doctor_id, action=AppointmentChange.DELETE)
+
+
+def record_updates(ids):
+    """For queryset.update() callers, which bypass the post_save signal."""
+    rows = Appointment.objects.filter(id__in=ids).values_list('id', 'patient_id', 'doctor_id')
+    AppointmentChange.objects.bulk_create([
+        AppointmentChange(appointment_id=pk, patient_id=patient_id, doctor_id=doctor_id,
+                          action=AppointmentChange.UPSERT)
+        for pk, patient_id, doctor_id in rows
+    ])
+
+
+def latest_cursor(log):
+    settled = log.filter(created_at__lte=timezone.now() - settings.CHANGE_FEED_SETTLE)
+    return settled.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def read_changes(log, since, limit):
+    """
+    Entries of `log` (already scoped to the caller) after `since`, coalesced to
+    the last action per appointment. Returns ({appointment_id: action} in log
+    order, new cursor, has_more).
+    """
+    if since:
+        oldest = AppointmentChange.objects.order_by('id').values_list('id', flat=True).first()
+        # A cursor at oldest - 1 has seen everything that was pruned
+        if oldest is not None and since < oldest - 1:
+            raise CursorExpired()
+
+    entries = list(log.filter(id__gt=since).order_by('id')[:limit + 1])
+    has_more = len(entries) > limit
+    settled_before = timezone.now() - settings.CHANGE_FEED_SETTLE
+    cutoff = next((i for i, entry in enumerate(entries[:limit]) if entry.created_at > settled_before), None)
+    if cutoff is not None:
+        entries, has_more = entries[:cutoff], False
+    else:
+        entries = entries[:limit]
+
+    actions = {}
+    for entry in entries:
+        actions.pop(entry.appointment_id, None)  # re-insert: order by the latest entry
+        actions[entry.appointment_id] = entry.action
+    return actions, (entries[-1].id if entries else since), has_more
+
+
+def prune(before):
+    """Delete entries older than `before`, always keeping the newest one."""
+    newest = AppointmentChange.objects.order_by('-id').values_list('id', flat=True).first()
+    if newest is None:
+        return 0
+    deleted, _ = AppointmentChange.objects.filter(created_at__lt=before, id__lt=newest).delete()
+    return deleted
@@ -0,0 +1,74 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+
+class Validators:
+    """
+    ETag/Last-Modified for a response built from rows with an `updated_at`
+    column: the row count plus the newest timestamps. Any save bumps a
+    timestamp and any delete changes the count, so both change whenever the
+    rows behind the response do.
+    """
+
+    def __init__(self, count, timestamps, key=''):
+        timestamps = [ts for ts in timestamps if ts is not None]
+        self.last_modified = max(timestamps) if timestamps else None
+        digest = hashlib.sha256(repr((key, count, sorted(timestamps))).encode()).hexdigest()[:32]
+        self.etag = f'"{digest}"'
+
+    @classmethod
+    def for_instance(cls, instance, key=''):
+        return cls(1, [instance.updated_at], key)
+
+    @classmethod
+    def for_instances(cls, instances, key=''):
+        return cls(len(instances), [max((i.updated_at for i in instances), default=None)], key)
+
+    @classmethod
+    def for_queryset(cls, queryset, fields=('updated_at',), key=''):
+        """One COUNT/MAX aggregate; no rows are loaded. `fields` may span joins."""
+        values = queryset.order_by().aggregate(
+            count=Count('pk'), **{f'max_{i}': Max(field) for i, field in enumerate(fields)}
+        )
+        count = values.pop('count')
+        return cls(count, list(values.values()), key)
+
+    def to_dict(self):
+        return {'etag': self.etag, 'last_modified': self.last_modified}
+
+    @classmethod
+    def from_dict(cls, data):
+        validators = cls.__new__(cls)
+        validators.etag, validators.last_modified = data['etag'], data['last_modified']
+        return validators
+
+
+def representation_key(request):
+    """Who is asking and for which URL: part of every ETag so variants never share one."""
+    return f'{request.user.pk}:{request.get_full_path()}'
+
+
+def conditional_response(request, validators, build, private=True):
+    """
+    Answer 304 Not Modified when the client's If-None-Match/If-Modified-Since
+    still match `validators`, otherwise call build() for the full response.
+    Either way the validators are attached and the client is told to
+    revalidate before reusing its copy.
+    """
+    last_modified = int(validators.last_modified.timestamp()) if validators.last_modified else None
+    response = get_conditional_response(request, etag=validators.etag, last_modified=last_modified)
+    if response is None:
+        response = build()
+    if response.status_code in (200, 304):
+        response['ETag'] = validators.etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        if private:
+            patch_cache_control(response, no_cache=True, private=True)
+            patch_vary_headers(response, ('Authorization',))
+        else:
+            patch_cache_control(response, no_cache=True, public=True)
+    return response
@@ -0,0 +1,162 @@
+"""
+In-process pub/sub for real-time appointment events (see api/push.py).
+
+Events are published after the transaction commits, to one channel per
+user ('user:<id>') for the appointment's patient and doctor. The backend is
+chosen by settings.EVENT_BROKER:
+
+    InMemoryBackend     subscribers in this process only (tests, one worker)
+    UnixSocketBackend   every worker on this host binds a datagram socket in
+                        a shared directory; publish sends to all of them. A
+                        local stand-in for Redis pub/sub with no extra service.
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+CREATED = 'appointment.created'
+STATUS_CHANGED = 'appointment.status_changed'
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+class InMemoryBackend:
+    # Events waiting for a slow client beyond this are dropped for that client.
+    queue_size = 100
+
+    def __init__(self, **options):
+        self.lock = threading.Lock()
+        self.subscribers = defaultdict(set)  # channel -> {(loop, queue)}
+
+    def subscribe(self, channel):
+        """Called on the event loop that will read the returned asyncio.Queue."""
+        queue = asyncio.Queue(self.queue_size)
+        with self.lock:
+            self.subscribers[channel].add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, channel, queue):
+        with self.lock:
+            entries = self.subscribers.get(channel, set())
+            entries.difference_update({entry for entry in entries if entry[1] is queue})
+            if not entries:
+                self.subscribers.pop(channel, None)
+
+    def publish(self, channel, event):
+        """Thread-safe; may be called from sync code outside any event loop."""
+        self.deliver(channel, event)
+
+    def deliver(self, channel, event):
+        # One wake-up per event loop, not per subscriber
+        by_loop = defaultdict(list)
+        with self.lock:
+            for loop, queue in self.subscribers.get(channel, ()):
+                by_loop[loop].append(queue)
+        for loop, queues in by_loop.items():
+            loop.call_soon_threadsafe(offer_all, queues, event)
+
+
+def offer(queue, event):
+    if not queue.full():
+        queue.put_nowait(event)
+
+
+def offer_all(queues, event):
+    for queue in queues:
+        offer(queue, event)
+
+
+class UnixSocketBackend(InMemoryBackend):
+    max_datagram = 64 * 1024
+
+    def __init__(self, path='/tmp/medicare-events', **options):
+        super().__init__(**options)
+        self.path = path
+        self.sock = None
+
+    def subscribe(self, channel):
+        if self.sock is None:
+            self.bind()
+        return super().subscribe(channel)
+
+    def bind(self):
+        os.makedirs(self.path, exist_ok=True)
+        address = os.path.join(self.path, f'{os.getpid()}.sock')
+        if os.path.exists(address):
+            os.unlink(address)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.bind(address)
+        self.sock.setblocking(False)
+        asyncio.get_running_loop().add_reader(self.sock.fileno(), self.receive)
+
+    def receive(self):
+        try:
+            while True:
+                message = json.loads(self.sock.recv(self.max_datagram))
+                self.deliver(message['channel'], message['event'])
+        except BlockingIOError:
+            pass
+
+    def publish(self, channel, event):
+        payload = json.dumps({'channel': channel, 'event': event}).encode()
+        try:
+            peers = [name for name in os.listdir(self.path) if name.endswith('.sock')]
+        except FileNotFoundError:
+            return  # no worker has subscribed yet
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sender:
+            sender.setblocking(False)
+            for name in peers:
+                address = os.path.join(self.path, name)
+                try:
+                    sender.sendto(payload, address)
+                except (ConnectionRefusedError, FileNotFoundError):
+                    # The worker that bound it has exited
+                    try:
+                        os.unlink(address)
+                    except FileNotFoundError:
+                        pass
+                except BlockingIOError:
+                    logger.warning("Event dropped: %s is not reading its socket", address)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            config = settings.EVENT_BROKER
+            _broker = import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+    return _broker
+
+
+def appointment_payload(appointment_id, patient_id, doctor_id, day, start, status):
+    return {'id': appointment_id, 'patient': patient_id, 'doctor': doctor_id,
+            'date': str(day), 'time': str(start), 'status': status}
+
+
+def publish_on_commit(kind, appointment, previous_status=None):
+    """Send `appointment` (an appointment_payload dict) to its patient and doctor once committed."""
+    event = {'type': kind, 'appointment': appointment}
+    if previous_status is not None:
+        event['previous_status'] = previous_status
+
+    def send():
+        broker = get_broker()
+        for user_id in {appointment['patient'], appointment['doctor']}:
+            broker.publish(user_channel(user_id), event)
+    transaction.on_commit(send)
@@ -0,0 +1,78 @@
+"""
+Appointment export for reporting: CSV or NDJSON, streamed.
+
+Rows are flat (doctor and patient names joined in the same query, no nested
+serializers) and read one day at a time, in date, time, id order. Only one
+day's rows are in memory at once, also on MySQL, whose driver buffers a whole
+result set even with iterator(). CSV text cells that a spreadsheet would
+evaluate as a formula are prefixed with '.
+"""
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+COLUMNS = ['id', 'date', 'time', 'status', 'doctor_id', 'doctor_name', 'specialization',
+           'patient_id', 'patient_name', 'consultation_fee', 'created_at']
+FIELDS = ['id', 'date', 'time', 'status', 'doctor_id', 'doctor__first_name', 'doctor__last_name',
+          'doctor__specialization', 'patient_id', 'patient__first_name', 'patient__last_name',
+          'consultation_fee', 'created_at']
+CONTENT_TYPES = {'csv': 'text/csv; charset=utf-8', 'ndjson': 'application/x-ndjson'}
+# Text cells starting with these are formulas to a spreadsheet (CSV injection)
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def filter_appointments(queryset, start=None, end=None, doctor=None):
+    if start:
+        queryset = queryset.filter(date__gte=start)
+    if end:
+        queryset = queryset.filter(date__lte=end)
+    if doctor:
+        queryset = queryset.filter(doctor_id=doctor)
+    return queryset
+
+
+def rows(queryset, chunk_size=2000):
+    """Export rows (tuples in COLUMNS order), one query per day that has appointments."""
+    # Not .dates(): its date truncation can't use the (date, status) index
+    days = list(queryset.order_by('date').values_list('date', flat=True).distinct())
+    for day in days:
+        day_rows = queryset.filter(date=day).order_by('time', 'id').values_list(*FIELDS)
+        for (pk, date, time, status, doctor_id, doctor_first, doctor_last, specialization,
+             patient_id, patient_first, patient_last, fee, created_at) in day_rows.iterator(chunk_size=chunk_size):
+            yield (pk, date, time, status, doctor_id, f'{doctor_first} {doctor_last}'.strip(), specialization,
+                   patient_id, f'{patient_first} {patient_last}'.strip(), fee, created_at)
+
+
+def defuse(value):
+    """Prefix text a spreadsheet would evaluate with ', which it shows as plain text."""
+    return f"'{value}" if isinstance(value, str) and value.startswith(FORMULA_PREFIXES) else value
+
+
+class Echo:
+    """csv.writer target that hands back what it is given."""
+
+    def write(self, value):
+        return value
+
+
+def encode(rows, kind, batch=500):
+    """Text chunks of `batch` rows each, CSV (with a header) or NDJSON."""
+    if kind == 'csv':
+        writerow = csv.writer(Echo()).writerow
+        yield writerow(COLUMNS)
+
+        def line(row):
+            return writerow([defuse(value) for value in row])
+    else:
+        encoder = DjangoJSONEncoder()
+
+        def line(row):
+            return encoder.encode(dict(zip(COLUMNS, row))) + '\n'
+    lines = []
+    for row in rows:
+        lines.append(line(row))
+        if len(lines) >= batch:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
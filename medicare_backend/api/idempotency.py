@@ -0,0 +1,65 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+
+class IdempotentCreateMixin:
+    """
+    Makes POST (create) safe to retry. When the client sends an
+    `Idempotency-Key` header, the first response for that user+key is stored
+    and replayed for any retry with the same body, so a timeout-and-retry
+    never books twice. The same key with a different body is rejected (422),
+    and a retry that arrives while the first request is still running gets 409.
+    """
+    idempotency_header = 'HTTP_IDEMPOTENCY_KEY'
+
+    def get_fingerprint(self, request):
+        body = json.dumps(request.data, sort_keys=True, cls=DjangoJSONEncoder)
+        return hashlib.sha256(f'{request.method}:{request.path}:{body}'.encode()).hexdigest()
+
+    def create(self, request, *args, **kwargs):
+        key = request.META.get(self.idempotency_header)
+        if not key:
+            return super().create(request, *args, **kwargs)
+        if len(key) > 255:
+            return Response({'detail': 'Idempotency-Key must be at most 255 characters.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        fingerprint = self.get_fingerprint(request)
+        expired_before = timezone.now() - settings.IDEMPOTENCY_KEY_TTL
+        IdempotencyKey.objects.filter(user=request.user, key=key, created_at__lt=expired_before).delete()
+        # Committed immediately (no surrounding transaction), so a concurrent retry sees it.
+        record, created = IdempotencyKey.objects.get_or_create(
+            user=request.user, key=key, defaults={'fingerprint': fingerprint}
+        )
+
+        if not created:
+            if record.fingerprint != fingerprint:
+                return Response({'detail': 'Idempotency-Key was already used with a different request.'},
+                                status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+            if record.status_code is None:
+                return Response({'detail': 'A request with this Idempotency-Key is still in progress.'},
+                                status=status.HTTP_409_CONFLICT)
+            return Response(record.response_body, status=record.status_code,
+                            headers={'Idempotent-Replayed': 'true'})
+
+        try:
+            response = super().create(request, *args, **kwargs)
+        except Exception:
+            # Nothing was stored; let the client retry with the same key.
+            record.delete()
+            raise
+        if response.status_code >= 500:
+            record.delete()
+        else:
+            record.status_code = response.status_code
+            record.response_body = response.data
+            record.save(update_fields=['status_code', 'response_body'])
+        return response
@@ -0,0 +1,266 @@
+"""
+Background jobs, queued in the database: no broker, and nothing else to run
+but `python manage.py run_jobs`.
+
+    @task(max_attempts=3)
+    def send_booking_confirmation(appointment_id): ...
+
+    send_booking_confirmation.enqueue(appointment_id=appointment.pk)
+    send_booking_confirmation.enqueue(appointment_id=appointment.pk, delay=timedelta(hours=1))
+
+enqueue() writes a Job row in the caller's transaction, so a worker only
+sees it once that commits and a rollback drops it with the rest. Arguments
+are keyword arguments stored as JSON: pass ids, not instances (the job runs
+later, against whatever the row is by then).
+
+Workers claim due jobs with SELECT ... FOR UPDATE SKIP LOCKED where the
+database has it (MySQL 8, PostgreSQL); on SQLite, whose writers take turns
+anyway, a conditional UPDATE decides which worker gets a job. A job that
+raises is retried with exponential backoff up to its max_attempts, then left
+FAILED (the admin can retry it). A job still running after JOB_LEASE is
+presumed lost with its worker and retried too, so jobs run at least once:
+make them safe to repeat.
+
+JOB_SCHEDULE runs tasks periodically. Every worker enqueues each period's
+run under the same key, and the unique key lets one through.
+"""
+import functools
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, connections, router, transaction
+from django.db.models import F, Subquery
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Seconds between sweeps for lost and expired jobs
+SWEEP_INTERVAL = 60
+LOST = "Worker lost: still running after JOB_LEASE."
+
+
+class Task:
+    """A function that can also be queued; see @task."""
+
+    def __init__(self, function, max_attempts=None):
+        functools.update_wrapper(self, function)
+        self.function = function
+        self.name = f'{function.__module__}.{function.__qualname__}'
+        self.max_attempts = max_attempts
+
+    def __call__(self, *args, **kwargs):
+        return self.function(*args, **kwargs)
+
+    def enqueue(self, *, delay=None, run_at=None, key=None, **kwargs):
+        """Queue a call with `kwargs`; see enqueue()."""
+        return enqueue(self.name, kwargs, delay=delay, run_at=run_at, key=key, max_attempts=self.max_attempts)
+
+
+def task(function=None, *, max_attempts=None):
+    """Make a module-level function queueable. max_attempts defaults to JOB_MAX_ATTEMPTS."""
+    if function is None:
+        return functools.partial(task, max_attempts=max_attempts)
+    return Task(function, max_attempts)
+
+
+def jobs():
+    # Always the primary: a worker must see the row it just claimed
+    return Job.objects.using(router.db_for_write(Job))
+
+
+def enqueue(task_name, kwargs=None, *, delay=None, run_at=None, key=None, max_attempts=None):
+    """
+    Queue a run of the task at dotted path `task_name`, due now, after `delay`
+    or at `run_at`. With a `key`, nothing is queued (and None returned) if a
+    job with that key exists already.
+    """
+    job = Job(task=task_name, kwargs=kwargs or {}, run_at=run_at or timezone.now() + (delay or timedelta()),
+              key=key, max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS)
+    try:
+        # A savepoint, so a duplicate key leaves the caller's transaction usable
+        with transaction.atomic(using=jobs().db):
+            job.save(using=jobs().db)
+    except IntegrityError:
+        if key is None:
+            raise
+        return None
+    if settings.JOBS_RUN_EAGERLY:
+        transaction.on_commit(lambda: run_now(job.pk), using=jobs().db)
+    return job
+
+
+def run_now(pk):
+    for job in claim(f'eager:{os.getpid()}', ids=[pk]):
+        execute(job)
+
+
+def claim(worker, limit=1, ids=None):
+    """Mark up to `limit` due jobs RUNNING for `worker` and return them."""
+    now = timezone.now()
+    token = f'{worker}:{uuid.uuid4().hex[:8]}'  # tells this claim's jobs from a later one's
+    due = jobs().filter(status=Job.QUEUED, run_at__lte=now).order_by('run_at', 'id')
+    if ids is not None:
+        due = due.filter(pk__in=ids)
+    claimed = {'status': Job.RUNNING, 'locked_by': token, 'locked_at': now, 'attempts': F('attempts') + 1}
+    if connections[due.db].features.has_select_for_update_skip_locked:
+        with transaction.atomic(using=due.db):
+            pks = list(due.select_for_update(skip_locked=True).values_list('pk', flat=True)[:limit])
+            if not pks:
+                return []
+            jobs().filter(pk__in=pks).update(**claimed)
+    else:
+        # SQLite: one UPDATE picks and marks the jobs, so the write lock is taken
+        # up front (upgrading a read lock fails at once if another worker waits)
+        if not jobs().filter(pk__in=Subquery(due.values('pk')[:limit])).update(**claimed):
+            return []
+    return list(jobs().filter(locked_by=token, status=Job.RUNNING).order_by('run_at', 'id'))
+
+
+def backoff(attempt):
+    """Delay before retry number `attempt`: doubling from JOB_RETRY_BACKOFF, jittered, capped."""
+    delay = min(settings.JOB_RETRY_BACKOFF * 2 ** (attempt - 1), settings.JOB_RETRY_BACKOFF_MAX)
+    return delay * random.uniform(0.75, 1.25)
+
+
+def execute(job):
+    """Run a claimed job and record how it went."""
+    started = time.perf_counter()
+    try:
+        try:
+            target = import_string(job.task)
+            if not isinstance(target, Task):
+                raise TypeError(f"{job.task} is not a @task.")
+            target(**job.kwargs)
+        except Exception as exc:
+            failed(job, exc)
+        else:
+            # Only if the job is still ours: past JOB_LEASE another worker may own it
+            jobs().filter(pk=job.pk, locked_by=job.locked_by).update(
+                status=Job.SUCCEEDED, finished_at=timezone.now(), last_error='',
+            )
+            logger.debug("Job %s (%s) done in %.0f ms", job.pk, job.task, (time.perf_counter() - started) * 1000)
+    except DatabaseError:
+        logger.exception("Could not record the outcome of job %s (%s); it runs again after JOB_LEASE",
+                         job.pk, job.task)
+
+
+def release_connections():
+    """What Django does between requests, but never under a caller's transaction (a test's)."""
+    for connection in connections.all(initialized_only=True):
+        if not connection.in_atomic_block:
+            connection.close_if_unusable_or_obsolete()
+
+
+def execute_and_release(job):
+    # Pool threads: each has its own connections
+    try:
+        execute(job)
+    finally:
+        release_connections()
+
+
+def failed(job, exc):
+    now = timezone.now()
+    error = ''.join(traceback.format_exception(exc))[-5000:]
+    if job.attempts < job.max_attempts:
+        delay = backoff(job.attempts)
+        changes = {'status': Job.QUEUED, 'run_at': now + delay}
+        logger.warning("Job %s (%s) failed (attempt %d of %d), retrying in %.0fs: %r",
+                       job.pk, job.task, job.attempts, job.max_attempts, delay.total_seconds(), exc)
+    else:
+        changes = {'status': Job.FAILED, 'finished_at': now}
+        logger.error("Job %s (%s) failed after %d attempts: %r", job.pk, job.task, job.attempts, exc)
+    jobs().filter(pk=job.pk, locked_by=job.locked_by).update(last_error=error, locked_at=None, **changes)
+
+
+def sweep(now=None):
+    """Retry (or fail) jobs whose worker died mid-run; delete succeeded jobs past JOB_RETENTION."""
+    now = now or timezone.now()
+    lost = jobs().filter(status=Job.RUNNING, locked_at__lt=now - settings.JOB_LEASE)
+    retried = lost.filter(attempts__lt=F('max_attempts')).update(
+        status=Job.QUEUED, run_at=now, locked_at=None, last_error=LOST,
+    )
+    # What is left of them had no attempts left
+    given_up = lost.update(status=Job.FAILED, finished_at=now, locked_at=None, last_error=LOST)
+    if retried or given_up:
+        logger.warning("Requeued %d and failed %d jobs lost by their workers", retried, given_up)
+    jobs().filter(status=Job.SUCCEEDED, finished_at__lt=now - settings.JOB_RETENTION).delete()
+
+
+class Worker:
+    """
+    Claims due jobs and runs them on `threads` threads (in its own thread if
+    1), until stop(). Also enqueues JOB_SCHEDULE runs and sweeps lost jobs.
+    """
+
+    def __init__(self, threads=1, poll_interval=1.0, name=None):
+        self.threads = max(1, threads)
+        self.poll_interval = poll_interval
+        self.name = name or f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = threading.Event()
+        self.schedule = {import_string(name): every for name, every in settings.JOB_SCHEDULE.items()}
+        self.scheduled = {}  # task -> start of the last period enqueued
+        self.swept = None
+
+    def stop(self):
+        self.stopping.set()
+
+    def run(self, burst=False):
+        """Process jobs until stop() or, with `burst`, until none are due. Returns how many were run."""
+        pool = ThreadPoolExecutor(self.threads, thread_name_prefix='job') if self.threads > 1 else None
+        running, count = set(), 0
+        try:
+            while not self.stopping.is_set():
+                try:
+                    self.maintain()
+                    running = {future for future in running if not future.done()}
+                    claimed = claim(self.name, self.threads - len(running)) if len(running) < self.threads else []
+                except DatabaseError:
+                    # Database restarting, or SQLite busy: try again shortly
+                    logger.exception("Job worker %s could not claim jobs", self.name)
+                    release_connections()
+                    self.stopping.wait(self.poll_interval)
+                    continue
+                for job in claimed:
+                    if pool is None:
+                        execute(job)
+                    else:
+                        running.add(pool.submit(execute_and_release, job))
+                count += len(claimed)
+                release_connections()
+                if claimed:
+                    continue
+                if running:
+                    wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                elif burst:
+                    break
+                else:
+                    self.stopping.wait(self.poll_interval)
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=True)  # lets running jobs finish
+        return count
+
+    def maintain(self):
+        now = timezone.now()
+        for target, every in self.schedule.items():
+            seconds = every.total_seconds()
+            start = datetime.fromtimestamp(now.timestamp() // seconds * seconds, tz=dt_timezone.utc)
+            if self.scheduled.get(target) != start:
+                target.enqueue(run_at=start, key=f'{target.name}@{start.isoformat()}')
+                self.scheduled[target] = start
+        if self.swept is None or time.monotonic() - self.swept >= SWEEP_INTERVAL:
+            sweep(now)
+            self.swept = time.monotonic()
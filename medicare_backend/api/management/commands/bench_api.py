@@ -0,0 +1,267 @@
+import http.client
+import json
+import random
+import re
+import statistics
+import subprocess
+import threading
+import time as timer
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from api.management.commands.seed_data import SEED_PASSWORD, SEED_PREFIX, SLOTS_PER_DAY
+from api.models import Appointment
+
+User = get_user_model()
+
+# The calls static/js/config.js makes, weighted by how often a session makes them
+MIX = {
+    'login': 5,               # POST /api/auth/login/
+    'doctors': 20,            # GET  /api/users/doctors/
+    'profile': 15,            # GET  /api/users/profile/
+    'list_appointments': 35,  # GET  /api/appointments/
+    'create_appointment': 10,  # POST /api/appointments/
+    'patch_appointment': 15,  # PATCH /api/appointments/{id}/ (a doctor confirming)
+}
+# Answers the frontend handles, so not errors: a slot someone else took
+EXPECTED = {'create_appointment': {400}}
+re_query_count = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+def percentile(timings, pct):
+    ordered = sorted(timings)
+    return ordered[min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))]
+
+
+class Session:
+    """One simulated frontend user: a keep-alive connection and two logins."""
+
+    def __init__(self, url, rng, patient, doctor, doctors, appointments):
+        parts = urlsplit(url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.connection = connection_class(parts.hostname, parts.port, timeout=30)
+        self.rng, self.patient, self.doctor = rng, patient, doctor
+        self.doctors, self.appointments = doctors, appointments
+        self.patient_token = self.login(patient)
+        self.doctor_token = self.login(doctor)
+
+    def request(self, method, path, body=None, token=None):
+        headers = {'Accept': 'application/json', 'Accept-Encoding': 'gzip'}
+        if body is not None:
+            headers['Content-Type'] = 'application/json'
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        try:
+            self.connection.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+            response = self.connection.getresponse()
+            content = response.read()
+        except (OSError, http.client.HTTPException):
+            self.connection.close()  # reconnects on the next request
+            raise
+        return response.status, response.getheader('Server-Timing', ''), content
+
+    def login(self, username):
+        status, _, content = self.request('POST', '/api/auth/login/', {'username': username, 'password': SEED_PASSWORD})
+        if status != 200:
+            raise CommandError(f"Login as {username} failed with {status}: {content[:200]!r}")
+        return json.loads(content)['access']
+
+    def run(self, operation):
+        """(status, Server-Timing) of one call."""
+        if operation == 'login':
+            return self.request('POST', '/api/auth/login/', {'username': self.patient, 'password': SEED_PASSWORD})[:2]
+        if operation == 'doctors':
+            return self.request('GET', '/api/users/doctors/')[:2]
+        if operation == 'profile':
+            return self.request('GET', '/api/users/profile/', token=self.patient_token)[:2]
+        if operation == 'list_appointments':
+            return self.request('GET', '/api/appointments/', token=self.patient_token)[:2]
+        if operation == 'create_appointment':
+            day = date.today() + timedelta(days=self.rng.randint(1, 30))
+            slot = self.rng.randrange(SLOTS_PER_DAY)
+            body = {'doctor': self.rng.choice(self.doctors), 'date': day.isoformat(),
+                    'time': time(9 + slot // 2, 30 * (slot % 2)).strftime('%H:%M')}
+            return self.request('POST', '/api/appointments/', body, token=self.patient_token)[:2]
+        if operation == 'patch_appointment':
+            appointment = self.rng.choice(self.appointments)
+            return self.request('PATCH', f'/api/appointments/{appointment}/', {'status': 'confirmed'},
+                                token=self.doctor_token)[:2]
+        raise ValueError(operation)
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay the frontend's API call mix (static/js/config.js: login, doctor directory, "
+        "profile, list/create/patch appointments) with concurrent workers against a running "
+        "server, as users created by seed_data. Reports throughput, p50/p95/p99 latency and "
+        "queries per request (from the Server-Timing header) per call, writes them to a JSON "
+        "file and, with --compare, fails on regressions against an earlier one. The server must "
+        "run with DISABLE_LOGIN_RATE_LIMIT=1, or logins from one address are throttled. "
+        "Creates and confirms appointments: use a throwaway database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000')
+        parser.add_argument('--workers', type=int, default=16)
+        parser.add_argument('--duration', type=float, default=60, help="Seconds to measure")
+        parser.add_argument('--warmup', type=float, default=5, help="Seconds to run before measuring")
+        parser.add_argument('--seed', type=int, default=21)
+        parser.add_argument('--output', default='bench-api.json')
+        parser.add_argument('--compare', metavar='BASELINE', help="Earlier --output file to compare against")
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help="Allowed p95/throughput/queries change against --compare (0.2 = 20%%)")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        patients, doctors, confirming, appointments = self.participants()
+        operations, weights = zip(*MIX.items())
+
+        results = defaultdict(list)  # operation -> [(seconds, status, queries)]
+        lock = threading.Lock()
+        measuring = threading.Event()
+        stop = threading.Event()
+        failures = []
+
+        def worker(number):
+            worker_rng = random.Random(rng.random())
+            try:
+                doctor = confirming[number % len(confirming)]
+                session = Session(options['url'], worker_rng, patients[number % len(patients)][1], doctor[1],
+                                  [pk for pk, _ in doctors], appointments[doctor[0]])
+            except (OSError, CommandError) as exc:
+                failures.append(exc)
+                return
+            while not stop.is_set():
+                operation = worker_rng.choices(operations, weights)[0]
+                started = timer.perf_counter()
+                try:
+                    status, timing = session.run(operation)
+                except (OSError, http.client.HTTPException):
+                    status, timing = 0, ''
+                elapsed = timer.perf_counter() - started
+                if measuring.is_set():
+                    queries = re_query_count.search(timing)
+                    with lock:
+                        results[operation].append((elapsed, status, int(queries[1]) if queries else None))
+
+        threads = [threading.Thread(target=worker, args=(number,), daemon=True) for number in range(options['workers'])]
+        for thread in threads:
+            thread.start()
+        timer.sleep(options['warmup'])
+        if failures:
+            stop.set()
+            raise CommandError(f"Workers could not start: {failures[0]}")
+        measuring.set()
+        started = timer.perf_counter()
+        timer.sleep(options['duration'])
+        measuring.clear()
+        elapsed = timer.perf_counter() - started
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        report = self.report(results, elapsed, options)
+        Path(options['output']).write_text(json.dumps(report, indent=2) + '\n')
+        self.stdout.write(f"Written to {options['output']}")
+        if options['compare']:
+            self.compare(report, json.loads(Path(options['compare']).read_text()), options['tolerance'])
+
+    def participants(self):
+        patients = list(User.objects.filter(username__startswith=f'{SEED_PREFIX}patient', role='patient')
+                        .values_list('pk', 'username')[:1000])
+        doctors = list(User.objects.filter(username__startswith=f'{SEED_PREFIX}doctor', role='doctor', is_verified=True)
+                       .values_list('pk', 'username')[:200])
+        if not patients or not doctors:
+            raise CommandError("No seeded users; run `python manage.py seed_data` against this database first.")
+        # Upcoming appointments each doctor may confirm
+        appointments = defaultdict(list)
+        upcoming = (Appointment.objects.filter(doctor__in=[pk for pk, _ in doctors], date__gte=date.today())
+                    .exclude(status='cancelled').values_list('doctor_id', 'pk'))
+        for doctor_id, pk in upcoming.iterator():
+            if len(appointments[doctor_id]) < 100:
+                appointments[doctor_id].append(pk)
+        # Sessions log in as doctors with something to confirm
+        confirming = [doctor for doctor in doctors if appointments[doctor[0]]]
+        if not confirming:
+            raise CommandError("No upcoming seeded appointments; seed with --future-days > 0.")
+        return patients, doctors, confirming, appointments
+
+    def report(self, results, elapsed, options):
+        report = {
+            'created': datetime.now(dt_timezone.utc).isoformat(timespec='seconds'),
+            'commit': self.commit(),
+            'url': options['url'],
+            'workers': options['workers'],
+            'duration_seconds': round(elapsed, 1),
+            'operations': {},
+        }
+        self.stdout.write(f"{'operation':<20}{'requests':>9}{'req/s':>8}{'p50 ms':>8}{'p95 ms':>8}"
+                          f"{'p99 ms':>8}{'queries':>8}{'errors':>7}")
+        everything = []
+        for operation in MIX:
+            samples = results.get(operation, [])
+            if not samples:
+                continue
+            timings = [seconds * 1000 for seconds, _, _ in samples]
+            queries = [count for _, _, count in samples if count is not None]
+            errors = sum(1 for _, status, _ in samples
+                         if not 200 <= status < 300 and status not in EXPECTED.get(operation, ()))
+            row = {
+                'requests': len(samples),
+                'throughput': round(len(samples) / elapsed, 2),
+                'p50_ms': round(percentile(timings, 50), 2),
+                'p95_ms': round(percentile(timings, 95), 2),
+                'p99_ms': round(percentile(timings, 99), 2),
+                'queries_per_request': round(statistics.mean(queries), 2) if queries else None,
+                'errors': errors,
+            }
+            report['operations'][operation] = row
+            everything.extend(timings)
+            self.stdout.write(f"{operation:<20}{row['requests']:>9}{row['throughput']:>8.1f}{row['p50_ms']:>8.1f}"
+                              f"{row['p95_ms']:>8.1f}{row['p99_ms']:>8.1f}"
+                              f"{row['queries_per_request'] if queries else '-':>8}{errors:>7}")
+        if everything:
+            report['total'] = {
+                'requests': len(everything),
+                'throughput': round(len(everything) / elapsed, 2),
+                'p50_ms': round(percentile(everything, 50), 2),
+                'p95_ms': round(percentile(everything, 95), 2),
+                'p99_ms': round(percentile(everything, 99), 2),
+            }
+            self.stdout.write(f"{'total':<20}{len(everything):>9}{report['total']['throughput']:>8.1f}"
+                              f"{report['total']['p50_ms']:>8.1f}{report['total']['p95_ms']:>8.1f}"
+                              f"{report['total']['p99_ms']:>8.1f}")
+        return report
+
+    def commit(self):
+        try:
+            return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def compare(self, current, baseline, tolerance):
+        regressions = []
+        self.stdout.write(f"\nagainst {baseline.get('commit') or 'baseline'} ({baseline.get('created')}):")
+        for operation, row in current['operations'].items():
+            before = baseline.get('operations', {}).get(operation)
+            if not before:
+                continue
+            changes = []
+            for key, worse_when_higher in (('p95_ms', True), ('throughput', False), ('queries_per_request', True)):
+                if not before.get(key) or row.get(key) is None:
+                    continue
+                change = (row[key] - before[key]) / before[key]
+                changes.append(f"{key} {change:+.0%}")
+                if (change if worse_when_higher else -change) > tolerance:
+                    regressions.append(f"{operation} {key}: {before[key]} -> {row[key]}")
+            self.stdout.write(f"  {operation:<20}{', '.join(changes)}")
+        if regressions:
+            raise CommandError("Regressions beyond tolerance:\n  " + '\n  '.join(regressions))
+        self.stdout.write(self.style.SUCCESS("No regressions beyond tolerance."))
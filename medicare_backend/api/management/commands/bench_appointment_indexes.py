@@ -0,0 +1,141 @@
+import random
+import time as timer
+from datetime import date, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from api.models import Appointment
+
+User = get_user_model()
+
+BENCH_PREFIX = 'bench_idx_'
+STATUSES = ['pending'] * 3 + ['confirmed'] * 5 + ['cancelled'] + ['completed'] * 6
+SLOTS_PER_DAY = 16  # 09:00 - 17:00, 30 minute slots
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed appointments into the configured database and report EXPLAIN plans and "
+        "latency of the dashboard queries with and without the composite indexes. "
+        "Run it against a local/throwaway database only."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--doctors', type=int, default=500)
+        parser.add_argument('--patients', type=int, default=20_000)
+        parser.add_argument('--batch-size', type=int, default=5_000)
+        parser.add_argument('--repeat', type=int, default=20, help='Runs per query when timing')
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded rows afterwards')
+
+    def handle(self, *args, **options):
+        if not User.objects.filter(username__startswith=BENCH_PREFIX).exists():
+            self.seed(options)
+        doctor = User.objects.filter(username__startswith=f'{BENCH_PREFIX}doctor').first()
+        patient = User.objects.filter(username__startswith=f'{BENCH_PREFIX}patient').first()
+        queries = self.queries(doctor, patient)
+
+        try:
+            with connection.schema_editor() as editor:
+                self.drop_indexes(editor)
+            self.report('BEFORE (FK indexes only)', queries, options['repeat'])
+        except Exception as exc:  # e.g. MySQL refusing to drop an index backing a FK
+            self.stderr.write(f"Could not drop indexes for the 'before' run: {exc}")
+        finally:
+            with connection.schema_editor() as editor:
+                self.add_indexes(editor)
+        self.report('AFTER (composite indexes)', queries, options['repeat'])
+
+        if not options['keep']:
+            Appointment.objects.filter(doctor__username__startswith=BENCH_PREFIX).delete()
+            User.objects.filter(username__startswith=BENCH_PREFIX).delete()
+
+    def seed(self, options):
+        batch_size = options['batch_size']
+        self.stdout.write(f"Seeding {options['rows']:,} appointments...")
+        User.objects.bulk_create(
+            [User(username=f'{BENCH_PREFIX}doctor{i}', role='doctor', is_verified=True)
+             for i in range(options['doctors'])]
+            + [User(username=f'{BENCH_PREFIX}patient{i}') for i in range(options['patients'])],
+            batch_size=batch_size,
+        )
+        doctor_ids = list(User.objects.filter(username__startswith=f'{BENCH_PREFIX}doctor').values_list('id', flat=True))
+        patient_ids = list(User.objects.filter(username__startswith=f'{BENCH_PREFIX}patient').values_list('id', flat=True))
+
+        # Row i goes to doctor i % D at that doctor's (i // D)-th slot, so every
+        # active (doctor, date, time) is unique by construction.
+        start = date.today() - timedelta(days=365)
+        batch = []
+        for i in range(options['rows']):
+            slot = i // len(doctor_ids)
+            status = random.choice(STATUSES)
+            batch.append(Appointment(
+                doctor_id=doctor_ids[i % len(doctor_ids)],
+                patient_id=random.choice(patient_ids),
+                date=start + timedelta(days=slot // SLOTS_PER_DAY),
+                time=time(9 + (slot % SLOTS_PER_DAY) // 2, 30 * (slot % 2)),
+                status=status,
+                holds_slot=Appointment.slot_marker(status),
+            ))
+            if len(batch) == batch_size:
+                Appointment.objects.bulk_create(batch)
+                batch = []
+        Appointment.objects.bulk_create(batch)
+
+    def queries(self, doctor, patient):
+        today = date.today()
+        sample = Appointment.objects.filter(doctor=doctor).order_by('-date').first()
+        return {
+            'doctor list': Appointment.objects.filter(doctor=doctor).order_by('-date')[:50],
+            'patient list': Appointment.objects.filter(patient=patient).order_by('-date')[:50],
+            'doctor today count': Appointment.objects.filter(doctor=doctor, date=today),
+            'doctor pending count': Appointment.objects.filter(doctor=doctor, status='pending'),
+            'admin status filter': Appointment.objects.filter(status='pending').order_by('-date')[:50],
+            'admin date filter': Appointment.objects.filter(date=today),
+            'slot conflict check': Appointment.objects.filter(doctor=doctor, date=sample.date, time=sample.time),
+        }
+
+    def report(self, title, queries, repeat):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\n=== {title} ==='))
+        for name, queryset in queries.items():
+            timings = []
+            for _ in range(repeat):
+                started = timer.perf_counter()
+                list(queryset.all())
+                timings.append((timer.perf_counter() - started) * 1000)
+            timings.sort()
+            self.stdout.write(self.style.SUCCESS(
+                f'{name}: median {timings[len(timings) // 2]:.2f} ms, max {timings[-1]:.2f} ms'
+            ))
+            self.stdout.write(queryset.explain())
+
+    def drop_indexes(self, editor):
+        # SQLite drops constraints by rebuilding the table from Meta, so hide
+        # the declared indexes while dropping them or they come straight back.
+        meta = Appointment._meta
+        indexes, constraints = meta.indexes, meta.constraints
+        meta.indexes, meta.constraints = [], []
+        try:
+            for constraint in constraints:
+                editor.remove_constraint(Appointment, constraint)
+            existing = self.existing_constraints()
+            for index in indexes:
+                if index.name in existing:
+                    editor.remove_index(Appointment, index)
+        finally:
+            meta.indexes, meta.constraints = indexes, constraints
+
+    def existing_constraints(self):
+        with connection.cursor() as cursor:
+            return connection.introspection.get_constraints(cursor, Appointment._meta.db_table)
+
+    def add_indexes(self, editor):
+        existing = self.existing_constraints()
+        for index in Appointment._meta.indexes:
+            if index.name not in existing:
+                editor.add_index(Appointment, index)
+        for constraint in Appointment._meta.constraints:
+            if constraint.name not in existing:
+                editor.add_constraint(Appointment, constraint)
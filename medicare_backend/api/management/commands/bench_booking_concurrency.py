@@ -0,0 +1,97 @@
+import logging
+import threading
+import time as timer
+from collections import Counter
+from datetime import date, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from rest_framework.test import APIClient
+
+from api.models import Appointment, IdempotencyKey
+
+User = get_user_model()
+
+BENCH_PREFIX = 'bench_book_'
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire parallel bookings for a handful of slots of one doctor through the real "
+        "booking view and check that every slot has exactly one winner. Also replays "
+        "each request with its Idempotency-Key to check retries never double-book. "
+        "Run it against a local database that supports row locks (MySQL/PostgreSQL)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=400)
+        parser.add_argument('--threads', type=int, default=50)
+        parser.add_argument('--slots', type=int, default=8)
+
+    def handle(self, *args, **options):
+        # Hundreds of expected 400s for the losing bookings
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        doctor, patients, slots = self.setup(options)
+        jobs = [
+            (patients[i % len(patients)], slots[i % len(slots)], f'{BENCH_PREFIX}{i}')
+            for i in range(options['requests'])
+        ]
+        # Every job is sent twice, as a client retrying after a timeout would.
+        jobs = jobs + jobs
+        results = []
+        lock = threading.Lock()
+
+        def worker(chunk):
+            clients = {}
+            try:
+                for patient, slot, key in chunk:
+                    client = clients.setdefault(patient.pk, APIClient(SERVER_NAME='localhost'))
+                    client.force_authenticate(patient)
+                    response = client.post('/api/appointments/', {
+                        'doctor': doctor.pk, 'date': slot[0].isoformat(), 'time': slot[1].strftime('%H:%M'),
+                    }, HTTP_IDEMPOTENCY_KEY=key)
+                    with lock:
+                        results.append((slot, response.status_code, response.get('Idempotent-Replayed')))
+            finally:
+                connections.close_all()
+
+        chunks = [jobs[i::options['threads']] for i in range(options['threads'])]
+        threads = [threading.Thread(target=worker, args=(chunk,)) for chunk in chunks]
+        started = timer.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = timer.perf_counter() - started
+
+        try:
+            self.report(results, slots, doctor, elapsed)
+        finally:
+            User.objects.filter(username__startswith=BENCH_PREFIX).delete()
+
+    def setup(self, options):
+        User.objects.filter(username__startswith=BENCH_PREFIX).delete()
+        doctor = User.objects.create(username=f'{BENCH_PREFIX}doctor', role='doctor', is_verified=True,
+                                     work_start=time(8, 0), work_end=time(20, 0), slot_minutes=30)
+        patients = [User.objects.create(username=f'{BENCH_PREFIX}patient{i}') for i in range(options['threads'])]
+        day = date.today() + timedelta(days=7 - date.today().weekday())  # next Monday
+        slots = [(day, time(8 + i // 2, 30 * (i % 2))) for i in range(options['slots'])]
+        return doctor, patients, slots
+
+    def report(self, results, slots, doctor, elapsed):
+        statuses = Counter(status for _, status, _ in results)
+        replays = sum(1 for *_, replayed in results if replayed)
+        self.stdout.write(f"{len(results)} requests in {elapsed:.2f}s "
+                          f"({len(results) / elapsed:.0f} req/s), status codes: {dict(statuses)}, "
+                          f"replayed: {replays}")
+
+        winners = Counter(slot for slot, status, replayed in results if status == 201 and not replayed)
+        stored = Counter(Appointment.objects.filter(doctor=doctor, holds_slot=True).values_list('date', 'time'))
+        for slot in slots:
+            self.stdout.write(f"  {slot[0]} {slot[1]:%H:%M}: {winners[slot]} winner(s), {stored[slot]} row(s)")
+        if any(winners[slot] != 1 or stored[slot] != 1 for slot in slots):
+            raise CommandError("Expected exactly one winner and one booking per slot.")
+        if IdempotencyKey.objects.filter(user__username__startswith=BENCH_PREFIX, status_code__isnull=True).exists():
+            raise CommandError("Idempotency keys left in progress.")
+        self.stdout.write(self.style.SUCCESS("Exactly one winner per slot."))
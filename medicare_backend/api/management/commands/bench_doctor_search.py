@@ -0,0 +1,82 @@
+import random
+import time as timer
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import SearchTerm
+from accounts.search import DatabaseIndex, MemoryIndex, tokenize
+
+User = get_user_model()
+
+FIRST_NAMES = ['James', 'Mary', 'Robert', 'Patricia', 'Priya', 'Arjun', 'Wei', 'Fatima', 'Olga', 'Diego',
+               'Aisha', 'Kenji', 'Lucia', 'Mohammed', 'Sofia', 'Liam', 'Noah', 'Emma', 'Ravi', 'Ana']
+LAST_NAMES = ['Smith', 'Johnson', 'Sharma', 'Patel', 'Garcia', 'Nguyen', 'Kowalski', 'Okafor', 'Tanaka',
+              'Rossi', 'Müller', 'Hernandez', 'Kim', 'Singh', 'Cohen', 'Ivanova', 'Dubois', 'Silva']
+SPECIALIZATIONS = ['Cardiology', 'Dermatology', 'Neurology', 'Oncology', 'Pediatrics', 'Orthopedics',
+                   'Psychiatry', 'Radiology', 'Gastroenterology', 'Ophthalmology', 'Endocrinology']
+CITIES = ['Mumbai', 'Delhi', 'Pune', 'Chennai', 'Boston', 'Chicago', 'Houston', 'Berlin', 'Madrid', 'Lagos']
+QUERIES = ['cardio', 'cardiology mumbai', 'sharma', 'priya sharma', 'dermatolgy', 'neuro pune',
+           'pediatrics chicago', 'okafor', 'gastroenterology', 'muller berlin']
+
+
+class Command(BaseCommand):
+    help = (
+        "Time doctor searches over N generated doctors: the previous client-side approach "
+        "(every doctor loaded, substring match), DatabaseIndex and MemoryIndex. "
+        "Doctors are created in a rolled-back transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=20000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run(options['doctors'], options['repeat'])
+            transaction.set_rollback(True)
+
+    def run(self, count, repeat):
+        rng = random.Random(16)
+        User.objects.bulk_create([
+            User(username=f'bench_search_{i}', email=f'bench_search_{i}@medicare.com', role='doctor',
+                 is_verified=True, first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES),
+                 specialization=rng.choice(SPECIALIZATIONS), address=f'{i} Main Road, {rng.choice(CITIES)}',
+                 bio=f'{rng.choice(SPECIALIZATIONS)} specialist', experience=rng.randint(0, 40),
+                 rating=round(rng.uniform(3, 5), 1))
+            for i in range(count)
+        ], batch_size=1000)
+
+        database, memory = DatabaseIndex(), MemoryIndex()
+        for label, index in (('DatabaseIndex', database), ('MemoryIndex', memory)):
+            started = timer.perf_counter()
+            index.rebuild()
+            self.stdout.write(f"{label} built in {timer.perf_counter() - started:.1f}s")
+        self.stdout.write(f"{SearchTerm.objects.count():,} postings for {count:,} doctors")
+
+        term = tokenize(QUERIES[0])[0]
+        plan = SearchTerm.objects.filter(Q(term=term) | Q(term__gte=term, term__lt=term + '\uffff'))
+        self.stdout.write('postings lookup plan:\n  ' + plan.explain().replace('\n', '\n  '))
+
+        fields = ['id', 'first_name', 'last_name', 'specialization', 'address']
+        cases = [
+            ('previous (load all, substring)', lambda q: [
+                row for row in User.objects.filter(role='doctor', is_verified=True).values(*fields)
+                if all(word in ' '.join(str(row[f] or '') for f in fields[1:]).lower() for word in q.split())
+            ]),
+            ('DatabaseIndex', lambda q: database.search(q, 20)),
+            ('MemoryIndex', lambda q: memory.search(q, 20)),
+        ]
+        self.stdout.write(f"\n{'path':<34}{'ms/search':>10}{'queries':>9}")
+        for label, search in cases:
+            with CaptureQueriesContext(connection) as queries:
+                started = timer.perf_counter()
+                for _ in range(repeat):
+                    for query in QUERIES:
+                        search(query)
+                elapsed = timer.perf_counter() - started
+            runs = repeat * len(QUERIES)
+            self.stdout.write(f"{label:<34}{elapsed / runs * 1000:>10.1f}{len(queries) / runs:>9.1f}")
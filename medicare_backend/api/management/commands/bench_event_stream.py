@@ -0,0 +1,75 @@
+import asyncio
+import time as timer
+import resource
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api.events import get_broker, user_channel
+from api.push import EVENTS_PATH, EventStream
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Hold N idle /api/events/ streams open on one event loop (one ASGI worker, driven "
+        "in-process, no sockets) and report connect time, memory per connection and how long "
+        "one published event takes to reach all of them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=5000)
+        parser.add_argument('--user', type=int, help='User id to connect as (default: first doctor)')
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(pk=options['user']) if options['user'] else User.objects.filter(role='doctor')
+        user = user.order_by('id').first()
+        if user is None:
+            raise CommandError("No user to connect as; create a doctor or pass --user.")
+        token = str(RefreshToken.for_user(user).access_token)
+        asyncio.run(self.run(user, token, options['connections']))
+
+    async def run(self, user, token, count):
+        stream = EventStream()
+        scope = {'type': 'http', 'method': 'GET', 'path': EVENTS_PATH, 'query_string': b'',
+                 'headers': [(b'authorization', f'Bearer {token}'.encode())]}
+        disconnect = asyncio.Event()
+        received = asyncio.Queue()
+
+        async def receive():
+            await disconnect.wait()
+            return {'type': 'http.disconnect'}
+
+        def client(number):
+            async def send(message):
+                body = message.get('body', b'')
+                if message['type'] == 'http.response.start' or body.startswith((b'retry', b'event')):
+                    received.put_nowait((number, timer.perf_counter()))
+            return send
+
+        baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        started = timer.perf_counter()
+        tasks = [asyncio.ensure_future(stream(scope, receive, client(i))) for i in range(count)]
+        for _ in range(count * 2):  # response start + retry line per connection
+            await received.get()
+        connect_time = timer.perf_counter() - started
+        held = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline) * 1024  # KiB on Linux
+
+        published = timer.perf_counter()
+        get_broker().publish(user_channel(user.pk), {'type': 'appointment.created', 'appointment': {'id': 0}})
+        latencies = []
+        for _ in range(count):
+            latencies.append((await received.get())[1] - published)
+
+        disconnect.set()
+        await asyncio.gather(*tasks)
+
+        latencies.sort()
+        self.stdout.write(f"connections held:        {count:,}")
+        self.stdout.write(f"connect (incl. JWT auth): {connect_time:.2f}s ({count / connect_time:,.0f}/s)")
+        self.stdout.write(f"memory per connection:   {held / count / 1024:.1f} KiB (peak RSS growth, excl. sockets)")
+        self.stdout.write(f"fan-out of one event:    first {latencies[0] * 1000:.1f} ms, p50 {latencies[len(latencies) // 2] * 1000:.1f} ms, "
+                          f"last {latencies[-1] * 1000:.1f} ms")
+        self.stdout.write(f"subscribers left:        {len(get_broker().subscribers)}")
@@ -0,0 +1,78 @@
+import time as timer
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+
+from accounts.backends import EmailOrUsernameBackend
+from accounts.models import EMAIL_KEY
+
+User = get_user_model()
+
+PROFILES = {
+    'default': None,  # whatever settings.PASSWORD_HASHERS says
+    'fast': ['django.contrib.auth.hashers.MD5PasswordHasher'],
+}
+PASSWORD = 'Secret@123'
+
+
+def previous_login(email):
+    """What CustomTokenObtainPairView did before: email lookup, then ModelBackend by username."""
+    user = User.objects.filter(email=email).first()
+    return ModelBackend().authenticate(None, username=user.username if user else email, password=PASSWORD)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure logins/sec in one worker: the old two-query email login, "
+        "EmailOrUsernameBackend, and the full POST /api/auth/login/ view, with the "
+        "default or the fast password hasher. Users are created in a rolled-back transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--logins', type=int, default=200)
+        parser.add_argument('--profile', choices=PROFILES, default='fast')
+
+    def handle(self, *args, **options):
+        hashers = PROFILES[options['profile']]
+        overrides = {'LOGIN_RATE_LIMIT': None, **({'PASSWORD_HASHERS': hashers} if hashers else {})}
+        with override_settings(**overrides), transaction.atomic():
+            self.run(options['users'], options['logins'])
+            transaction.set_rollback(True)
+
+    def run(self, count, logins):
+        password = make_password(PASSWORD)
+        User.objects.bulk_create([
+            User(username=f'bench_login_{i}', email=f'Bench.Login.{i}@medicare.com', password=password)
+            for i in range(count)
+        ], batch_size=1000)
+        emails = [f'bench.login.{i % count}@medicare.com' for i in range(logins)]
+        exact = [f'Bench.Login.{i % count}@medicare.com' for i in range(logins)]
+
+        # Same filter as find_login_user; the plan should use both indexes, no table scan
+        plan = User.objects.alias(email_key=EMAIL_KEY).filter(Q(username=emails[0]) | Q(email_key=emails[0]))
+        self.stdout.write('login lookup plan:\n  ' + plan.explain().replace('\n', '\n  '))
+
+        client = APIClient(SERVER_NAME='localhost')
+        backend = EmailOrUsernameBackend()
+        cases = [
+            ('previous (email lookup + ModelBackend)', exact, previous_login),
+            ('EmailOrUsernameBackend', emails,
+             lambda email: backend.authenticate(None, username=email, password=PASSWORD)),
+            ('POST /api/auth/login/', emails,
+             lambda email: client.post('/api/auth/login/', {'username': email, 'password': PASSWORD})),
+        ]
+        self.stdout.write(f"\n{'path':<42}{'logins/sec':>12}{'queries/login':>15}")
+        for label, identifiers, login in cases:
+            with CaptureQueriesContext(connection) as queries:
+                started = timer.perf_counter()
+                for identifier in identifiers:
+                    login(identifier)
+                elapsed = timer.perf_counter() - started
+            self.stdout.write(f"{label:<42}{logins / elapsed:>12,.0f}{len(queries) / logins:>15.1f}")
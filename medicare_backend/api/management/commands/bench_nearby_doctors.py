@@ -0,0 +1,78 @@
+import random
+import time as timer
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from accounts import geo
+
+User = get_user_model()
+
+# Doctors cluster in cities, like the real directory
+CITIES = [(19.0760, 72.8777), (28.6139, 77.2090), (12.9716, 77.5946), (18.5204, 73.8567), (13.0827, 80.2707),
+          (22.5726, 88.3639), (40.7128, -74.0060), (51.5074, -0.1278), (52.5200, 13.4050), (-23.5505, -46.6333)]
+
+
+def full_scan(lat, lon, radius, limit):
+    """Every doctor with coordinates, distance computed in Python: what a query without the geohash costs."""
+    rows = User.objects.filter(role='doctor', is_verified=True).exclude(clinic_latitude=None)
+    found = sorted((geo.distance_km(lat, lon, clat, clon), pk)
+                   for pk, clat, clon in rows.values_list('pk', 'clinic_latitude', 'clinic_longitude'))
+    return [item for item in found if item[0] <= radius][:limit]
+
+
+class Command(BaseCommand):
+    help = (
+        "Time /users/doctors/nearby/ lookups (accounts.geo.nearby_doctors) over N generated doctors "
+        "clustered around cities, against a full scan. Doctors are created in a rolled-back transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=100_000)
+        parser.add_argument('--queries', type=int, default=200)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run(options['doctors'], options['queries'])
+            transaction.set_rollback(True)
+
+    def run(self, count, queries):
+        rng = random.Random(17)
+        doctors = []
+        for i in range(count):
+            city_lat, city_lon = rng.choice(CITIES)
+            lat, lon = rng.gauss(city_lat, 0.15), rng.gauss(city_lon, 0.15)
+            doctors.append(User(username=f'bench_geo_{i}', email=f'bench_geo_{i}@medicare.com', role='doctor',
+                                is_verified=True, clinic_latitude=lat, clinic_longitude=lon,
+                                clinic_geohash=geo.encode(lat, lon)))
+        User.objects.bulk_create(doctors, batch_size=2000)
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute('ANALYZE')
+
+        lat, lon = CITIES[0]
+        cells = geo.covering_cells(lat, lon, 10)
+        plan = User.objects.filter(role='doctor', is_verified=True, clinic_geohash__gte=cells[0],
+                                   clinic_geohash__lt=cells[0] + '~')
+        self.stdout.write(f"10 km around {lat},{lon}: cells {cells}")
+        self.stdout.write('cell range plan:\n  ' + plan.explain().replace('\n', '\n  '))
+
+        self.stdout.write(f"\n{'radius':>8}{'ms/query':>10}{'queries':>9}{'results':>9}")
+        for radius in (1, 5, 10, 25, 50):
+            points = [(rng.gauss(city[0], 0.1), rng.gauss(city[1], 0.1))
+                      for city in (rng.choice(CITIES) for _ in range(queries))]
+            results = 0
+            with CaptureQueriesContext(connection) as captured:
+                started = timer.perf_counter()
+                for lat, lon in points:
+                    results += len(geo.nearby_doctors(lat, lon, radius, 20))
+                elapsed = timer.perf_counter() - started
+            self.stdout.write(f"{radius:>6}km{elapsed / queries * 1000:>10.2f}"
+                              f"{len(captured) / queries:>9.1f}{results / queries:>9.1f}")
+
+        started = timer.perf_counter()
+        for lat, lon in points[:5]:
+            full_scan(lat, lon, 10, 20)
+        self.stdout.write(f"\nfull scan (no geohash), 10 km: {(timer.perf_counter() - started) / 5 * 1000:.1f} ms/query")
@@ -0,0 +1,158 @@
+import random
+import threading
+import time as timer
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from api import reminders
+from api.models import Appointment
+
+User = get_user_model()
+
+BENCH_PREFIX = 'bench_rem_'
+STATUSES = ['pending'] * 4 + ['confirmed'] * 5 + ['cancelled']
+SLOTS_PER_DAY = 16  # 09:00 - 17:00, 30 minute slots
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed upcoming appointments (from today on) into the configured database, then time "
+        "finding the due reminders by scanning appointments against the remind_at index, the "
+        "remind_at backfill, and sending every due reminder with 1 and --threads workers "
+        "(checking each is sent once). Run it against a local/throwaway database only."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--doctors', type=int, default=2_000)
+        parser.add_argument('--patients', type=int, default=10_000)
+        parser.add_argument('--batch-size', type=int, default=reminders.BATCH_SIZE, help="Reminders per claim")
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per query when timing')
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded rows afterwards')
+
+    def handle(self, *args, **options):
+        if not User.objects.filter(username__startswith=BENCH_PREFIX).exists():
+            self.seed(options['rows'], options['doctors'], options['patients'])
+        doctor_ids = list(User.objects.filter(username__startswith=f'{BENCH_PREFIX}doctor').values_list('pk', flat=True))
+        rows = Appointment.objects.filter(doctor_id__in=doctor_ids)
+
+        started = timer.perf_counter()
+        updated = reminders.rebuild(include_due=True, queryset=rows)
+        self.stdout.write(f"backfill (rebuild_reminders): {updated:,} rows in {timer.perf_counter() - started:.1f}s")
+        upcoming = rows.filter(date__gte=timezone.localdate(), status__in=Appointment.REMINDED_STATUSES)
+        self.stdout.write(f"{upcoming.count():,} upcoming appointments, REMINDER_LEAD {settings.REMINDER_LEAD}")
+
+        self.stdout.write(self.style.MIGRATE_HEADING('\n=== Finding due reminders ==='))
+        self.time('scan upcoming appointments', options['repeat'], lambda: self.scan(upcoming),
+                  upcoming.values_list('pk', 'date', 'time'))
+        window = upcoming.filter(date__lte=timezone.localdate() + settings.REMINDER_LEAD + timedelta(days=1))
+        self.time('scan the lead-time date window', options['repeat'], lambda: self.scan(window),
+                  window.values_list('pk', 'date', 'time'))
+        due = Appointment.objects.filter(remind_at__lte=timezone.now()).order_by('remind_at')
+        self.time('remind_at index (one claim batch)', options['repeat'],
+                  lambda: list(due.values_list('pk', flat=True)[:options['batch_size']]),
+                  due.values_list('pk')[:options['batch_size']])
+
+        self.stdout.write(self.style.MIGRATE_HEADING('\n=== Sending (MemoryNotifier) ==='))
+        for threads in sorted({1, options['threads']}):
+            reminders.rebuild(include_due=True, queryset=window)  # re-arm what the last run sent
+            self.send(threads, options['batch_size'])
+
+        if not options['keep']:
+            # Raw delete: the delete signals would rebuild availability and log a
+            # change per row, none of which exists for these bulk-created rows
+            rows._raw_delete(rows.db)
+            User.objects.filter(username__startswith=BENCH_PREFIX).delete()
+
+    def seed(self, count, doctors, patients, batch_size=5_000):
+        self.stdout.write(f"Seeding {count:,} upcoming appointments...")
+        User.objects.bulk_create(
+            [User(username=f'{BENCH_PREFIX}doctor{i}', role='doctor', is_verified=True) for i in range(doctors)]
+            + [User(username=f'{BENCH_PREFIX}patient{i}', email=f'{BENCH_PREFIX}patient{i}@medicare.com')
+               for i in range(patients)],
+            batch_size=batch_size,
+        )
+        doctor_ids = list(User.objects.filter(username__startswith=f'{BENCH_PREFIX}doctor').values_list('id', flat=True))
+        patient_ids = list(User.objects.filter(username__startswith=f'{BENCH_PREFIX}patient').values_list('id', flat=True))
+
+        # Row i goes to doctor i % D at that doctor's (i // D)-th slot from today,
+        # so every active (doctor, date, time) is unique by construction.
+        # remind_at is left to the backfill, which is timed.
+        today = timezone.localdate()
+        batch = []
+        for i in range(count):
+            slot = i // len(doctor_ids)
+            status = random.choice(STATUSES)
+            batch.append(Appointment(
+                doctor_id=doctor_ids[i % len(doctor_ids)], patient_id=random.choice(patient_ids),
+                date=today + timedelta(days=slot // SLOTS_PER_DAY),
+                time=time(9 + (slot % SLOTS_PER_DAY) // 2, 30 * (slot % 2)),
+                status=status, holds_slot=Appointment.slot_marker(status),
+            ))
+            if len(batch) == batch_size:
+                with transaction.atomic():
+                    Appointment.objects.bulk_create(batch)
+                batch = []
+        Appointment.objects.bulk_create(batch)
+
+    def scan(self, queryset):
+        """What a scheduler without remind_at does every tick: read the rows, compare each start."""
+        now = timezone.now()
+        horizon = now + settings.REMINDER_LEAD
+        due = []
+        for pk, day, start in queryset.values_list('pk', 'date', 'time').iterator(chunk_size=10_000):
+            if now < timezone.make_aware(datetime.combine(day, start)) <= horizon:
+                due.append(pk)
+        return due
+
+    def time(self, name, repeat, run, queryset):
+        timings = []
+        for _ in range(repeat):
+            started = timer.perf_counter()
+            found = run()
+            timings.append((timer.perf_counter() - started) * 1000)
+        timings.sort()
+        self.stdout.write(self.style.SUCCESS(
+            f'{name}: {len(found):,} rows, median {timings[len(timings) // 2]:.2f} ms, max {timings[-1]:.2f} ms'
+        ))
+        self.stdout.write(queryset.explain())
+
+    def send(self, threads, batch_size):
+        due = Appointment.objects.filter(remind_at__lte=timezone.now()).count()
+        reminders.MemoryNotifier.sent.clear()
+        errors = []
+
+        def work():
+            try:
+                reminders.send_due(batch_size, reminders.MemoryNotifier())
+            except Exception as exc:  # reported below; one thread failing shouldn't hang the rest
+                errors.append(exc)
+            finally:
+                connections.close_all()
+
+        if threads == 1:
+            started = timer.perf_counter()
+            work()
+        else:
+            connection.close()  # each thread opens its own
+            workers = [threading.Thread(target=work) for _ in range(threads)]
+            started = timer.perf_counter()
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+        elapsed = timer.perf_counter() - started
+        sent = reminders.MemoryNotifier.sent
+        self.stdout.write(self.style.SUCCESS(
+            f"{threads} worker{'s' if threads > 1 else ''}: {len(sent):,} of {due:,} due sent in {elapsed:.2f}s "
+            f"({len(sent) / elapsed:,.0f}/s), {len(sent) - len(set(sent))} sent twice, "
+            f"{Appointment.objects.filter(remind_at__lte=timezone.now()).count()} left due"
+        ))
+        for exc in errors:
+            self.stderr.write(f"Worker failed: {exc!r}")
@@ -0,0 +1,68 @@
+import gzip
+import time as timer
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from accounts.serializers import UserSerializer
+from api.renderers import FastJSONRenderer, orjson
+from api.serializers import AppointmentSerializer
+
+from .bench_serializers import Command as SerializerBench
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class Command(BaseCommand):
+    help = (
+        "Render pre-serialized appointment and doctor list payloads with DRF's JSONRenderer "
+        "and FastJSONRenderer; report render time and bytes on the wire (raw, gzip, brotli)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        appointments = SerializerBench().build(options['rows'])
+        doctors = list({a.doctor_id: a.doctor for a in appointments}.values())
+        payloads = [
+            ('appointment list', AppointmentSerializer(appointments, many=True).data),
+            ('doctor list', UserSerializer(doctors * 20, many=True).data),
+        ]
+        # Without orjson FastJSONRenderer is DRF's stdlib renderer, so that row is the fallback.
+        renderers = [('DRF JSONRenderer (stdlib)', JSONRenderer())]
+        if orjson is not None:
+            renderers.append(('FastJSONRenderer (orjson)', FastJSONRenderer()))
+        else:
+            self.stdout.write('orjson is not installed; FastJSONRenderer uses the stdlib path.')
+
+        for name, data in payloads:
+            self.stdout.write(f"\n{name} ({len(data):,} rows)")
+            self.stdout.write(f"{'renderer':<30}{'ms':>10}{'rows/sec':>14}")
+            for label, renderer in renderers:
+                best = min(self.time(renderer, data) for _ in range(options['repeat']))
+                self.stdout.write(f"{label:<30}{best * 1000:>10.1f}{len(data) / best:>14,.0f}")
+
+            body = FastJSONRenderer().render(data)
+            self.stdout.write(f"{'encoding':<30}{'bytes':>14}{'ms':>10}")
+            self.report_encoding('identity', body, lambda b: b)
+            self.report_encoding('gzip (level 6)', body, lambda b: gzip.compress(b, compresslevel=6))
+            if brotli is not None:
+                self.report_encoding('br (quality 5)', body, lambda b: brotli.compress(b, quality=5))
+            else:
+                self.stdout.write(f"{'br':<30}{'brotli not installed':>24}")
+
+    def time(self, renderer, data):
+        started = timer.perf_counter()
+        renderer.render(data)
+        return timer.perf_counter() - started
+
+    def report_encoding(self, label, body, encode):
+        started = timer.perf_counter()
+        encoded = encode(body)
+        elapsed = timer.perf_counter() - started
+        self.stdout.write(f"{label:<30}{len(encoded):>14,}{elapsed * 1000:>10.1f}")
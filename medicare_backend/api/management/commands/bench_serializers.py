@@ -0,0 +1,76 @@
+import time as timer
+from datetime import date, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.models import Appointment, PatientProfile
+from api.serializers import AppointmentSerializer, AppointmentSummarySerializer
+
+User = get_user_model()
+
+VARIANTS = [
+    ('full (default)', AppointmentSerializer, ''),
+    ('?view=summary', AppointmentSummarySerializer, 'view=summary'),
+    ('?view=summary&expand=patient_details', AppointmentSummarySerializer, 'view=summary&expand=patient_details'),
+    ('?fields=id,date,time,status', AppointmentSerializer, 'fields=id,date,time,status'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Serialize and render in-memory appointment lists (no database access) with the "
+        "full, summary and sparse representations; report rows/sec and payload bytes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        appointments = self.build(options['rows'])
+        factory = APIRequestFactory()
+        renderer = JSONRenderer()
+
+        self.stdout.write(f"{'representation':<42}{'rows/sec':>12}{'bytes':>14}{'bytes/row':>11}")
+        for label, serializer_class, query in VARIANTS:
+            request = Request(factory.get(f'/api/appointments/?{query}'))
+            best = None
+            for _ in range(options['repeat']):
+                started = timer.perf_counter()
+                data = serializer_class(appointments, many=True, context={'request': request}).data
+                payload = renderer.render(data)
+                elapsed = timer.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            self.stdout.write(f"{label:<42}{len(appointments) / best:>12,.0f}"
+                              f"{len(payload):>14,}{len(payload) / len(appointments):>11.0f}")
+
+    def build(self, rows):
+        doctors = []
+        for i in range(50):
+            doctor = User(id=i + 1, username=f'doctor{i}', email=f'doctor{i}@medicare.com', first_name='Gregory',
+                          last_name=f'House{i}', role='doctor', specialization='Cardiology', experience=12,
+                          consultation_fee=Decimal('500.00'), rating=Decimal('4.8'), is_verified=True,
+                          bio='Board certified cardiologist. ' * 10, address='221B Baker Street')
+            doctor.profile = PatientProfile(user=doctor)
+            doctors.append(doctor)
+        patients = []
+        for i in range(1000):
+            patient = User(id=1000 + i, username=f'patient{i}', email=f'patient{i}@medicare.com',
+                           first_name='Lisa', last_name=f'Cuddy{i}')
+            patient.profile = PatientProfile(user=patient, blood_group='O+', date_of_birth=date(1990, 1, 1),
+                                             allergies='Penicillin', medical_history='Appendectomy in 2010')
+            patients.append(patient)
+        start, now = date(2025, 1, 1), timezone.now()
+        return [
+            Appointment(id=i + 1, patient=patients[i % len(patients)], doctor=doctors[i % len(doctors)],
+                        date=start + timedelta(days=i // 400), time=time(9 + i % 8, 0), status='confirmed',
+                        notes='Follow-up visit', consultation_fee=Decimal('500.00'),
+                        created_at=now)
+            for i in range(rows)
+        ]
@@ -0,0 +1,75 @@
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time as timer
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+PROBES = {
+    'python': [sys.executable, '-c', 'pass'],  # interpreter alone, for reference
+    'wsgi import': [sys.executable, '-c', 'import config.wsgi'],
+    'manage.py check': [sys.executable, 'manage.py', 'check'],
+}
+# Enough for prod.py to load; nothing is served
+PROD_PLACEHOLDERS = {'DJANGO_SECRET_KEY': 'bench-startup', 'DJANGO_ALLOWED_HOSTS': 'localhost'}
+
+
+class Command(BaseCommand):
+    help = (
+        "Time process startup per settings profile: importing the WSGI application (what a "
+        "gunicorn worker pays before its first request) and `manage.py check`, each in a fresh "
+        "interpreter. --imports lists the packages that import slowest behind the WSGI application."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', default='dev,prod', help="comma-separated DJANGO_ENV values")
+        parser.add_argument('--settings-module', default='config.settings',
+                            help="DJANGO_SETTINGS_MODULE for the child processes")
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--imports', type=int, default=0, metavar='N',
+                            help="show the N packages that take longest to import per profile")
+
+    def handle(self, *args, **options):
+        profiles = [profile.strip() for profile in options['profiles'].split(',') if profile.strip()]
+        self.stdout.write(f"{'profile':<8}{'probe':<18}{'median ms':>10}{'min ms':>9}{'max ms':>9}")
+        for profile in profiles:
+            env = self.environment(profile, options['settings_module'])
+            for label, command in PROBES.items():
+                timings = [self.run(command, env) for _ in range(options['repeat'])]
+                self.stdout.write(f"{profile:<8}{label:<18}{statistics.median(timings):>10.0f}"
+                                  f"{min(timings):>9.0f}{max(timings):>9.0f}")
+            if options['imports']:
+                self.slowest_imports(env, options['imports'])
+
+    def environment(self, profile, settings_module):
+        env = {**os.environ, 'DJANGO_ENV': profile, 'DJANGO_SETTINGS_MODULE': settings_module}
+        if profile == 'prod':
+            for name, value in PROD_PLACEHOLDERS.items():
+                env.setdefault(name, value)
+        return env
+
+    def run(self, command, env):
+        started = timer.perf_counter()
+        result = subprocess.run(command, cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+        elapsed = (timer.perf_counter() - started) * 1000
+        if result.returncode:
+            raise CommandError(f"{' '.join(command[1:])} failed for DJANGO_ENV={env['DJANGO_ENV']}:\n"
+                               f"{result.stderr.strip()}")
+        return elapsed
+
+    def slowest_imports(self, env, count):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import config.wsgi'],
+                                cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+        # "import time: self [us] | cumulative | imported package", one line per module
+        by_package = defaultdict(int)
+        for line in result.stderr.splitlines():
+            match = re.match(r'import time:\s+(\d+) \|\s+\d+ \|\s+(\S+)', line)
+            if match:
+                by_package[match[2].split('.')[0]] += int(match[1])
+        self.stdout.write(f"  slowest packages to import ({env['DJANGO_ENV']}), ms:")
+        for package, micros in sorted(by_package.items(), key=lambda item: -item[1])[:count]:
+            self.stdout.write(f"    {micros / 1000:>8.1f}  {package}")
@@ -0,0 +1,81 @@
+import csv
+import io
+import os
+import random
+import time as timer
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from accounts.bulk_import import UserImporter, read_csv
+from accounts.serializers import RegisterSerializer
+from api.management.commands.bench_doctor_search import CITIES, FIRST_NAMES, LAST_NAMES, SPECIALIZATIONS
+from api.management.commands.bench_login import PROFILES
+
+COLUMNS = ['email', 'password', 'first_name', 'last_name', 'role', 'specialization', 'experience',
+           'consultation_fee', 'address', 'phone', 'blood_group']
+
+
+def sample_csv(count, seed):
+    """A hospital group's roster: mostly doctors, some patients, a few bad rows."""
+    rng = random.Random(seed)
+    handle = io.StringIO()
+    writer = csv.writer(handle)
+    writer.writerow(COLUMNS)
+    for i in range(count):
+        doctor = rng.random() < 0.8
+        writer.writerow([
+            f'bench.import.{i}@medicare.com' if rng.random() > 0.01 else 'not-an-email',
+            f'Import@{i:06d}', rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES),
+            'doctor' if doctor else 'patient', rng.choice(SPECIALIZATIONS) if doctor else '',
+            rng.randint(0, 40) if doctor else '', rng.choice([300, 500, 800]) if doctor else '',
+            f'{i} Main Road, {rng.choice(CITIES)}', f'555{i:07d}', '' if doctor else rng.choice(['A+', 'O+', 'B-']),
+        ])
+    return handle.getvalue()
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure users created/sec from a CSV: RegisterSerializer one row at a time (the "
+        "per-request path) against the bulk import with hashing inline and in a process pool. "
+        "Everything runs in rolled-back transactions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000, help="Rows for the bulk import runs")
+        parser.add_argument('--register-rows', type=int, default=100, help="Rows through RegisterSerializer")
+        parser.add_argument('--workers', type=int, default=os.cpu_count())
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--profile', choices=PROFILES, default='default',
+                            help="Password hasher; 'default' is the production one, which dominates the cost")
+        parser.add_argument('--seed', type=int, default=23)
+
+    def handle(self, *args, **options):
+        hashers = PROFILES[options['profile']]
+        with override_settings(**({'PASSWORD_HASHERS': hashers} if hashers else {})):
+            data = sample_csv(options['rows'], options['seed'])
+            self.stdout.write(f"{'path':<34}{'rows':>7}{'users/sec':>11}{'queries/row':>13}")
+            self.measure('RegisterSerializer per row', options['register_rows'],
+                         lambda: self.register(data, options['register_rows']))
+            for workers in sorted({1, options['workers']}):
+                importer = UserImporter(batch_size=options['batch_size'], workers=workers)
+                label = f"bulk import, {workers} hashing process{'es' if workers > 1 else ''}"
+                self.measure(label, options['rows'], lambda: importer.run(read_csv(io.StringIO(data))).created)
+
+    def measure(self, label, rows, run):
+        with transaction.atomic(), CaptureQueriesContext(connection) as queries:
+            started = timer.perf_counter()
+            run()
+            elapsed = timer.perf_counter() - started
+            transaction.set_rollback(True)
+        self.stdout.write(f"{label:<34}{rows:>7}{rows / elapsed:>11,.1f}{len(queries) / rows:>13.2f}")
+
+    def register(self, data, count):
+        created = 0
+        for _, row in zip(range(count), read_csv(io.StringIO(data))):
+            serializer = RegisterSerializer(data=row[1])
+            if serializer.is_valid():
+                serializer.save()
+                created += 1
+        return created
@@ -0,0 +1,55 @@
+import sys
+import time as timer
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from api.export import CONTENT_TYPES, encode, filter_appointments, rows
+from api.models import Appointment
+
+
+def date_argument(value):
+    try:
+        day = parse_date(value)
+    except ValueError:
+        day = None
+    if day is None:
+        raise ValueError(value)
+    return day
+
+
+class Command(BaseCommand):
+    help = (
+        "Write appointments as CSV or NDJSON (the rows GET /api/appointments/export/ streams), "
+        "one day at a time so memory stays flat however many rows there are."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--type', choices=CONTENT_TYPES, default='csv')
+        parser.add_argument('--from', dest='start', type=date_argument, metavar='YYYY-MM-DD')
+        parser.add_argument('--to', dest='end', type=date_argument, metavar='YYYY-MM-DD')
+        parser.add_argument('--doctor', type=int, help="Only this doctor id")
+        parser.add_argument('--output', '-o', help="File to write (default: stdout)")
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if options['start'] and options['end'] and options['start'] > options['end']:
+            raise CommandError("--from must not be after --to.")
+        queryset = filter_appointments(Appointment.objects.all(), options['start'], options['end'], options['doctor'])
+        exported = 0
+
+        def counted(source):
+            nonlocal exported
+            for row in source:
+                exported += 1
+                yield row
+
+        started = timer.perf_counter()
+        out = open(options['output'], 'w', newline='', encoding='utf-8') if options['output'] else sys.stdout
+        try:
+            for chunk in encode(counted(rows(queryset, options['chunk_size'])), options['type']):
+                out.write(chunk)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        self.stderr.write(f"{exported:,} appointments in {timer.perf_counter() - started:.1f}s")
@@ -0,0 +1,98 @@
+import csv
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from accounts import geo
+from accounts.directory import invalidate_directory
+
+User = get_user_model()
+
+# CSV column -> how a row finds its doctor(s), in order of preference
+KEY_COLUMNS = ('id', 'username', 'email', 'address')
+FIELDS = ['clinic_latitude', 'clinic_longitude', 'clinic_geohash', 'updated_at']
+
+
+def normalize_key(address):
+    return re.sub(r'\s+', ' ', (address or '').strip().lower())
+
+
+class Command(BaseCommand):
+    help = (
+        "Set doctors' clinic coordinates from a CSV geocoded offline. Columns: latitude/lat, "
+        "longitude/lon and one of id, username, email or address (exact match ignoring case "
+        "and spacing; every doctor at that address is updated)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Report matches without saving')
+
+    def handle(self, *args, **options):
+        with open(options['csv_path'], newline='', encoding='utf-8-sig') as handle:
+            reader = csv.DictReader(handle)
+            columns = set(reader.fieldnames or ())
+            key = next((name for name in KEY_COLUMNS if name in columns), None)
+            lat_column = 'latitude' if 'latitude' in columns else 'lat'
+            lon_column = 'longitude' if 'longitude' in columns else 'lon'
+            if key is None or not {lat_column, lon_column} <= columns:
+                raise CommandError(f"Need latitude/lat, longitude/lon and one of {', '.join(KEY_COLUMNS)} columns.")
+
+            coordinates, invalid = {}, []
+            for line, row in enumerate(reader, start=2):
+                try:
+                    lat, lon = float(row[lat_column]), float(row[lon_column])
+                    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+                        raise ValueError
+                except (TypeError, ValueError):
+                    invalid.append(line)
+                    continue
+                value = normalize_key(row[key]) if key in ('address', 'email') else row[key].strip()
+                coordinates[value] = (lat, lon)
+
+        doctors = self.match(key, coordinates)
+        unmatched = len(coordinates) - len({value for value, _ in doctors})
+        if not options['dry_run']:
+            self.save([pk for _, pk in doctors], [coordinates[value] for value, _ in doctors], options['batch_size'])
+
+        for line in invalid[:20]:
+            self.stderr.write(f"line {line}: invalid coordinates")
+        if len(invalid) > 20:
+            self.stderr.write(f"... and {len(invalid) - 20} more invalid lines")
+        verb = 'Would update' if options['dry_run'] else 'Updated'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {len(doctors)} doctors; {unmatched} rows matched no doctor, {len(invalid)} were invalid."
+        ))
+
+    def match(self, key, coordinates):
+        """[(csv key value, doctor pk)] for every doctor a row names."""
+        doctors = User.objects.filter(role='doctor')
+        if key in ('address', 'email'):
+            # Compared normalized, which no index can serve: one pass over the doctors
+            rows = doctors.exclude(**{key: ''}).exclude(**{key: None}).values_list(key, 'pk')
+            return [(normalize_key(value), pk) for value, pk in rows.iterator()
+                    if normalize_key(value) in coordinates]
+        values = [value for value in coordinates if key == 'username' or value.isdigit()]
+        found = []
+        for start in range(0, len(values), 1000):
+            rows = doctors.filter(**{f'{key}__in': values[start:start + 1000]}).values_list(key, 'pk')
+            found += [(str(value), pk) for value, pk in rows]
+        return found
+
+    def save(self, pks, locations, batch_size):
+        now = timezone.now()
+        with transaction.atomic():
+            for start in range(0, len(pks), batch_size):
+                batch = [
+                    User(pk=pk, clinic_latitude=lat, clinic_longitude=lon,
+                         clinic_geohash=geo.encode(lat, lon), updated_at=now)
+                    for pk, (lat, lon) in zip(pks[start:start + batch_size], locations[start:start + batch_size])
+                ]
+                # bulk_update skips save() and the signals, so the geohash and the
+                # directory cache are handled here
+                User.objects.bulk_update(batch, FIELDS)
+            transaction.on_commit(invalidate_directory)
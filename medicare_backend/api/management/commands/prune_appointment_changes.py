@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.changes import prune
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete appointment change-feed entries older than CHANGE_FEED_RETENTION. Clients "
+        "whose cursor falls before the oldest remaining entry get 410 and reload the full list."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Keep this many days instead of the setting')
+
+    def handle(self, *args, **options):
+        retention = timedelta(days=options['days']) if options['days'] else settings.CHANGE_FEED_RETENTION
+        deleted = prune(timezone.now() - retention)
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} change-feed entries."))
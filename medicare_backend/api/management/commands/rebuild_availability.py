@@ -0,0 +1,35 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.availability import rebuild_day
+from api.models import Appointment
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute doctor-day occupancy bitmaps from appointments. Needed after loading "
+        "appointments with bulk_create/update(), which skip the signals that maintain them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctor', type=int, help='Only this doctor id')
+        parser.add_argument('--all-dates', action='store_true', help='Include past days (default: today onwards)')
+
+    def handle(self, *args, **options):
+        appointments = Appointment.objects.all()
+        if options['doctor']:
+            appointments = appointments.filter(doctor_id=options['doctor'])
+        if not options['all_dates']:
+            appointments = appointments.filter(date__gte=timezone.localdate())
+
+        doctors = {}
+        count = 0
+        days = appointments.values_list('doctor_id', 'date').distinct().order_by('doctor_id', 'date')
+        for count, (doctor_id, day) in enumerate(days.iterator(), start=1):
+            if doctor_id not in doctors:
+                doctors[doctor_id] = User.objects.get(pk=doctor_id)
+            rebuild_day(doctors[doctor_id], day)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} doctor-days."))
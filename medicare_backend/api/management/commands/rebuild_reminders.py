@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api.reminders import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute when upcoming appointments' reminders are due. Needed after loading "
+        "appointments with bulk_create/update(), which skip Appointment.save(), and once "
+        "after the migration that adds the column."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--include-due', action='store_true',
+                            help="Also set reminders due already, which may have been sent (first run only)")
+
+    def handle(self, *args, **options):
+        updated = rebuild(include_due=options['include_due'])
+        self.stdout.write(self.style.SUCCESS(f"Updated {updated} appointments."))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from accounts.models import SearchTerm
+from accounts.search import DatabaseIndex, get_search_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the doctor search index from the users table. Needed after loading doctors "
+        "with bulk_create/update(), which skip the signals that maintain it."
+    )
+
+    def handle(self, *args, **options):
+        index = get_search_index()
+        if not isinstance(index, DatabaseIndex):
+            self.stdout.write("DOCTOR_SEARCH_BACKEND is per-process; it rebuilds itself on first search.")
+            return
+        index.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt the doctor search index ({SearchTerm.objects.count()} postings)."))
@@ -0,0 +1,55 @@
+import signal
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.jobs import Worker
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued background jobs (api/jobs.py) until stopped with SIGTERM/Ctrl-C, which "
+        "lets running jobs finish. Each process runs --threads jobs at a time; --processes "
+        "starts that many worker processes (or run this command several times, on any hosts "
+        "sharing the database). Also enqueues JOB_SCHEDULE runs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4, help="Jobs run at once per process")
+        parser.add_argument('--processes', type=int, default=1)
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds between checks when idle")
+        parser.add_argument('--burst', action='store_true', help="Exit once no jobs are due")
+
+    def handle(self, *args, **options):
+        if options['processes'] > 1:
+            return self.supervise(options)
+        worker = Worker(threads=options['threads'], poll_interval=options['poll_interval'])
+        previous = {number: signal.signal(number, lambda *_: worker.stop()) for number in (signal.SIGTERM, signal.SIGINT)}
+        self.stdout.write(f"Job worker {worker.name} running {worker.threads} at a time.")
+        try:
+            count = worker.run(burst=options['burst'])
+        finally:
+            for number, handler in previous.items():
+                signal.signal(number, handler)
+        self.stdout.write(f"Job worker {worker.name} stopped after {count} jobs.")
+
+    def supervise(self, options):
+        command = [sys.executable, '-m', 'django', 'run_jobs', '--threads', str(options['threads']),
+                   '--poll-interval', str(options['poll_interval']), *(['--burst'] if options['burst'] else [])]
+        # Children inherit DJANGO_SETTINGS_MODULE/DJANGO_ENV from this process's environment
+        children = [subprocess.Popen(command, cwd=settings.BASE_DIR) for _ in range(options['processes'])]
+
+        def forward(number, frame):
+            for child in children:
+                child.send_signal(number)
+
+        previous = {number: signal.signal(number, forward) for number in (signal.SIGTERM, signal.SIGINT)}
+        try:
+            codes = [child.wait() for child in children]
+        finally:
+            for number, handler in previous.items():
+                signal.signal(number, handler)
+        if any(codes):
+            raise CommandError(f"Worker processes exited with {codes}.", returncode=max(codes))
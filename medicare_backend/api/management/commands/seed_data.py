@@ -0,0 +1,164 @@
+import itertools
+import random
+import time as timer
+from datetime import date, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from api.management.commands.bench_doctor_search import CITIES, FIRST_NAMES, LAST_NAMES, SPECIALIZATIONS
+from api.models import Appointment, PatientProfile
+
+User = get_user_model()
+
+SEED_PREFIX = 'seed_'
+SEED_PASSWORD = 'Seed@123'
+SLOTS_PER_DAY = 16  # 09:00 - 17:00 in 30 minute slots, the default working hours
+BLOOD_GROUPS = ['A+', 'A-', 'B+', 'B-', 'AB+', 'AB-', 'O+', 'O-']
+# Status mix by whether the day has passed
+PAST_STATUSES = (['completed', 'cancelled', 'confirmed', 'pending'], [75, 15, 5, 5])
+FUTURE_STATUSES = (['pending', 'confirmed', 'cancelled'], [40, 50, 10])
+
+
+def skewed_weights(count, exponent):
+    """Zipf-like weights: the first few get most of the traffic."""
+    return list(itertools.accumulate(1 / (rank ** exponent) for rank in range(1, count + 1)))
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a local database with realistic volumes for benchmarking: doctors, patients "
+        "(most with a PatientProfile) and appointments spread over --past-days and "
+        "--future-days. Booking volume grows towards today and skips weekends; a few "
+        "popular doctors and frequent patients get most bookings (popular doctors' days "
+        "fill up); statuses depend on whether the day has passed. Every seeded user has "
+        f"the password {SEED_PASSWORD!r}. Rows are written with bulk_create in batches, "
+        "then the availability and search indexes are rebuilt."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=2_000)
+        parser.add_argument('--patients', type=int, default=100_000)
+        parser.add_argument('--appointments', type=int, default=2_000_000)
+        parser.add_argument('--profile-ratio', type=float, default=0.7,
+                            help="Share of patients with a PatientProfile")
+        parser.add_argument('--past-days', type=int, default=730)
+        parser.add_argument('--future-days', type=int, default=60)
+        parser.add_argument('--batch-size', type=int, default=5_000)
+        parser.add_argument('--seed', type=int, default=21)
+        parser.add_argument('--clear', action='store_true', help="Delete earlier seeded users and their appointments first")
+
+    def handle(self, *args, **options):
+        existing = User.objects.filter(username__startswith=SEED_PREFIX)
+        if existing.exists():
+            if not options['clear']:
+                raise CommandError(f"Seeded users ({SEED_PREFIX}*) already exist; pass --clear to replace them.")
+            self.stdout.write("Deleting earlier seed data...")
+            existing.delete()
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        started = timer.perf_counter()
+        doctors = self.seed_doctors(options['doctors'])
+        patients = self.seed_patients(options['patients'], options['profile_ratio'])
+        self.seed_appointments(doctors, patients, options)
+        self.stdout.write(f"Seeded in {timer.perf_counter() - started:.0f}s; rebuilding derived tables...")
+
+        # bulk_create skips the signals that keep these current
+        call_command('rebuild_availability', stdout=self.stdout)
+        call_command('rebuild_search_index', stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f"Done. Log in as {SEED_PREFIX}patient0 / {SEED_PREFIX}doctor0 "
+                                             f"with {SEED_PASSWORD!r}."))
+
+    def seed_doctors(self, count):
+        rng, password = self.rng, make_password(SEED_PASSWORD)
+        User.objects.bulk_create([
+            User(username=f'{SEED_PREFIX}doctor{i}', email=f'{SEED_PREFIX}doctor{i}@medicare.com',
+                 password=password, role='doctor', is_verified=rng.random() < 0.95,
+                 first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES),
+                 specialization=rng.choice(SPECIALIZATIONS), address=f'{i} Main Road, {rng.choice(CITIES)}',
+                 experience=rng.randint(0, 40), rating=round(rng.uniform(3, 5), 1),
+                 consultation_fee=rng.choice([300, 500, 800, 1000, 1500]))
+            for i in range(count)
+        ], batch_size=self.batch_size)
+        doctors = list(User.objects.filter(username__startswith=f'{SEED_PREFIX}doctor', is_verified=True)
+                       .order_by('pk').values_list('pk', 'consultation_fee'))
+        self.stdout.write(f"{count:,} doctors ({len(doctors):,} verified)")
+        return doctors
+
+    def seed_patients(self, count, profile_ratio):
+        rng, password = self.rng, make_password(SEED_PASSWORD)
+        for start in range(0, count, self.batch_size):
+            with transaction.atomic():
+                User.objects.bulk_create([
+                    User(username=f'{SEED_PREFIX}patient{i}', email=f'{SEED_PREFIX}patient{i}@medicare.com',
+                         password=password, first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES),
+                         age=rng.randint(1, 90), phone=f'555{i:07d}'[:15])
+                    for i in range(start, min(start + self.batch_size, count))
+                ])
+        patients = list(User.objects.filter(username__startswith=f'{SEED_PREFIX}patient')
+                        .order_by('pk').values_list('pk', flat=True))
+        profiled = [pk for pk in patients if rng.random() < profile_ratio]
+        for start in range(0, len(profiled), self.batch_size):
+            PatientProfile.objects.bulk_create([
+                PatientProfile(user_id=pk, blood_group=rng.choice(BLOOD_GROUPS),
+                               date_of_birth=date(1940, 1, 1) + timedelta(days=rng.randint(0, 30_000)))
+                for pk in profiled[start:start + self.batch_size]
+            ])
+        self.stdout.write(f"{len(patients):,} patients, {len(profiled):,} with profiles")
+        rng.shuffle(patients)  # frequent patients shouldn't be the oldest accounts
+        return patients
+
+    def seed_appointments(self, doctors, patients, options):
+        rng, today = self.rng, timezone.localdate()
+        days = [today + timedelta(days=offset) for offset in range(-options['past_days'], options['future_days'] + 1)]
+        days = [day for day in days if day.weekday() < 5]
+        # Volume grows linearly towards today; booked-ahead days thin out again
+        volume = [1 + i / len(days) if day <= today else 2 * (1 - (day - today).days / (options['future_days'] + 1))
+                  for i, day in enumerate(days)]
+        scale = options['appointments'] / sum(volume)
+        doctor_weights = skewed_weights(len(doctors), 0.8)
+        patient_weights = skewed_weights(len(patients), 0.5)
+        capacity = len(doctors) * SLOTS_PER_DAY
+
+        batch, created, started = [], 0, timer.perf_counter()
+        for day, share in zip(days, volume):
+            wanted = min(round(share * scale), capacity // 2)
+            booked = set()  # (doctor index, slot) already taken this day
+            statuses = PAST_STATUSES if day < today else FUTURE_STATUSES
+            for status in rng.choices(*statuses, k=wanted):
+                # A popular doctor's full day sends the patient to someone else
+                for _ in range(10):
+                    doctor = rng.choices(range(len(doctors)), cum_weights=doctor_weights)[0]
+                    slot = rng.randrange(SLOTS_PER_DAY)
+                    if (doctor, slot) not in booked:
+                        break
+                else:
+                    continue
+                if status != 'cancelled':
+                    booked.add((doctor, slot))
+                doctor_id, fee = doctors[doctor]
+                start = time(9 + slot // 2, 30 * (slot % 2))
+                batch.append(Appointment(
+                    doctor_id=doctor_id, patient_id=rng.choices(patients, cum_weights=patient_weights)[0],
+                    date=day, time=start, status=status, holds_slot=Appointment.slot_marker(status),
+                    remind_at=Appointment.reminder_time(day, start, status) if day >= today else None,
+                    consultation_fee=fee,
+                ))
+                if len(batch) >= self.batch_size:
+                    created += self.flush(batch)
+                    batch = []
+                    if created % (self.batch_size * 40) < self.batch_size:
+                        rate = created / (timer.perf_counter() - started)
+                        self.stdout.write(f"  {created:,} appointments (up to {day}), {rate:,.0f}/s")
+        created += self.flush(batch)
+        self.stdout.write(f"{created:,} appointments")
+
+    def flush(self, batch):
+        with transaction.atomic():
+            Appointment.objects.bulk_create(batch)
+        return len(batch)
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+from api.reminders import BATCH_SIZE, get_notifier, send_due
+
+
+class Command(BaseCommand):
+    help = (
+        "Send the appointment reminders due now. run_jobs does this every minute "
+        "(JOB_SCHEDULE); this is for cron or a one-off run without a worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--notifier', help="Dotted path of a notifier class instead of REMINDER_NOTIFIER, "
+                                               "e.g. api.reminders.LogNotifier")
+
+    def handle(self, *args, **options):
+        notifier = import_string(options['notifier'])() if options['notifier'] else get_notifier()
+        sent = send_due(options['batch_size'], notifier)
+        self.stdout.write(self.style.SUCCESS(f"Sent {sent} reminders."))
@@ -0,0 +1,187 @@
+"""
+Per-request performance numbers, by view.
+
+MetricsMiddleware (api/middleware.py) times each request and, through
+execute wrappers on every database connection, its queries. Serializers with
+TimedSerializerMixin add their validation and output time. Each request then
+
+- feeds the Prometheus histograms served at /metrics,
+- gets a Server-Timing header (app, db, serialize) for the browser's devtools,
+- is logged with its costliest SQL if it took SLOW_REQUEST_SECONDS or longer.
+
+Views are labelled app.Class.action ("api.AppointmentViewSet.list",
+"accounts.CustomTokenObtainPairView.post"). Histograms live in the process:
+with several workers each scrape sees the worker that answered it.
+"""
+import hmac
+import logging
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+SIZE_BUCKETS = (256, 1024, 4096, 16_384, 65_536, 262_144, 1_048_576, 4_194_304)
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Histogram:
+    """A Prometheus histogram, one series per combination of label values."""
+
+    def __init__(self, name, documentation, labels, buckets):
+        self.name, self.documentation, self.labels, self.buckets = name, documentation, labels, buckets
+        self.lock = threading.Lock()
+        self.series = {}  # label values -> [per-bucket counts (last is +Inf), sum]
+
+    def observe(self, values, amount):
+        with self.lock:
+            series = self.series.get(values)
+            if series is None:
+                series = self.series[values] = [[0] * (len(self.buckets) + 1), 0]
+            series[0][bisect_left(self.buckets, amount)] += 1
+            series[1] += amount
+
+    def reset(self):
+        with self.lock:
+            self.series = {}
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            series = sorted((values, list(counts), total) for values, (counts, total) in self.series.items())
+        for values, counts, total in series:
+            labels = ','.join(f'{label}="{escape(value)}"' for label, value in zip(self.labels, values))
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                le = '+Inf' if bound == math.inf else repr(bound)
+                lines.append(f'{self.name}_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{labels}}} {total}')
+            lines.append(f'{self.name}_count{{{labels}}} {cumulative}')
+        return '\n'.join(lines)
+
+
+REQUEST_DURATION = Histogram('medicare_request_duration_seconds', "Wall time of a request, middleware included.",
+                             ('view', 'method', 'status'), DURATION_BUCKETS)
+DB_QUERIES = Histogram('medicare_db_queries_per_request', "Database queries run by a request.",
+                       ('view',), QUERY_BUCKETS)
+DB_DURATION = Histogram('medicare_db_duration_seconds', "Time a request spent in database queries.",
+                        ('view',), DURATION_BUCKETS)
+SERIALIZER_DURATION = Histogram('medicare_serializer_duration_seconds',
+                                "Time a request spent validating and serializing (queries it triggers included).",
+                                ('view',), DURATION_BUCKETS)
+RESPONSE_SIZE = Histogram('medicare_response_size_bytes', "Response body size as sent (after compression).",
+                          ('view',), SIZE_BUCKETS)
+HISTOGRAMS = (REQUEST_DURATION, DB_QUERIES, DB_DURATION, SERIALIZER_DURATION, RESPONSE_SIZE)
+
+
+class RequestMetrics:
+    """What one request cost so far. Installed as an execute wrapper, it times every query."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view = 'unresolved'
+        self.queries = 0
+        self.db_time = 0.0
+        self.statements = {}  # SQL (placeholders, not values) -> [count, seconds]
+        self.serializer_time = 0.0
+        self.serializing = False
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.queries += 1
+            self.db_time += elapsed
+            statement = self.statements.setdefault(sql, [0, 0.0])
+            statement[0] += 1
+            statement[1] += elapsed
+
+    def costliest_statements(self, limit):
+        return sorted(self.statements.items(), key=lambda item: -item[1][1])[:limit]
+
+
+request_metrics = ContextVar('request_metrics', default=None)
+
+
+def view_label(view_func, method):
+    # DRF puts the class on .cls and a viewset's method -> action map on .actions
+    view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+    if view_class is None:
+        return f'{view_func.__module__}.{view_func.__name__}'
+    actions = getattr(view_func, 'actions', None) or {}
+    handler = actions.get(method.lower(), method.lower())
+    return f"{view_class.__module__.split('.')[0]}.{view_class.__name__}.{handler}"
+
+
+def record(state, request, response):
+    """Observe a finished request, add its Server-Timing header and log it if slow."""
+    elapsed = time.perf_counter() - state.started
+    REQUEST_DURATION.observe((state.view, request.method, str(response.status_code)), elapsed)
+    DB_QUERIES.observe((state.view,), state.queries)
+    DB_DURATION.observe((state.view,), state.db_time)
+    SERIALIZER_DURATION.observe((state.view,), state.serializer_time)
+    if not response.streaming:
+        RESPONSE_SIZE.observe((state.view,), len(response.content))
+
+    if settings.SERVER_TIMING_HEADER:
+        response.headers['Server-Timing'] = ', '.join([
+            f'app;dur={elapsed * 1000:.1f}',
+            f'db;dur={state.db_time * 1000:.1f};desc="{state.queries} queries"',
+            f'serialize;dur={state.serializer_time * 1000:.1f}',
+        ])
+
+    if elapsed >= settings.SLOW_REQUEST_SECONDS:
+        statements = ''.join(
+            f'\n  {count}x {seconds * 1000:.1f} ms  {sql}'
+            for sql, (count, seconds) in state.costliest_statements(settings.SLOW_REQUEST_SQL_LIMIT)
+        )
+        logger.warning(
+            "Slow request: %s %s (%s) took %.0f ms, %d queries in %.0f ms, serializing %.0f ms%s",
+            request.method, request.path, state.view, elapsed * 1000, state.queries,
+            state.db_time * 1000, state.serializer_time * 1000, statements,
+        )
+
+
+class TimedSerializerMixin:
+    """Counts is_valid() and the outermost to_representation() as the request's serializer time."""
+
+    def is_valid(self, *args, **kwargs):
+        return timed_serialization(super().is_valid, *args, **kwargs)
+
+    def to_representation(self, instance):
+        return timed_serialization(super().to_representation, instance)
+
+
+def timed_serialization(function, *args, **kwargs):
+    state = request_metrics.get()
+    if state is None or state.serializing:  # nested serializers are inside their parent's time
+        return function(*args, **kwargs)
+    state.serializing = True
+    started = time.perf_counter()
+    try:
+        return function(*args, **kwargs)
+    finally:
+        state.serializer_time += time.perf_counter() - started
+        state.serializing = False
+
+
+def metrics_view(request):
+    """GET /metrics: the histograms in Prometheus text format."""
+    token = settings.METRICS_TOKEN
+    if token and not hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode()):
+        return HttpResponseForbidden()
+    body = '\n'.join(histogram.render() for histogram in HISTOGRAMS) + '\n'
+    return HttpResponse(body, content_type='text/plain; version=0.0.4; charset=utf-8')
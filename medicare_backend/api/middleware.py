@@ -0,0 +1,111 @@
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import cc_delim_re, patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+
+from .metrics import RequestMetrics, record, request_metrics, view_label
+from .routers import RoutingState, pin_to_primary, routing_state
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is always available
+    brotli = None
+
+re_accepts_brotli = _lazy_re_compile(r'\bbr\b')
+
+
+def carries_secrets(response):
+    directives = cc_delim_re.split(response.get('Cache-Control', '').lower())
+    return bool(response.cookies) or 'no-store' in directives
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Compress responses of at least COMPRESSION_MIN_SIZE bytes: Brotli when the
+    client accepts it and the `brotli` package is installed, gzip otherwise.
+    Streaming responses are always gzipped chunk by chunk.
+
+    Responses that set cookies or are marked Cache-Control: no-store (the JWT
+    login and refresh responses) are left uncompressed: with a secret in the
+    body next to input an attacker controls, the compressed length gives the
+    secret away (BREACH). Skipping them is the mitigation, not padding: only
+    Django's gzip adds a few random bytes, Brotli output is not padded.
+    """
+
+    def process_response(self, request, response):
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+        if response.has_header('Content-Encoding') or carries_secrets(response):
+            return response
+
+        accepts = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if brotli is None or response.streaming or not re_accepts_brotli.search(accepts):
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        compressed = brotli.compress(response.content, quality=settings.COMPRESSION_BROTLI_QUALITY)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Gives each request its own replica routing state (api/routers.py) and,
+    after a request that wrote, keeps the user's reads on the primary for
+    REPLICA_PIN_SECONDS.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = RoutingState()
+        token = routing_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            routing_state.reset(token)
+        # DRF copies the authenticated user onto the Django request
+        user = getattr(request, 'user', None)
+        if state.wrote and user is not None and user.is_authenticated:
+            pin_to_primary(user.pk)
+        return response
+
+
+class MetricsMiddleware:
+    """
+    Times each request, its queries (an execute wrapper on every connection)
+    and its serializers, and records them (api/metrics.py). First in
+    MIDDLEWARE, so the timings include every other middleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = RequestMetrics()
+        token = request_metrics.set(state)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(state))
+                response = self.get_response(request)
+        finally:
+            request_metrics.reset(token)
+        record(state, request, response)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = request_metrics.get()
+        if state is not None:
+            state.view = view_label(view_func, request.method)
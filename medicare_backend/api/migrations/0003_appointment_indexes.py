@@ -0,0 +1,58 @@
+# Generated by Django 4.2.27 on 2026-10-18 19:18
+
+from django.db import migrations, models
+
+
+def release_cancelled_slots(apps, schema_editor):
+    Appointment = apps.get_model('api', 'Appointment')
+    Appointment.objects.filter(status='cancelled').update(holds_slot=None)
+
+
+def check_double_bookings(apps, schema_editor):
+    Appointment = apps.get_model('api', 'Appointment')
+    clashes = (Appointment.objects.filter(holds_slot=True).values('doctor_id', 'date', 'time')
+               .annotate(count=models.Count('id')).filter(count__gt=1).order_by('doctor_id', 'date', 'time'))
+    if clashes:
+        lines = []
+        for clash in clashes:
+            ids = (Appointment.objects.filter(holds_slot=True, doctor_id=clash['doctor_id'], date=clash['date'],
+                                              time=clash['time']).order_by('id').values_list('id', flat=True))
+            lines.append(f"doctor {clash['doctor_id']} on {clash['date']} at {clash['time']}: "
+                         f"appointments {', '.join(map(str, ids))}")
+        raise RuntimeError(
+            "These slots have more than one active (not cancelled) appointment; cancel or move all but one "
+            "before migrating:\n" + '\n'.join(lines)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_alter_appointment_consultation_fee_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='holds_slot',
+            field=models.BooleanField(default=True, editable=False, null=True),
+        ),
+        migrations.RunPython(release_cancelled_slots, migrations.RunPython.noop),
+        migrations.RunPython(check_double_bookings, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['patient', 'date'], name='appointment_patient_date'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['status', 'date'], name='appointment_status_date'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['date', 'status'], name='appointment_date_status'),
+        ),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=models.UniqueConstraint(fields=('doctor', 'date', 'time', 'holds_slot'), name='unique_active_doctor_slot'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 4.2.27 on 2026-10-18 19:23
+
+import math
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# A copy of api.availability as of this migration, so later changes there
+# don't change what it does: 96 fifteen-minute granules, little-endian bytes.
+GRANULE_MINUTES = 15
+GRANULES_PER_DAY = 24 * 60 // GRANULE_MINUTES
+FULL_DAY = (1 << GRANULES_PER_DAY) - 1
+
+
+def day_bitmap(starts, slot_minutes):
+    bits = 0
+    count = max(1, math.ceil(slot_minutes / GRANULE_MINUTES))
+    for start in starts:
+        first = (start.hour * 60 + start.minute) // GRANULE_MINUTES
+        bits |= ((1 << count) - 1) << first
+    return (bits & FULL_DAY).to_bytes(GRANULES_PER_DAY // 8, 'little')
+
+
+def build_existing_slots(apps, schema_editor):
+    Appointment = apps.get_model('api', 'Appointment')
+    DoctorDaySlots = apps.get_model('api', 'DoctorDaySlots')
+    User = apps.get_model('accounts', 'User')
+
+    slot_minutes = dict(User.objects.filter(role='doctor').values_list('id', 'slot_minutes'))
+    days = {}
+    for doctor_id, day, start in Appointment.objects.filter(holds_slot=True).values_list('doctor_id', 'date', 'time'):
+        days.setdefault((doctor_id, day), []).append(start)
+    DoctorDaySlots.objects.bulk_create([
+        DoctorDaySlots(doctor_id=doctor_id, date=day,
+                       occupied=day_bitmap(starts, slot_minutes.get(doctor_id, 30)))
+        for (doctor_id, day), starts in days.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('accounts', '0005_user_working_hours'),
+        ('api', '0003_appointment_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DoctorDaySlots',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('occupied', models.BinaryField(default=b'\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00')),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='day_slots', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='doctordayslots',
+            constraint=models.UniqueConstraint(fields=('doctor', 'date'), name='unique_doctor_day_slots'),
+        ),
+        migrations.RunPython(build_existing_slots, migrations.RunPython.noop),
+    ]
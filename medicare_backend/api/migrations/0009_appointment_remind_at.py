@@ -0,0 +1,46 @@
+# Generated by Django 4.2.27 on 2026-10-18 20:45
+
+from datetime import datetime
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+# Appointment.REMINDED_STATUSES as of this migration
+REMINDED_STATUSES = ('pending', 'confirmed')
+
+
+def set_existing_reminders(apps, schema_editor):
+    """
+    remind_at of every upcoming pending/confirmed appointment, as
+    Appointment.reminder_time() computes it: one UPDATE per (date, time).
+    Nothing was ever sent before this field, so reminders already due (the
+    appointment starts within REMINDER_LEAD) are set too, and go out next run.
+    """
+    Appointment = apps.get_model('api', 'Appointment')
+    now = timezone.now()
+    upcoming = Appointment.objects.filter(date__gte=timezone.localdate(), status__in=REMINDED_STATUSES)
+    for day, start in upcoming.values_list('date', 'time').distinct().order_by('date', 'time').iterator():
+        starts_at = timezone.make_aware(datetime.combine(day, start))
+        if starts_at > now:
+            upcoming.filter(date=day, time=start).update(remind_at=starts_at - settings.REMINDER_LEAD)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='remind_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['remind_at'], name='appointment_remind_at'),
+        ),
+        migrations.RunPython(set_existing_reminders, migrations.RunPython.noop),
+    ]
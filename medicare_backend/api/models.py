@@ -1,9 +1,23 @@
+from datetime import datetime
+
 from django.db import models
 from django.conf import settings  
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
 
 # If you have an Appointment model, keep it here. 
 # I am including it just in case, based on our previous steps.
 class Appointment(models.Model):
+    # Bulk status changes: target status -> statuses it may be reached from
+    STATUS_TRANSITIONS = {
+        'confirmed': ('pending',),
+        'cancelled': ('pending', 'confirmed'),
+        'completed': ('pending', 'confirmed'),
+    }
+    # Statuses whose patients get a reminder (api/reminders.py)
+    REMINDED_STATUSES = ('pending', 'confirmed')
+    SCHEDULE_FIELDS = {'date', 'time', 'status'}
+
     patient = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='appointments_as_patient')
     doctor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='appointments_as_doctor')
     date = models.DateField()
@@ -12,10 +26,82 @@ class Appointment(models.Model):
     notes = models.TextField(blank=True, null=True)
     consultation_fee = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Bumped on every save(); code using update() must set it too (HTTP validators).
+    updated_at = models.DateTimeField(auto_now=True)
+    # True while the booking holds its (doctor, date, time) slot, NULL once cancelled.
+    # NULLs never collide in a unique index, so 'unique_active_doctor_slot' only
+    # applies to active bookings (MySQL has no conditional unique indexes).
+    # Kept in sync by save(); code using bulk_create/update() must set it too.
+    holds_slot = models.BooleanField(null=True, default=True, editable=False)
+    # When the reminder is due: REMINDER_LEAD before date + time, NULL once sent
+    # or if there is nothing to remind of. Set by save() when date, time or
+    # status change; code using bulk_create/update() must set it too.
+    remind_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # (doctor, date, time) is covered by the unique constraint below.
+            models.Index(fields=['patient', 'date'], name='appointment_patient_date'),
+            models.Index(fields=['status', 'date'], name='appointment_status_date'),
+            models.Index(fields=['date', 'status'], name='appointment_date_status'),
+            # Due reminders: WHERE remind_at <= now ORDER BY remind_at
+            models.Index(fields=['remind_at'], name='appointment_remind_at'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['doctor', 'date', 'time', 'holds_slot'], name='unique_active_doctor_slot'
+            ),
+        ]
 
     def __str__(self):
         return f"Appointment: {self.patient} with {self.doctor}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if {'doctor_id', 'date', 'time', 'holds_slot'} <= set(field_names):
+            instance.snapshot_slot()
+        if {'patient_id', 'doctor_id'} <= set(field_names):
+            # Who could see this row when loaded; the change feed tells them if that changes.
+            instance._stored_parties = (instance.patient_id, instance.doctor_id)
+        if 'status' in field_names:
+            instance._loaded_status = instance.status  # for status_changed push events
+        if cls.SCHEDULE_FIELDS <= set(field_names):
+            instance._stored_schedule = (instance.date, instance.time, instance.status)
+        return instance
+
+    def snapshot_slot(self):
+        # The (doctor, date, time) this row occupied when loaded/saved, used by
+        # the availability signals to release the old slot on cancel/reschedule.
+        self._stored_slot = (self.doctor_id, self.date, self.time) if self.holds_slot else None
+
+    @staticmethod
+    def slot_marker(status):
+        return None if status == 'cancelled' else True
+
+    @classmethod
+    def reminder_time(cls, day, start, status):
+        """remind_at for an appointment at `day` `start` (local time): None if cancelled, done or past."""
+        if status not in cls.REMINDED_STATUSES:
+            return None
+        starts_at = timezone.make_aware(datetime.combine(day, start))
+        return starts_at - settings.REMINDER_LEAD if starts_at > timezone.now() else None
+
+    def save(self, *args, **kwargs):
+        self.holds_slot = self.slot_marker(self.status)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'status' in update_fields:
+            kwargs['update_fields'] = update_fields = {*update_fields, 'holds_slot'}
+        schedule = (self.date, self.time, self.status)
+        # Only on a change: saving a reminded appointment mustn't re-arm its reminder
+        if getattr(self, '_stored_schedule', None) != schedule and (
+                update_fields is None or self.SCHEDULE_FIELDS & set(update_fields)):
+            self.remind_at = self.reminder_time(*schedule)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'remind_at'}
+        super().save(*args, **kwargs)
+        self._stored_schedule = schedule
+
 # --- THIS IS THE NEW MODEL YOU ADDED ---
 class PatientProfile(models.Model):
     # FIX: Use settings.AUTH_USER_MODEL instead of CustomUser
@@ -25,6 +111,107 @@ class PatientProfile(models.Model):
     address = models.TextField(null=True, blank=True)
     allergies = models.TextField(null=True, blank=True, help_text="e.g. Peanuts, Penicillin")
     medical_history = models.TextField(null=True, blank=True, help_text="Past surgeries, chronic conditions")
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
-        return f"Profile of {self.user.username}"
\ No newline at end of file
+        return f"Profile of {self.user.username}"
+
+class DoctorDaySlots(models.Model):
+    """Occupancy bitmap of one doctor's day; see api/availability.py."""
+    doctor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='day_slots')
+    date = models.DateField()
+    occupied = models.BinaryField(default=bytes(12))
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['doctor', 'date'], name='unique_doctor_day_slots'),
+        ]
+
+    def __str__(self):
+        return f"Slots of {self.doctor} on {self.date}"
+
+
+class IdempotencyKey(models.Model):
+    """Stored response of a create request sent with an Idempotency-Key header."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64, help_text="SHA-256 of method, path and body")
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True, help_text="Empty while in progress")
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_user_idempotency_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.user})"
+
+
+class AppointmentChange(models.Model):
+    """
+    Append-only log behind /api/appointments/changes/; see api/changes.py.
+    The id is the clients' sync cursor. patient/doctor are copied from the
+    appointment so the feed can be scoped like the list, even after a delete.
+    """
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+    ACTION_CHOICES = ((UPSERT, 'Created or updated'), (DELETE, 'Deleted'))
+
+    appointment_id = models.BigIntegerField()
+    # Plain ids, no FK constraint: entries outlive deleted users and appointments.
+    patient = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING, db_constraint=False,
+                                db_index=False, related_name='+')
+    doctor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING, db_constraint=False,
+                               db_index=False, related_name='+')
+    action = models.CharField(max_length=6, choices=ACTION_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Scoped feed reads: WHERE doctor_id = ? AND id > cursor ORDER BY id
+            models.Index(fields=['doctor', 'id'], name='change_doctor_cursor'),
+            models.Index(fields=['patient', 'id'], name='change_patient_cursor'),
+        ]
+
+    def __str__(self):
+        return f"{self.action} appointment {self.appointment_id}"
+
+
+class Job(models.Model):
+    """A queued call of a background task; see api/jobs.py."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = ((QUEUED, 'Queued'), (RUNNING, 'Running'), (SUCCEEDED, 'Succeeded'), (FAILED, 'Failed'))
+
+    task = models.CharField(max_length=200, help_text="Dotted path of the @task function")
+    kwargs = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    # Not run before this; retries move it forward by the backoff
+    run_at = models.DateTimeField()
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField()
+    # At most one job per key (NULLs never collide): scheduled runs, deduplicated enqueues
+    key = models.CharField(max_length=255, null=True, blank=True)
+    # Which worker claimed it and when; a claim older than JOB_LEASE is presumed lost
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Claiming: WHERE status = 'queued' AND run_at <= now ORDER BY run_at
+            # (also serves the lease and retention sweeps on the other statuses)
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['key'], name='unique_job_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.task} ({self.status})"
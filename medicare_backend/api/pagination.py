@@ -0,0 +1,121 @@
+import base64
+import json
+from functools import reduce
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset ("seek") pagination over a fixed, unique ordering.
+
+    The cursor is the ordering values of the last row on the page, so fetching
+    page N is a WHERE on the index instead of an OFFSET scan over N pages.
+
+    Opt-in: clients that send neither ?cursor= nor ?page_size= get the plain
+    unpaginated list, exactly like before pagination was added.
+    """
+    ordering = ('-id',)
+    cursor_query_param = 'cursor'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+
+        encoded = params.get(self.cursor_query_param)
+        if encoded:
+            queryset = queryset.filter(self.seek_filter(self.decode_cursor(encoded, queryset.model)))
+
+        # Fetch one extra row to know whether there is a next page.
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def seek_filter(self, values):
+        # (a, b, c) after (x, y, z)  ==  a>x OR (a=x AND b>y) OR (a=x AND b=y AND c>z)
+        clauses = []
+        for i, field in enumerate(self.ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            equal = {f.lstrip('-'): v for f, v in zip(self.ordering[:i], values[:i])}
+            clauses.append(Q(**equal, **{f'{name}__{lookup}': values[i]}))
+        return reduce(lambda a, b: a | b, clauses)
+
+    def encode_cursor(self, instance):
+        values = [str(getattr(instance, f.lstrip('-'))) for f in self.ordering]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def decode_cursor(self, encoded, model):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        # Well-formed JSON can still hold values the ordering fields can't compare with
+        fields = [model._meta.get_field(f.lstrip('-')) for f in self.ordering]
+        try:
+            values = [field.to_python(value) for field, value in zip(fields, values)]
+        except (ValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if None in values:
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_first_link(self):
+        return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'first': self.get_first_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'first': {'type': 'string', 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class AppointmentKeysetPagination(KeysetPagination):
+    # Same newest-first order the unpaginated list has always used; id breaks ties.
+    ordering = ('-date', '-time', '-id')
+
+
+class UserKeysetPagination(KeysetPagination):
+    ordering = ('id',)
@@ -0,0 +1,158 @@
+"""
+Server-Sent Events stream of appointment events at /api/events/.
+
+This is a plain ASGI app mounted in config/asgi.py next to Django rather than
+a Django view: Django 4.2 does not notice a client disconnecting in the middle
+of a streaming response, so an idle stream would never be cleaned up. Here
+the stream waits on the broker queue and on the client's disconnect message
+at the same time. It needs an ASGI server (uvicorn, daphne); under runserver
+/api/events/ is a 404 and browsers simply don't reconnect.
+
+Authentication is a simplejwt access token, in the Authorization header or
+as ?token= (EventSource cannot send headers), checked like the REST API's:
+a revoked token (see accounts.authentication) can't open a stream, and an
+open one is closed at the first keepalive after it is revoked or expires.
+"""
+import asyncio
+import json
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+from rest_framework_simplejwt.utils import aware_utcnow
+
+from accounts.authentication import ClaimsJWTAuthentication
+
+from .events import get_broker, offer, user_channel
+
+EVENTS_PATH = '/api/events/'
+
+# Queue markers, never sent to the client as events
+KEEPALIVE = object()
+DISCONNECTED = object()
+
+
+def header(scope, name):
+    for key, value in scope['headers']:
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+
+def raw_token(scope):
+    authorization = header(scope, b'authorization') or ''
+    if authorization.startswith('Bearer '):
+        return authorization[len('Bearer '):].strip()
+    return parse_qs(scope.get('query_string', b'').decode()).get('token', [None])[0]
+
+
+class StreamAuthentication(ClaimsJWTAuthentication):
+    request_is_safe = True  # a GET: the user comes from the claims, revocation from current_token_version()
+
+
+async def authenticate(scope):
+    """(the active user behind the token, the validated token), or (None, None)."""
+    token = raw_token(scope)
+    if not token:
+        return None, None
+    try:
+        validated = StreamAuthentication().get_validated_token(token)
+        return await still_valid(validated), validated
+    except (InvalidToken, TokenError):
+        return None, None
+
+
+async def still_valid(validated):
+    """The user of an already validated token, or None once it has expired or been revoked."""
+    try:
+        validated.check_exp(current_time=aware_utcnow())  # not the time it was validated at
+        return await sync_to_async(StreamAuthentication().get_user)(validated)
+    except (InvalidToken, AuthenticationFailed, TokenError):
+        return None
+
+
+def cors_headers(scope):
+    origin = header(scope, b'origin')
+    if origin and (settings.CORS_ALLOW_ALL_ORIGINS or origin in getattr(settings, 'CORS_ALLOWED_ORIGINS', ())):
+        return [(b'access-control-allow-origin', origin.encode('latin-1')), (b'vary', b'Origin')]
+    return []
+
+
+def format_event(event):
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode()
+
+
+class EventStream:
+    keepalive = 25  # seconds; keeps proxies from closing idle streams
+    retry_ms = 5000
+
+    def __init__(self, broker=None):
+        self.broker = broker
+        self.last_event = self.last_chunk = None
+
+    def encode(self, event):
+        # Every subscriber of a channel is handed the same dict: encode it once.
+        if event is not self.last_event:
+            self.last_event, self.last_chunk = event, format_event(event)
+        return self.last_chunk
+
+    async def __call__(self, scope, receive, send):
+        if scope['method'] != 'GET':
+            return await self.reject(scope, send, 405, 'Method not allowed.')
+        user, token = await authenticate(scope)
+        if user is None:
+            return await self.reject(scope, send, 401, 'Authentication credentials were not provided or are invalid.')
+
+        broker = self.broker or get_broker()
+        channel = user_channel(user.pk)
+        queue = broker.subscribe(channel)
+        # An idle stream is just this coroutine waiting on queue.get(), a watcher
+        # waiting on receive() and a timer; both push markers into the queue.
+        watcher = asyncio.ensure_future(self.watch_for_disconnect(receive, queue))
+        loop = asyncio.get_running_loop()
+        try:
+            await send({'type': 'http.response.start', 'status': 200, 'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),  # nginx: don't buffer the stream
+                *cors_headers(scope),
+            ]})
+            await send({'type': 'http.response.body', 'body': f'retry: {self.retry_ms}\n\n'.encode(),
+                        'more_body': True})
+            while True:
+                timer = loop.call_later(self.keepalive, offer, queue, KEEPALIVE)
+                event = await queue.get()
+                timer.cancel()
+                if event is DISCONNECTED:
+                    break
+                if event is KEEPALIVE and await still_valid(token) is None:
+                    break  # expired or revoked while streaming
+                chunk = b': keepalive\n\n' if event is KEEPALIVE else self.encode(event)
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        finally:
+            watcher.cancel()
+            broker.unsubscribe(channel, queue)
+
+    async def watch_for_disconnect(self, receive, queue):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+        if queue.full():
+            queue.get_nowait()  # the client is gone; its pending events don't matter
+        queue.put_nowait(DISCONNECTED)
+
+    async def reject(self, scope, send, status, detail):
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': [(b'content-type', b'application/json'), *cors_headers(scope)]})
+        await send({'type': 'http.response.body', 'body': json.dumps({'detail': detail}).encode()})
+
+
+def with_event_stream(application, stream=None):
+    """Route /api/events/ to the event stream and everything else to `application`."""
+    stream = stream or EventStream()
+
+    async def router(scope, receive, send):
+        if scope['type'] == 'http' and scope['path'] == EVENTS_PATH:
+            return await stream(scope, receive, send)
+        return await application(scope, receive, send)
+    return router
@@ -0,0 +1,201 @@
+"""
+Appointment reminders, REMINDER_LEAD before each pending or confirmed
+appointment.
+
+Appointment.remind_at says when a booking's reminder is due. save() sets it
+from date, time and status (so booking, rescheduling and cancelling keep it
+right), and it is NULL once the reminder is sent or when there is nothing to
+remind of. Finding due reminders is then a range scan of the remind_at index,
+however many upcoming appointments there are, rather than a scan of them all
+every minute.
+
+claim() takes a batch of due reminders with SELECT ... FOR UPDATE SKIP LOCKED
+where the database has it (MySQL 8, PostgreSQL); on SQLite one conditional
+UPDATE picks the batch, as for jobs. Claiming moves remind_at to the end of a
+lease (REMINDER_LEASE), which also tells this claim's rows from another's.
+send_due() hands each batch to the REMINDER_NOTIFIER and clears remind_at of
+what it sent, unless the appointment was rescheduled meanwhile. A batch whose
+notifier failed, or whose worker died, comes due again when the lease ends:
+reminders are sent at least once. Claims and releases that find the database
+busy (SQLite's single writer) are retried after a short backoff.
+"""
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import DatabaseError, connections, router, transaction
+from django.db.models import Subquery
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .jobs import release_connections
+from .models import Appointment
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+# A claim or release that finds the database busy (SQLite's lock, a deadlock)
+# is tried this many times, after a doubling pause from RETRY_DELAY seconds
+RETRIES = 6
+RETRY_DELAY = 0.05
+
+
+def appointments():
+    # The primary: claims write, and must read back what they wrote
+    return Appointment.objects.using(router.db_for_write(Appointment))
+
+
+def get_notifier():
+    config = settings.REMINDER_NOTIFIER
+    return import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+
+
+def starts_at(appointment):
+    return timezone.make_aware(datetime.combine(appointment.date, appointment.time))
+
+
+def claim(limit=BATCH_SIZE, now=None):
+    """
+    Lease up to `limit` due reminders, earliest first. Returns (lease end,
+    appointments with patient and doctor).
+    """
+    now = now or timezone.now()
+    # Random microseconds: two claims in the same instant still get their own lease
+    lease_until = now + settings.REMINDER_LEASE + timedelta(microseconds=random.randrange(1_000_000))
+    due = appointments().filter(remind_at__lte=now).order_by('remind_at')
+    if connections[due.db].features.has_select_for_update_skip_locked:
+        with transaction.atomic(using=due.db):
+            pks = list(due.select_for_update(skip_locked=True).values_list('pk', flat=True)[:limit])
+            if not pks:
+                return lease_until, []
+            appointments().filter(pk__in=pks).update(remind_at=lease_until)
+    else:
+        # SQLite: pick and lease in one UPDATE, which takes the write lock up front
+        if not appointments().filter(pk__in=Subquery(due.values('pk')[:limit])).update(remind_at=lease_until):
+            return lease_until, []
+    claimed = appointments().filter(remind_at=lease_until).select_related('patient', 'doctor').order_by('pk')
+    return lease_until, list(claimed)
+
+
+def dispatch(lease_until, batch, notifier):
+    """Notify about a claimed batch. Returns how many reminders were sent."""
+    now = timezone.now()
+    upcoming = [appointment for appointment in batch if starts_at(appointment) > now]
+    try:
+        sent = set(notifier.send(upcoming)) if upcoming else set()
+    except Exception:
+        logger.exception("Reminder notifier failed for %d appointments; they come due again after REMINDER_LEASE",
+                         len(upcoming))
+        sent = set()
+    # Started already (e.g. the workers were down): too late to remind
+    done = sent | {appointment.pk for appointment in batch if starts_at(appointment) <= now}
+    # Still ours only if unchanged: a reschedule since the claim set a new remind_at
+    retrying(appointments().filter(pk__in=done, remind_at=lease_until).update, remind_at=None)
+    return len(sent)
+
+
+def retrying(operation, *args, **kwargs):
+    """Run one database operation, retrying it while the database is busy, as Worker.run does."""
+    for attempt in range(RETRIES):
+        try:
+            return operation(*args, **kwargs)
+        except DatabaseError:
+            if attempt == RETRIES - 1:
+                raise
+            logger.debug("Database busy (attempt %d), retrying", attempt + 1, exc_info=True)
+            release_connections()
+            time.sleep(RETRY_DELAY * 2 ** attempt * random.uniform(0.5, 1.5))
+
+
+def send_due(batch_size=BATCH_SIZE, notifier=None):
+    """Send every reminder due now, a batch at a time. Returns how many were sent."""
+    notifier = notifier or get_notifier()
+    sent = 0
+    while True:
+        lease_until, batch = retrying(claim, batch_size)
+        if not batch:
+            return sent
+        sent += dispatch(lease_until, batch, notifier)
+
+
+def rebuild(include_due=False, queryset=None):
+    """
+    Recompute remind_at of upcoming appointments (of `queryset`, default all),
+    e.g. after loading them with bulk_create/update(). One UPDATE per distinct
+    (date, time): every booking in that slot is due at the same moment.
+    Reminders due already are only set with `include_due` (they may have been
+    sent). Returns rows updated.
+    """
+    now = timezone.now()
+    upcoming = (queryset if queryset is not None else appointments()).filter(date__gte=timezone.localdate())
+    # Nothing to remind of: cancelled and completed
+    updated = upcoming.exclude(status__in=Appointment.REMINDED_STATUSES).exclude(remind_at=None).update(remind_at=None)
+    slots = upcoming.filter(status__in=Appointment.REMINDED_STATUSES).values_list('date', 'time').distinct()
+    for day, start in slots.order_by('date', 'time').iterator():
+        remind_at = Appointment.reminder_time(day, start, 'pending')
+        if remind_at is None or (remind_at <= now and not include_due):
+            continue
+        updated += upcoming.filter(date=day, time=start, status__in=Appointment.REMINDED_STATUSES).update(
+            remind_at=remind_at,
+        )
+    return updated
+
+
+class EmailNotifier:
+    """Emails each patient, over one mail connection per batch."""
+
+    def __init__(self, **options):
+        self.options = options  # passed to get_connection(), e.g. a backend
+
+    def send(self, appointments):
+        messages, sent = [], []
+        for appointment in appointments:
+            if appointment.patient.email:
+                messages.append(self.message(appointment))
+            sent.append(appointment.pk)  # no address: nothing to send, don't retry
+        get_connection(**self.options).send_messages(messages)
+        return sent
+
+    def message(self, appointment):
+        patient, doctor = appointment.patient, appointment.doctor
+        return EmailMessage(
+            f"Reminder: appointment on {appointment.date:%d %b %Y} at {appointment.time:%H:%M}",
+            f"Hello {patient.first_name},\n\n"
+            f"This is a reminder of your appointment with Dr. {doctor.first_name} {doctor.last_name}"
+            f"{f' ({doctor.specialization})' if doctor.specialization else ''} on {appointment.date:%A %d %B %Y} "
+            f"at {appointment.time:%H:%M}.\n\nMediCare",
+            None,
+            [patient.email],
+        )
+
+
+class LogNotifier:
+    """Logs the reminders instead of sending them (local development)."""
+
+    def __init__(self, **options):
+        pass
+
+    def send(self, appointments):
+        for appointment in appointments:
+            logger.info("Reminder for appointment %s: patient %s, %s %s", appointment.pk,
+                        appointment.patient_id, appointment.date, appointment.time)
+        return [appointment.pk for appointment in appointments]
+
+
+class MemoryNotifier:
+    """Keeps the ids it was given in MemoryNotifier.sent, like mail.outbox (tests, benchmarks)."""
+    sent = []
+    lock = threading.Lock()
+
+    def __init__(self, **options):
+        pass
+
+    def send(self, appointments):
+        ids = [appointment.pk for appointment in appointments]
+        with self.lock:
+            self.sent.extend(ids)
+        return ids
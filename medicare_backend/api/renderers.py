@@ -0,0 +1,23 @@
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # optional speed-up; the stdlib encoder is used without it
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes with orjson when it is installed.
+
+    orjson writes dates, times, datetimes and UUIDs itself; anything else it
+    doesn't know (Decimal, lazy translation strings, ...) goes through DRF's
+    own encoder so the output matches the stdlib renderer. Pretty-printed
+    requests (browsable API, ?indent) and missing orjson use the stdlib path.
+    """
+    orjson_options = orjson.OPT_UTC_Z if orjson else 0
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return orjson.dumps(data, default=self.encoder_class().default, option=self.orjson_options)
@@ -0,0 +1,96 @@
+"""
+Read replicas.
+
+Reads go to a replica only where a view opts in (ReplicaReadsMixin.replica_actions)
+for a GET/HEAD request; everything else, and every write, uses 'default'. Once
+a request writes, its remaining reads use 'default' too, and the user stays on
+'default' for REPLICA_PIN_SECONDS afterwards (ReplicaRoutingMiddleware), so
+nobody reads a replica that hasn't caught up with their own change yet. The
+pin lives in the default cache, which must be shared between workers for it
+to hold across them.
+
+Replicas are the aliases in settings.DATABASE_REPLICAS. One that can't be
+connected to is skipped for REPLICA_RETRY_SECONDS and its reads go to 'default'.
+"""
+import contextvars
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+from rest_framework.permissions import SAFE_METHODS
+
+logger = logging.getLogger(__name__)
+
+
+class RoutingState:
+    """Per-request: the replica reads may use, and whether anything was written."""
+
+    def __init__(self):
+        self.read_alias = None
+        self.wrote = False
+
+
+routing_state = contextvars.ContextVar('db_routing_state', default=None)
+
+# alias -> time.monotonic() after which it is tried again
+unavailable = {}
+
+
+def pin_key(user_id):
+    return f'db:pinned:{user_id}'
+
+
+def pin_to_primary(user_id):
+    cache.set(pin_key(user_id), 1, timeout=settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user):
+    return bool(user and user.is_authenticated and cache.get(pin_key(user.pk)))
+
+
+def healthy_replica():
+    """A random reachable replica alias, or None."""
+    now = time.monotonic()
+    aliases = [alias for alias in settings.DATABASE_REPLICAS if unavailable.get(alias, 0) <= now]
+    random.shuffle(aliases)
+    for alias in aliases:
+        try:
+            connections[alias].ensure_connection()  # no-op on a live persistent connection
+            return alias
+        except DatabaseError:
+            logger.warning("Replica %s is unavailable; reading from the primary", alias, exc_info=True)
+            unavailable[alias] = now + settings.REPLICA_RETRY_SECONDS
+    return None
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        state = routing_state.get()
+        if state is not None and state.read_alias and not state.wrote:
+            return state.read_alias
+        return None  # 'default'
+
+    def db_for_write(self, model, **hints):
+        state = routing_state.get()
+        if state is not None:
+            state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # every alias holds the same data
+
+
+class ReplicaReadsMixin:
+    """Lets GET/HEAD requests for the listed actions read from a replica."""
+    replica_actions = ()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)  # authentication reads the primary
+        state = routing_state.get()
+        if (state is not None and settings.DATABASE_REPLICAS and request.method in SAFE_METHODS
+                and self.action in self.replica_actions and not is_pinned(request.user)):
+            state.read_alias = healthy_replica()
@@ -1,17 +1,45 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from .metrics import TimedSerializerMixin
 from .models import Appointment, PatientProfile
 
 User = get_user_model() 
 
+# --- 0. Sparse Fieldsets (?fields= / ?expand=) ---
+class SparseFieldsMixin:
+    """
+    ?fields=id,date,status limits the output to those top-level fields.
+    ?expand=name swaps a compact nested field for the full serializer listed in
+    Meta.expandable_fields. Only the outermost serializer (the one given the
+    request in its context) reads the query string.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method != 'GET':
+            return  # never narrow the fields of a write
+        expand = query_list(request, 'expand')
+        for name, (serializer_class, options) in getattr(self.Meta, 'expandable_fields', {}).items():
+            if name in expand:
+                self.fields[name] = serializer_class(**options)
+        only = query_list(request, 'fields')
+        if only:
+            for name in set(self.fields) - only:
+                self.fields.pop(name)
+
+
+def query_list(request, param):
+    return {name.strip() for name in request.query_params.get(param, '').split(',') if name.strip()}
+
 # --- 1. Patient Profile Serializer ---
-class PatientProfileSerializer(serializers.ModelSerializer):
+class PatientProfileSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = PatientProfile
         fields = ['date_of_birth', 'blood_group', 'address', 'allergies', 'medical_history']
 
 # --- 2. User Serializer (Read-Only for displaying user info) ---
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     profile = PatientProfileSerializer(read_only=True)
 
     class Meta:
@@ -48,8 +76,8 @@ class RegisterSerializer(serializers.ModelSerializer):
         )
         return user
 
-# --- 4. Appointment Serializer ---
-class AppointmentSerializer(serializers.ModelSerializer):
+# --- 4. Appointment Serializers ---
+class AppointmentSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     patient_details = UserSerializer(source='patient', read_only=True)
     doctor_details = UserSerializer(source='doctor', read_only=True)
 
@@ -57,4 +85,33 @@ class AppointmentSerializer(serializers.ModelSerializer):
         model = Appointment
         fields = ['id', 'patient', 'patient_details', 'doctor', 'doctor_details', 
                   'date', 'time', 'status', 'notes', 'consultation_fee', 'created_at']
-        read_only_fields = ['patient', 'created_at']
\ No newline at end of file
+        read_only_fields = ['patient', 'created_at']
+
+
+class UserSummarySerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ['id', 'first_name', 'last_name', 'email', 'specialization']
+
+
+class AppointmentSummarySerializer(AppointmentSerializer):
+    """Compact list rows (?view=summary): people as 5-field summaries, no profiles."""
+    patient_details = UserSummarySerializer(source='patient', read_only=True)
+    doctor_details = UserSummarySerializer(source='doctor', read_only=True)
+
+    class Meta(AppointmentSerializer.Meta):
+        expandable_fields = {
+            'patient_details': (UserSerializer, {'source': 'patient', 'read_only': True}),
+            'doctor_details': (UserSerializer, {'source': 'doctor', 'read_only': True}),
+        }
+
+# --- 5. Bulk Operation Serializers (Request bodies for the bulk actions) ---
+class BulkIdsSerializer(TimedSerializerMixin, serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=500)
+
+    def validate_ids(self, value):
+        return list(dict.fromkeys(value))  # drop duplicates, keep order
+
+
+class BulkStatusSerializer(BulkIdsSerializer):
+    status = serializers.ChoiceField(choices=list(Appointment.STATUS_TRANSITIONS))
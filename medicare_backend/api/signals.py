@@ -0,0 +1,122 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .availability import occupy, rebuild_day, rebuild_doctor
+from .changes import record_delete, record_save
+from .events import CREATED, STATUS_CHANGED, appointment_payload, publish_on_commit
+from .models import Appointment
+from .stats import invalidate_stats
+from .tasks import send_booking_confirmation
+
+
+# The User fields user_stats() counts by
+STATS_USER_FIELDS = ('role', 'is_verified')
+
+
+@receiver([post_save, post_delete], sender=Appointment)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def appointment_or_user_changed(sender, **kwargs):
+    invalidate_stats()
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    if not created:
+        if update_fields is not None and not set(update_fields) & set(STATS_USER_FIELDS):
+            return  # e.g. last_login on every login
+        loaded = getattr(instance, '_loaded_access', None)  # (role, is_verified, is_active) as loaded
+        if loaded is not None and loaded[:2] == tuple(getattr(instance, name) for name in STATS_USER_FIELDS):
+            return  # a profile edit
+    invalidate_stats()
+
+
+def doctor_for(doctor_id, instance):
+    # None when the doctor itself is being deleted (cascade) - nothing to maintain then.
+    User = get_user_model()
+    try:
+        return instance.doctor if instance.doctor_id == doctor_id else User.objects.get(pk=doctor_id)
+    except User.DoesNotExist:
+        return None
+
+
+@receiver(post_save, sender=Appointment)
+def update_availability(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_stored_slot', None)
+    instance.snapshot_slot()
+    current = instance._stored_slot
+    if previous == current:
+        return
+    if previous and (doctor := doctor_for(previous[0], instance)):
+        rebuild_day(doctor, previous[1])
+    if current and (not previous or previous[:2] != current[:2]):
+        occupy(instance.doctor, instance.date, instance.time)
+
+
+# The doctor settings the occupancy bitmaps and free slots are computed from
+SCHEDULE_FIELDS = ('slot_minutes', 'work_start', 'work_end')
+
+
+@receiver(pre_save, sender=settings.AUTH_USER_MODEL)
+def note_schedule_change(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._schedule_changed = False
+    if raw or instance.pk is None or instance.role != 'doctor':
+        return
+    if update_fields is not None and not set(update_fields) & set(SCHEDULE_FIELDS):
+        return  # e.g. last_login on every login
+    stored = sender.objects.filter(pk=instance.pk).values_list(*SCHEDULE_FIELDS).first()
+    instance._schedule_changed = stored is not None and stored != tuple(
+        getattr(instance, name) for name in SCHEDULE_FIELDS
+    )
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def rebuild_doctor_availability(sender, instance, raw=False, **kwargs):
+    # Bits written with the old slot length would let overlapping bookings through
+    if not raw and getattr(instance, '_schedule_changed', False):
+        instance._schedule_changed = False
+        rebuild_doctor(instance)
+
+
+@receiver(post_delete, sender=Appointment)
+def release_availability(sender, instance, **kwargs):
+    previous = getattr(instance, '_stored_slot', None)
+    if previous and (doctor := doctor_for(previous[0], instance)):
+        rebuild_day(doctor, previous[1])
+
+
+@receiver(post_save, sender=Appointment)
+def log_saved_appointment(sender, instance, raw=False, **kwargs):
+    if not raw:
+        record_save(instance)
+
+
+@receiver(post_delete, sender=Appointment)
+def log_deleted_appointment(sender, instance, **kwargs):
+    record_delete(instance)
+
+
+@receiver(post_save, sender=Appointment)
+def push_appointment_event(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_loaded_status', None)
+    instance._loaded_status = instance.status
+    if not created and (previous is None or previous == instance.status):
+        return
+    payload = appointment_payload(instance.pk, instance.patient_id, instance.doctor_id,
+                                  instance.date, instance.time, instance.status)
+    if created:
+        publish_on_commit(CREATED, payload)
+    else:
+        publish_on_commit(STATUS_CHANGED, payload, previous_status=previous)
+
+
+@receiver(post_save, sender=Appointment)
+def queue_booking_confirmation(sender, instance, created, raw=False, **kwargs):
+    # Sent by the job worker once the booking commits, not while the patient waits
+    if created and not raw:
+        send_booking_confirmation.enqueue(appointment_id=instance.pk)
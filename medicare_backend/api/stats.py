@@ -0,0 +1,95 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .models import Appointment
+
+User = get_user_model()
+
+STATS_VERSION_KEY = 'stats:version'
+# Appointments whose fee counts as revenue
+REVENUE_STATUSES = ('confirmed', 'completed')
+
+
+def stats_version():
+    return cache.get_or_set(STATS_VERSION_KEY, 1, timeout=None)
+
+
+def invalidate_stats():
+    """Orphan every cached stats payload by bumping the version in their keys."""
+    cache.add(STATS_VERSION_KEY, 1, timeout=None)
+    try:
+        cache.incr(STATS_VERSION_KEY)
+    except ValueError:  # evicted between add() and incr()
+        cache.set(STATS_VERSION_KEY, 2, timeout=None)
+
+
+def default_range():
+    today = timezone.localdate()
+    return today - timedelta(days=30), today + timedelta(days=30)
+
+
+def appointment_stats(queryset, start, end):
+    # One GROUP BY status for counts + fee totals, one GROUP BY date for volumes.
+    by_status = {}
+    revenue = 0
+    for row in queryset.values('status').annotate(count=Count('id'), fees=Sum('consultation_fee')).order_by():
+        by_status[row['status']] = row['count']
+        if row['status'] in REVENUE_STATUSES:
+            revenue += row['fees'] or 0
+
+    per_day = [
+        {'date': row['date'].isoformat(), 'count': row['count']}
+        for row in queryset.filter(date__range=(start, end))
+                           .values('date').annotate(count=Count('id')).order_by('date')
+    ]
+    today = timezone.localdate().isoformat()
+    return {
+        'total': sum(by_status.values()),
+        'by_status': by_status,
+        'today': next((day['count'] for day in per_day if day['date'] == today), 0),
+        'revenue': f'{revenue:.2f}',
+        'patients': queryset.values('patient').distinct().count(),
+        'per_day': per_day,
+    }
+
+
+def user_stats():
+    by_role = {}
+    verified_doctors = 0
+    for row in User.objects.values('role').annotate(
+        count=Count('id'), verified=Count('id', filter=Q(is_verified=True))
+    ).order_by():
+        by_role[row['role']] = row['count']
+        if row['role'] == 'doctor':
+            verified_doctors = row['verified']
+    return {
+        'total': sum(by_role.values()),
+        'by_role': by_role,
+        'verified_doctors': verified_doctors,
+        'unverified_doctors': by_role.get('doctor', 0) - verified_doctors,
+    }
+
+
+def get_stats(user, start, end):
+    """Role-scoped dashboard numbers, cached for STATS_CACHE_TIMEOUT seconds."""
+    scope = 'all' if user.role == 'admin' else f'{user.role}:{user.pk}'
+    key = f'stats:v{stats_version()}:{scope}:{start}:{end}'
+    data = cache.get(key)
+    if data is not None:
+        return data
+
+    if user.role == 'doctor':
+        data = {'appointments': appointment_stats(Appointment.objects.filter(doctor=user), start, end)}
+    elif user.role == 'patient':
+        data = {'appointments': appointment_stats(Appointment.objects.filter(patient=user), start, end)}
+    else:
+        data = {'appointments': appointment_stats(Appointment.objects.all(), start, end), 'users': user_stats()}
+    data['range'] = {'from': start.isoformat(), 'to': end.isoformat()}
+
+    cache.set(key, data, timeout=settings.STATS_CACHE_TIMEOUT)
+    return data
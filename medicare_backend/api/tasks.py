@@ -0,0 +1,42 @@
+"""
+Background tasks (api/jobs.py): work a request shouldn't wait for. Queue one
+with task.enqueue(**kwargs) and run `python manage.py run_jobs`.
+"""
+from django.conf import settings
+from django.core.mail import send_mail
+from django.utils import timezone
+
+from .changes import prune
+from .jobs import task
+from .models import Appointment
+from .reminders import send_due
+
+
+@task(max_attempts=3)
+def send_booking_confirmation(appointment_id):
+    """Email the patient that their appointment is booked."""
+    appointment = Appointment.objects.select_related('patient', 'doctor').filter(pk=appointment_id).first()
+    if appointment is None or appointment.status == 'cancelled' or not appointment.patient.email:
+        return  # deleted or cancelled before the worker got to it
+    patient, doctor = appointment.patient, appointment.doctor
+    send_mail(
+        f"Appointment booked for {appointment.date:%d %b %Y} at {appointment.time:%H:%M}",
+        f"Hello {patient.first_name},\n\n"
+        f"Your appointment with Dr. {doctor.first_name} {doctor.last_name}"
+        f"{f' ({doctor.specialization})' if doctor.specialization else ''} on {appointment.date:%A %d %B %Y} "
+        f"at {appointment.time:%H:%M} is booked and {appointment.status}.\n\nMediCare",
+        None,
+        [patient.email],
+    )
+
+
+@task
+def prune_appointment_changes():
+    """Scheduled version of `manage.py prune_appointment_changes`."""
+    prune(timezone.now() - settings.CHANGE_FEED_RETENTION)
+
+
+@task(max_attempts=1)
+def send_due_reminders():
+    """Scheduled every minute (JOB_SCHEDULE): the next run picks up whatever this one left."""
+    send_due()
@@ -1,3 +1,1235 @@
-from django.test import TestCase
+import asyncio
+import base64
+import copy
+import csv
+import gzip
+import io
+import json
+import tempfile
+import threading
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import skipUnless
+from unittest.mock import patch
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections, transaction
+from django.db.models import Count
+from asgiref.sync import async_to_sync, sync_to_async
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.serializers import CustomTokenObtainPairSerializer
+
+from .jobs import Worker, enqueue, sweep, task
+from . import reminders
+from .reminders import MemoryNotifier, claim, dispatch, send_due
+from .models import Appointment, AppointmentChange, IdempotencyKey, Job, PatientProfile
+from .metrics import HISTOGRAMS
+from .events import InMemoryBackend, UnixSocketBackend, get_broker, user_channel
+from .push import EventStream
+from .renderers import FastJSONRenderer
+from .routers import is_pinned, pin_key, unavailable
+from .views import AppointmentViewSet
+
+User = get_user_model()
+
+
+# --- Query budget harness ---
+# Each endpoint gets a fixed number of queries it is allowed to run, no matter
+# how many rows it returns. Adding a nested serializer field without updating
+# the view's select_related/prefetch_related will blow the budget and fail here.
+QUERY_BUDGETS = {
+    'appointment-list': 2,      # ETag aggregate + appointments joined to users/profiles (user from JWT claims)
+    'appointment-detail': 1,
+    'user-doctors': 1,          # anonymous directory listing
+    'user-profile': 1,
+    'my-medical-profile': 1,    # profile get_or_create
+}
+
+
+class UserFactoryMixin:
+    def make_user(self, username, role='patient', **extra):
+        return User.objects.create_user(
+            username=username, email=f'{username}@medicare.com', password='Secret@123',
+            first_name=username.title(), last_name='Test', role=role, **extra
+        )
+
+    def client_for(self, user):
+        client = APIClient()
+        if user is not None:
+            token = CustomTokenObtainPairSerializer.get_token(user).access_token  # same claims as a real login
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        return client
+
+
+class QueryBudgetTestCase(UserFactoryMixin, TestCase):
+    """Base class with helpers for asserting per-endpoint query budgets."""
+
+    def assertWithinBudget(self, budget_name, func, *args, **kwargs):
+        budget = QUERY_BUDGETS[budget_name]
+        with CaptureQueriesContext(connection) as ctx:
+            response = func(*args, **kwargs)
+        executed = len(ctx.captured_queries)
+        if executed > budget:
+            queries = '\n'.join(q['sql'] for q in ctx.captured_queries)
+            self.fail(f"'{budget_name}' ran {executed} queries (budget {budget}):\n{queries}")
+        return response
+
+
+class AppointmentQueryBudgetTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        self.doctor = self.make_user('drhouse', role='doctor', is_verified=True)
+        self.admin = self.make_user('admin', role='admin')
+        PatientProfile.objects.create(user=self.doctor)
+        self.patients = []
+        for i in range(5):
+            patient = self.make_user(f'patient{i}')
+            PatientProfile.objects.create(user=patient, blood_group='O+')
+            self.patients.append(patient)
+
+    def book(self, count):
+        start = date.today() + timedelta(days=Appointment.objects.count())
+        for i in range(count):
+            Appointment.objects.create(
+                patient=self.patients[i % len(self.patients)], doctor=self.doctor,
+                date=start + timedelta(days=i), time=time(9, 0),
+            )
+
+    def test_list_is_constant_in_number_of_rows(self):
+        self.book(3)
+        small = self.assertWithinBudget('appointment-list', self.client_for(self.doctor).get, '/api/appointments/')
+        self.book(20)
+        large = self.assertWithinBudget('appointment-list', self.client_for(self.doctor).get, '/api/appointments/')
+        self.assertEqual(small.status_code, 200)
+        self.assertEqual(len(large.data), 23)
+
+    def test_list_for_each_role(self):
+        self.book(10)
+        for user in (self.doctor, self.patients[0], self.admin):
+            response = self.assertWithinBudget('appointment-list', self.client_for(user).get, '/api/appointments/')
+            self.assertEqual(response.status_code, 200)
+
+    def test_nested_profiles_are_serialized(self):
+        self.book(1)
+        response = self.client_for(self.patients[0]).get('/api/appointments/')
+        self.assertEqual(response.data[0]['patient_details']['profile']['blood_group'], 'O+')
+
+    def test_retrieve(self):
+        self.book(1)
+        appointment = Appointment.objects.get()
+        response = self.assertWithinBudget(
+            'appointment-detail', self.client_for(self.doctor).get, f'/api/appointments/{appointment.id}/'
+        )
+        self.assertEqual(response.data['doctor_details']['username'], 'drhouse')
+
+    def test_medical_profile(self):
+        response = self.assertWithinBudget(
+            'my-medical-profile', self.client_for(self.patients[0]).get, '/api/my-medical-profile/'
+        )
+        self.assertEqual(response.data['blood_group'], 'O+')
+
+
+class AppointmentPaginationTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        doctors = [self.make_user(f'doctor{i}', role='doctor', is_verified=True) for i in range(3)]
+        self.patient = self.make_user('patient')
+        # Every doctor is booked at the same (date, time)s so the id tie-breaker matters.
+        for i in range(12):
+            Appointment.objects.create(
+                patient=self.patient, doctor=doctors[i % 3],
+                date=date(2025, 1, 1) + timedelta(days=i // 6), time=time(9 + i // 3 % 2, 0),
+            )
+        self.client = self.client_for(self.make_user('admin', role='admin'))
+
+    def test_unpaginated_by_default(self):
+        response = self.client.get('/api/appointments/')
+        self.assertIsInstance(response.data, list)
+        self.assertEqual(len(response.data), 12)
+
+    def test_walk_all_pages(self):
+        seen = []
+        url = '/api/appointments/?page_size=5'
+        while url:
+            response = self.assertWithinBudget('appointment-list', self.client.get, url)
+            seen.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+        expected = list(Appointment.objects.order_by('-date', '-time', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/appointments/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 404)
+
+    def test_cursor_with_bad_values(self):
+        def cursor(values):
+            return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+        for url, values in [
+            ('/api/appointments/', ['x', 'y', 'z']),
+            ('/api/appointments/', ['2025-01-01', '09:00:00', 'abc']),
+            ('/api/appointments/', [1, 2, 3]),
+            ('/api/appointments/', ['2025-01-01', None, 5]),
+            ('/api/users/', ['abc']),
+            ('/api/users/', [[1]]),
+        ]:
+            with self.subTest(url=url, values=values):
+                response = self.client.get(url, {'cursor': cursor(values)})
+                self.assertEqual(response.status_code, 404)
+        valid = self.client.get('/api/appointments/', {'cursor': cursor(['2025-01-02', '09:00:00', 1])})
+        self.assertEqual(valid.status_code, 200)
+
+
+class AppointmentSlotConstraintTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        self.doctor = self.make_user('drhouse', role='doctor', is_verified=True)
+        self.payload = {'doctor': self.doctor.id, 'date': '2025-03-01', 'time': '10:00'}
+
+    def test_active_slot_cannot_be_double_booked(self):
+        first = self.client_for(self.make_user('alice')).post('/api/appointments/', self.payload)
+        second = self.client_for(self.make_user('bob')).post('/api/appointments/', self.payload)
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 400)
+        self.assertIn('time', second.data)
+
+    def test_cancelled_slot_can_be_rebooked(self):
+        alice = self.client_for(self.make_user('alice'))
+        booked = alice.post('/api/appointments/', self.payload).data
+        alice.patch(f"/api/appointments/{booked['id']}/", {'status': 'cancelled'})
+        again = self.client_for(self.make_user('bob')).post('/api/appointments/', self.payload)
+        self.assertEqual(again.status_code, 201)
+
+
+class StatsTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        self.doctor = self.make_user('drhouse', role='doctor', is_verified=True)
+        self.other_doctor = self.make_user('drwho', role='doctor')
+        self.patient = self.make_user('patient')
+        today = date.today()
+        for i, (status, fee) in enumerate([('pending', 100), ('confirmed', 200), ('completed', 300), ('cancelled', 400)]):
+            Appointment.objects.create(patient=self.patient, doctor=self.doctor, date=today,
+                                       time=time(9 + i, 0), status=status, consultation_fee=fee)
+        Appointment.objects.create(patient=self.patient, doctor=self.other_doctor,
+                                   date=today + timedelta(days=1), time=time(9, 0))
+
+    def test_doctor_stats(self):
+        data = self.client_for(self.doctor).get('/api/stats/').data
+        appointments = data['appointments']
+        self.assertEqual(appointments['total'], 4)
+        self.assertEqual(appointments['today'], 4)
+        self.assertEqual(appointments['by_status']['pending'], 1)
+        self.assertEqual(appointments['revenue'], '500.00')
+        self.assertEqual(appointments['patients'], 1)
+        self.assertNotIn('users', data)
+
+    def test_admin_stats(self):
+        data = self.client_for(self.make_user('admin', role='admin')).get('/api/stats/').data
+        self.assertEqual(data['appointments']['total'], 5)
+        self.assertEqual(len(data['appointments']['per_day']), 2)
+        self.assertEqual(data['users']['by_role'], {'doctor': 2, 'patient': 1, 'admin': 1})
+        self.assertEqual(data['users']['verified_doctors'], 1)
+
+    def test_cached_until_write(self):
+        client = self.client_for(self.doctor)
+        client.get('/api/stats/')
+        with self.assertNumQueries(0):  # cached; the user comes from the JWT claims
+            client.get('/api/stats/')
+        Appointment.objects.create(patient=self.patient, doctor=self.doctor, date=date.today(), time=time(15, 0))
+        self.assertEqual(client.get('/api/stats/').data['appointments']['total'], 5)
+
+    def test_user_saves_the_stats_dont_read_keep_the_cache(self):
+        with patch('api.signals.invalidate_stats') as invalidate:
+            self.patient.save(update_fields=['last_login'])
+            patient = User.objects.get(pk=self.patient.pk)
+            patient.first_name = 'Greg'
+            patient.save()
+            invalidate.assert_not_called()
+            doctor = User.objects.get(pk=self.other_doctor.pk)
+            doctor.is_verified = True
+            doctor.save(update_fields=['is_verified'])
+            invalidate.assert_called_once()
+
+    def test_invalid_range(self):
+        response = self.client_for(self.doctor).get('/api/stats/?from=2025-02-01&to=2025-01-01')
+        self.assertEqual(response.status_code, 400)
+
+
+class AvailabilityTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        self.doctor = self.make_user('drhouse', role='doctor', is_verified=True,
+                                     work_start=time(9, 0), work_end=time(11, 0), slot_minutes=30)
+        self.patient = self.make_user('patient')
+        # Next Monday, so the default Mon-Fri working days apply and nothing is in the past
+        self.monday = date.today() + timedelta(days=7 - date.today().weekday())
+        self.url = f'/api/doctors/{self.doctor.id}/availability/'
+
+    def free(self, day):
+        data = self.client_for(None).get(f'{self.url}?from={day}&to={day}').data
+        return data['days'][0]['slots']
+
+    def test_free_slots_follow_bookings(self):
+        self.assertEqual(self.free(self.monday), ['09:00', '09:30', '10:00', '10:30'])
+        appointment = Appointment.objects.create(patient=self.patient, doctor=self.doctor,
+                                                 date=self.monday, time=time(9, 30))
+        self.assertEqual(self.free(self.monday), ['09:00', '10:00', '10:30'])
+
+        appointment = Appointment.objects.get(pk=appointment.pk)
+        appointment.status = 'cancelled'
+        appointment.save()
+        self.assertEqual(self.free(self.monday), ['09:00', '09:30', '10:00', '10:30'])
+
+    def test_reschedule_and_delete(self):
+        appointment = Appointment.objects.create(patient=self.patient, doctor=self.doctor,
+                                                 date=self.monday, time=time(9, 0))
+        appointment.date = self.monday + timedelta(days=1)
+        appointment.save()
+        self.assertEqual(len(self.free(self.monday)), 4)
+        self.assertEqual(len(self.free(self.monday + timedelta(days=1))), 3)
+        appointment.delete()
+        self.assertEqual(len(self.free(self.monday + timedelta(days=1))), 4)
+
+    def test_multi_week_range_is_answered_from_bitmaps(self):
+        for week in range(4):
+            Appointment.objects.create(patient=self.patient, doctor=self.doctor,
+                                       date=self.monday + timedelta(weeks=week), time=time(10, 0))
+        end = self.monday + timedelta(days=27)
+        with self.assertNumQueries(2):  # doctor + bitmap rows for the range
+            days = self.client_for(None).get(f'{self.url}?from={self.monday}&to={end}').data['days']
+        self.assertEqual(len(days), 28)
+        self.assertEqual(days[0]['slots'], ['09:00', '09:30', '10:30'])
+        self.assertEqual(days[5]['slots'], [])  # Saturday
+
+    def test_deleting_doctor_cascades(self):
+        Appointment.objects.create(patient=self.patient, doctor=self.doctor, date=self.monday, time=time(9, 0))
+        self.doctor.delete()
+        self.assertFalse(Appointment.objects.exists())
+
+    def test_slot_length_change_rebuilds_upcoming_days(self):
+        Appointment.objects.create(patient=self.patient, doctor=self.doctor, date=self.monday, time=time(9, 0))
+        response = self.client_for(self.doctor).patch('/api/users/profile/', {'slot_minutes': 60})
+        self.assertEqual(response.status_code, 200)
+        # 09:00 now runs to 10:00, so 09:30 overlaps it
+        self.assertEqual(self.free(self.monday), ['10:00'])
+        rebook = self.client_for(self.patient).post('/api/appointments/', {
+            'doctor': self.doctor.id, 'date': self.monday.isoformat(), 'time': '09:30'})
+        self.assertEqual(rebook.status_code, 400)
+
+    def test_unrelated_profile_edit_skips_the_rebuild(self):
+        Appointment.objects.create(patient=self.patient, doctor=self.doctor, date=self.monday, time=time(9, 0))
+        with patch('api.signals.rebuild_doctor') as rebuild:
+            self.client_for(self.doctor).patch('/api/users/profile/', {'bio': 'Diagnostician'})
+            self.doctor.refresh_from_db()
+            self.doctor.slot_minutes = 45
+            self.doctor.save(update_fields=['slot_minutes'])
+        rebuild.assert_called_once()
+
+    def test_invalid_working_hours(self):
+        client = self.client_for(self.doctor)
+        self.assertEqual(client.patch('/api/users/profile/', {'slot_minutes': 20}).status_code, 400)
+        self.assertEqual(client.patch('/api/users/profile/', {'work_end': '08:00'}).status_code, 400)
+
+
+class BookingTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        self.doctor = self.make_user('drhouse', role='doctor', is_verified=True)
+        self.alice = self.client_for(self.make_user('alice'))
+        self.payload = {'doctor': self.doctor.id, 'date': '2030-03-04', 'time': '09:00'}
+
+    def test_overlapping_slot_is_rejected(self):
+        self.assertEqual(self.alice.post('/api/appointments/', self.payload).status_code, 201)
+        overlapping = dict(self.payload, time='09:15')
+        self.assertEqual(self.alice.post('/api/appointments/', overlapping).status_code, 400)
+        self.assertEqual(self.alice.post('/api/appointments/', dict(self.payload, time='09:30')).status_code, 201)
+
+    def test_reschedule_within_own_slot(self):
+        booked = self.alice.post('/api/appointments/', self.payload).data
+        response = self.alice.patch(f"/api/appointments/{booked['id']}/", {'time': '09:15'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_idempotent_retry_is_replayed(self):
+        first = self.alice.post('/api/appointments/', self.payload, HTTP_IDEMPOTENCY_KEY='abc')
+        retry = self.alice.post('/api/appointments/', self.payload, HTTP_IDEMPOTENCY_KEY='abc')
+        self.assertEqual((first.status_code, retry.status_code), (201, 201))
+        self.assertEqual(first.data['id'], retry.data['id'])
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Appointment.objects.count(), 1)
+
+    def test_idempotency_key_reused_with_other_body(self):
+        self.alice.post('/api/appointments/', self.payload, HTTP_IDEMPOTENCY_KEY='abc')
+        other = self.alice.post('/api/appointments/', dict(self.payload, time='11:00'), HTTP_IDEMPOTENCY_KEY='abc')
+        self.assertEqual(other.status_code, 422)
+
+    def test_failed_request_releases_key(self):
+        self.client_for(self.make_user('bob')).post('/api/appointments/', self.payload)
+        failed = self.alice.post('/api/appointments/', self.payload, HTTP_IDEMPOTENCY_KEY='abc')
+        self.assertEqual(failed.status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class ConcurrentBookingTests(UserFactoryMixin, TransactionTestCase):
+    """Needs real row locks and concurrent connections (MySQL), not SQLite."""
+
+    def test_exactly_one_winner_per_slot(self):
+        doctor = self.make_user('drhouse', role='doctor', is_verified=True)
+        patients = [self.make_user(f'patient{i}') for i in range(20)]
+        payload = {'doctor': doctor.id, 'date': '2030-03-04', 'time': '09:00'}
+        statuses = []
+
+        def book(patient):
+            try:
+                statuses.append(self.client_for(patient).post('/api/appointments/', payload).status_code)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=book, args=(patient,)) for patient in patients]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(statuses), [201] + [400] * 19)
+        self.assertEqual(Appointment.objects.count(), 1)
+
+
+class BulkOperationTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        self.doctor = self.make_user('drhouse', role='doctor', is_verified=True)
+        self.patient = self.make_user('patient')
+        self.day = date(2030, 3, 4)
+        self.appointments = [
+            Appointment.objects.create(patient=self.patient, doctor=self.doctor, date=self.day, time=time(9 + i, 0))
+            for i in range(4)
+        ]
+        self.ids = [appointment.id for appointment in self.appointments]
+
+    def test_bulk_create_reports_per_item_results(self):
+        response = self.client_for(self.patient).post('/api/appointments/bulk-create/', {'appointments': [
+            {'doctor': self.doctor.id, 'date': '2030-03-05', 'time': '09:00'},
+            {'doctor': self.doctor.id, 'date': '2030-03-05', 'time': '09:00'},  # same slot again
+            {'doctor': self.doctor.id, 'date': '2030-03-05'},
+            {'doctor': self.doctor.id, 'date': '2030-03-05', 'time': '10:00'},
+        ]}, format='json')
+        results = response.data['results']
+        self.assertEqual([item['ok'] for item in results], [True, False, False, True])
+        self.assertIn('time', results[1]['errors'])
+        self.assertEqual(Appointment.objects.filter(date=date(2030, 3, 5)).count(), 2)
+
+    def test_bulk_status_is_a_single_update(self):
+        Appointment.objects.filter(pk=self.ids[0]).update(status='cancelled', holds_slot=None)
+        client = self.client_for(self.doctor)
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.post('/api/appointments/bulk-status/',
+                                   {'ids': self.ids + [999999], 'status': 'confirmed'}, format='json')
+        updates = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE "api_appointment"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual([item['ok'] for item in response.data['results']], [False, True, True, True, False])
+        self.assertEqual(response.data['results'][-1]['error'], 'Not found.')
+        self.assertEqual(Appointment.objects.filter(status='confirmed').count(), 3)
+
+    def test_bulk_cancel_frees_slots(self):
+        self.client_for(self.doctor).post('/api/appointments/bulk-status/',
+                                          {'ids': self.ids[:2], 'status': 'cancelled'}, format='json')
+        self.assertEqual(Appointment.objects.filter(holds_slot=True).count(), 2)
+        rebook = self.client_for(self.patient).post('/api/appointments/', {
+            'doctor': self.doctor.id, 'date': self.day.isoformat(), 'time': '09:00'})
+        self.assertEqual(rebook.status_code, 201)
+
+    def test_bulk_delete_is_scoped(self):
+        other = self.make_user('drwho', role='doctor')
+        foreign = Appointment.objects.create(patient=self.patient, doctor=other, date=self.day, time=time(9, 0))
+        response = self.client_for(self.doctor).post('/api/appointments/bulk-delete/',
+                                                     {'ids': self.ids + [foreign.id]}, format='json')
+        self.assertEqual([item['ok'] for item in response.data['results']], [True] * 4 + [False])
+        self.assertEqual(list(Appointment.objects.values_list('id', flat=True)), [foreign.id])
+
+    def test_invalid_status(self):
+        response = self.client_for(self.doctor).post('/api/appointments/bulk-status/',
+                                                     {'ids': self.ids, 'status': 'pending'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class SparseFieldsetTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        self.doctor = self.make_user('drhouse', role='doctor', is_verified=True, bio='Long bio', address='Clinic')
+        self.patient = self.make_user('patient')
+        PatientProfile.objects.create(user=self.patient, blood_group='O+')
+        Appointment.objects.create(patient=self.patient, doctor=self.doctor, date=date(2030, 3, 4), time=time(9, 0))
+        self.client = self.client_for(self.patient)
+
+    def test_default_output_is_unchanged(self):
+        row = self.client.get('/api/appointments/').data[0]
+        self.assertEqual(row['patient_details']['profile']['blood_group'], 'O+')
+
+    def test_fields(self):
+        row = self.assertWithinBudget('appointment-list', self.client.get, '/api/appointments/?fields=id,date,status').data[0]
+        self.assertEqual(set(row), {'id', 'date', 'status'})
+
+    def test_summary_and_expand(self):
+        row = self.client.get('/api/appointments/?view=summary').data[0]
+        self.assertEqual(set(row['doctor_details']), {'id', 'first_name', 'last_name', 'email', 'specialization'})
+        row = self.client.get('/api/appointments/?view=summary&expand=patient_details').data[0]
+        self.assertEqual(row['patient_details']['profile']['blood_group'], 'O+')
+        self.assertNotIn('profile', row['doctor_details'])
+
+    def test_fields_do_not_narrow_writes(self):
+        appointment = Appointment.objects.get()
+        response = self.client.patch(f'/api/appointments/{appointment.id}/?fields=id', {'notes': 'Fasting'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Appointment.objects.get().notes, 'Fasting')
+
+    def test_user_summary(self):
+        doctors = self.client_for(None).get('/api/users/doctors/?view=summary').data
+        self.assertNotIn('bio', doctors[0])
+        full = self.client_for(None).get('/api/users/doctors/').data
+        self.assertEqual(full[0]['bio'], 'Long bio')
+        names = self.client_for(None).get('/api/users/doctors/?fields=id,last_name').data
+        self.assertEqual(set(names[0]), {'id', 'last_name'})
+
+
+class RenderingTests(QueryBudgetTestCase):
+
+    def test_fast_renderer_matches_stdlib(self):
+        data = {
+            'fee': Decimal('500.00'), 'date': date(2030, 3, 4), 'time': time(9, 30),
+            'at': datetime(2030, 3, 4, 9, 30, tzinfo=dt_timezone.utc), 'name': 'Dr. Zoë',
+        }
+        self.assertEqual(json.loads(FastJSONRenderer().render(data)), json.loads(JSONRenderer().render(data)))
+
+    def test_large_responses_are_compressed(self):
+        doctor = self.make_user('drhouse', role='doctor', is_verified=True, bio='Cardiology. ' * 100)
+        for i in range(3):
+            self.make_user(f'doctor{i}', role='doctor', is_verified=True, bio=doctor.bio)
+        client = self.client_for(None)
+
+        plain = client.get('/api/users/doctors/')
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        response = client.get('/api/users/doctors/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(json.loads(gzip.decompress(response.content)), json.loads(plain.content))
+
+    @override_settings(COMPRESSION_MIN_SIZE=10 ** 6)
+    def test_small_responses_are_not_compressed(self):
+        self.make_user('drhouse', role='doctor', is_verified=True)
+        response = self.client_for(None).get('/api/users/doctors/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+
+    @override_settings(COMPRESSION_MIN_SIZE=0)
+    def test_token_responses_are_not_compressed(self):
+        self.make_user('patient')
+        response = APIClient().post('/api/auth/login/', {'username': 'patient', 'password': 'Secret@123'},
+                                    HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('no-store', response['Cache-Control'])
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertIn('access', response.json())
+
+
+class ConditionalGetTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        self.doctor = self.make_user('drhouse', role='doctor', is_verified=True)
+        self.patient = self.make_user('patient')
+        self.appointment = Appointment.objects.create(
+            patient=self.patient, doctor=self.doctor, date=date(2030, 3, 4), time=time(9, 0)
+        )
+        self.client = self.client_for(self.doctor)
+
+    def revalidate(self, client, url, etag):
+        return client.get(url, HTTP_IF_NONE_MATCH=etag).status_code
+
+    def test_appointment_list(self):
+        etag = self.client.get('/api/appointments/')['ETag']
+        with self.assertNumQueries(1):  # COUNT/MAX aggregate
+            self.assertEqual(self.revalidate(self.client, '/api/appointments/', etag), 304)
+        self.assertNotEqual(self.client.get('/api/appointments/?view=summary')['ETag'], etag)
+
+        self.client.patch(f'/api/appointments/{self.appointment.id}/', {'status': 'confirmed'})
+        self.assertEqual(self.revalidate(self.client, '/api/appointments/', etag), 200)
+
+    def test_appointment_list_tracks_embedded_rows_and_deletes(self):
+        etag = self.client.get('/api/appointments/')['ETag']
+        PatientProfile.objects.create(user=self.patient, blood_group='O+')
+        etag, previous = self.client.get('/api/appointments/')['ETag'], etag
+        self.assertNotEqual(etag, previous)
+
+        self.client.post('/api/appointments/bulk-status/', {'ids': [self.appointment.id], 'status': 'cancelled'},
+                         format='json')
+        etag, previous = self.client.get('/api/appointments/')['ETag'], etag
+        self.assertNotEqual(etag, previous)
+
+        self.appointment.delete()
+        self.assertEqual(self.revalidate(self.client, '/api/appointments/', etag), 200)
+
+    def test_etag_is_per_user(self):
+        etag = self.client.get('/api/appointments/')['ETag']
+        self.assertEqual(self.revalidate(self.client_for(self.patient), '/api/appointments/', etag), 200)
+
+    def test_profile_details(self):
+        client = self.client_for(self.patient)
+        etag = client.get('/api/my-medical-profile/')['ETag']
+        self.assertEqual(self.revalidate(client, '/api/my-medical-profile/', etag), 304)
+        client.patch('/api/my-medical-profile/', {'blood_group': 'A+'})
+        self.assertEqual(self.revalidate(client, '/api/my-medical-profile/', etag), 200)
+
+
+@override_settings(CHANGE_FEED_SETTLE=timedelta(0))
+class ChangeFeedTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        self.doctor = self.make_user('drhouse', role='doctor', is_verified=True)
+        self.other_doctor = self.make_user('drwilson', role='doctor', is_verified=True)
+        self.patient = self.make_user('patient')
+        self.client = self.client_for(self.doctor)
+        self.cursor = self.client.get('/api/appointments/changes/').data['cursor']
+
+    def book(self, doctor, hour=9):
+        return Appointment.objects.create(patient=self.patient, doctor=doctor, date=date(2030, 3, 4), time=time(hour, 0))
+
+    def changes(self, client=None, **params):
+        params.setdefault('since', self.cursor)
+        response = (client or self.client).get('/api/appointments/changes/', params)
+        self.assertEqual(response.status_code, 200)
+        self.cursor = response.data['cursor']
+        return [(change['id'], change['action']) for change in response.data['changes']]
+
+    def test_created_updated_deleted(self):
+        appointment = self.book(self.doctor)
+        self.book(self.other_doctor)  # not in this doctor's scope
+        self.assertEqual(self.changes(), [(appointment.id, 'upsert')])
+        self.assertEqual(self.changes(), [])
+
+        self.client.patch(f'/api/appointments/{appointment.id}/', {'status': 'confirmed'})
+        response = self.client.get('/api/appointments/changes/', {'since': self.cursor})
+        self.assertEqual(response.data['changes'][0]['appointment']['status'], 'confirmed')
+        self.cursor = response.data['cursor']
+
+        pk = appointment.id
+        appointment.delete()
+        self.assertEqual(self.changes(), [(pk, 'delete')])
+
+    def test_coalesces_to_latest_action(self):
+        appointment = self.book(self.doctor)
+        appointment.notes = 'Fasting'
+        appointment.save()
+        deleted = self.book(self.doctor, hour=10).id
+        Appointment.objects.filter(pk=deleted).delete()
+        self.assertEqual(self.changes(), [(appointment.id, 'upsert'), (deleted, 'delete')])
+
+    def test_bulk_status_and_reassignment(self):
+        appointment = self.book(self.doctor)
+        self.changes()
+        self.client.post('/api/appointments/bulk-status/', {'ids': [appointment.id], 'status': 'cancelled'},
+                         format='json')
+        self.assertEqual(self.changes(), [(appointment.id, 'upsert')])
+
+        appointment = Appointment.objects.get(pk=appointment.pk)
+        appointment.doctor = self.other_doctor
+        appointment.save()
+        self.assertEqual(self.changes(), [(appointment.id, 'delete')])
+        other = self.changes(self.client_for(self.other_doctor), since=0)
+        self.assertEqual(other, [(appointment.id, 'upsert')])
+
+    def test_pages_and_cursor_errors(self):
+        for hour in range(9, 12):
+            self.book(self.doctor, hour)
+        with patch.object(AppointmentViewSet, 'change_feed_limit', 2):
+            response = self.client.get('/api/appointments/changes/', {'since': self.cursor})
+            self.assertEqual((len(response.data['changes']), response.data['has_more']), (2, True))
+            response = self.client.get('/api/appointments/changes/', {'since': response.data['cursor']})
+            self.assertEqual((len(response.data['changes']), response.data['has_more']), (1, False))
+
+        self.assertEqual(self.client.get('/api/appointments/changes/', {'since': 'abc'}).status_code, 400)
+        newest = AppointmentChange.objects.latest('id').id
+        AppointmentChange.objects.filter(id__lt=newest).delete()
+        self.assertEqual(self.client.get('/api/appointments/changes/', {'since': newest - 2}).status_code, 410)
+        response = self.client.get('/api/appointments/changes/', {'since': newest - 1})
+        self.assertEqual((response.status_code, len(response.data['changes'])), (200, 1))
+
+    @override_settings(CHANGE_FEED_SETTLE=timedelta(minutes=5))
+    def test_recent_entries_are_held_back(self):
+        self.book(self.doctor)
+        self.assertEqual(self.changes(), [])
+
+
+class EventStreamTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        self.doctor = self.make_user('drhouse', role='doctor', is_verified=True)
+        self.patient = self.make_user('patient')
+
+    def scope(self, user, token=None):
+        token = token or (RefreshToken.for_user(user).access_token if user else 'garbage')
+        return {'type': 'http', 'method': 'GET', 'path': '/api/events/', 'query_string': f'token={token}'.encode(),
+                'headers': [(b'origin', b'http://localhost:5500')]}
+
+    async def open_stream(self, user, token=None):
+        """Start a stream; returns (task, sent messages queue, disconnect event)."""
+        sent, disconnect = asyncio.Queue(), asyncio.Event()
+
+        async def receive():
+            await disconnect.wait()
+            return {'type': 'http.disconnect'}
+        task = asyncio.ensure_future(EventStream()(self.scope(user, token), receive, sent.put))
+        return task, sent, disconnect
+
+    def book_and_confirm(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            appointment = Appointment.objects.create(patient=self.patient, doctor=self.doctor,
+                                                     date=date(2030, 3, 4), time=time(9, 0))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client_for(self.doctor).patch(f'/api/appointments/{appointment.id}/', {'status': 'confirmed'})
+
+    def test_streams_events_to_doctor(self):
+        async def scenario():
+            task, sent, disconnect = await self.open_stream(self.doctor)
+            start = await sent.get()
+            self.assertEqual(start['status'], 200)
+            self.assertIn((b'access-control-allow-origin', b'http://localhost:5500'), start['headers'])
+            self.assertTrue((await sent.get())['body'].startswith(b'retry:'))
+
+            await sync_to_async(self.book_and_confirm)()
+            created = (await asyncio.wait_for(sent.get(), 1))['body'].decode()
+            changed = (await asyncio.wait_for(sent.get(), 1))['body'].decode()
+            self.assertTrue(created.startswith('event: appointment.created\n'))
+            event = json.loads(changed.split('data: ', 1)[1])
+            self.assertEqual((event['appointment']['status'], event['previous_status']), ('confirmed', 'pending'))
+
+            disconnect.set()
+            await asyncio.wait_for(task, 1)
+            self.assertNotIn(user_channel(self.doctor.pk), get_broker().subscribers)
+        async_to_sync(scenario)()
+
+    def test_rejects_invalid_token(self):
+        async def scenario():
+            task, sent, _ = await self.open_stream(None)
+            await asyncio.wait_for(task, 1)
+            self.assertEqual((await sent.get())['status'], 401)
+        async_to_sync(scenario)()
+
+    @patch.object(EventStream, 'keepalive', 0.05)
+    def test_revoked_token_is_refused_and_closes_the_stream(self):
+        token = CustomTokenObtainPairSerializer.get_token(self.doctor).access_token  # with the 'ver' claim
+
+        def revoke():
+            self.doctor.role = 'patient'  # bumps token_version
+            self.doctor.save()
+
+        async def scenario():
+            task, sent, _ = await self.open_stream(self.doctor, token)
+            self.assertEqual((await sent.get())['status'], 200)
+            await sent.get()  # retry:
+            self.assertEqual((await asyncio.wait_for(sent.get(), 1))['body'], b': keepalive\n\n')
+
+            await sync_to_async(revoke)()
+            await asyncio.wait_for(task, 1)  # closed at the next keepalive
+            self.assertNotIn(user_channel(self.doctor.pk), get_broker().subscribers)
+
+            task, sent, _ = await self.open_stream(self.doctor, token)
+            await asyncio.wait_for(task, 1)
+            self.assertEqual((await sent.get())['status'], 401)
+        async_to_sync(scenario)()
+
+
+    @patch.object(EventStream, 'keepalive', 0.05)
+    def test_stream_closes_once_the_token_expires(self):
+        async def scenario():
+            task, sent, _ = await self.open_stream(self.doctor)
+            self.assertEqual((await sent.get())['status'], 200)
+            await sent.get()  # retry:
+            self.assertEqual((await asyncio.wait_for(sent.get(), 1))['body'], b': keepalive\n\n')
+
+            later = timezone.now() + settings.SIMPLE_JWT['ACCESS_TOKEN_LIFETIME']
+            with patch('api.push.aware_utcnow', return_value=later):
+                await asyncio.wait_for(task, 1)  # closed at the next keepalive
+            self.assertNotIn(user_channel(self.doctor.pk), get_broker().subscribers)
+        async_to_sync(scenario)()
+
+
+class EventBrokerTests(SimpleTestCase):
+
+    async def test_in_memory_drops_events_for_full_queues(self):
+        broker = InMemoryBackend()
+        queue = broker.subscribe('user:1')
+        for i in range(broker.queue_size + 5):
+            broker.publish('user:1', {'n': i})
+        await asyncio.sleep(0)
+        self.assertEqual(queue.qsize(), broker.queue_size)
+        broker.unsubscribe('user:1', queue)
+        self.assertEqual(broker.subscribers, {})
+
+    async def test_unix_socket_backend_fans_out_across_processes(self):
+        with tempfile.TemporaryDirectory() as path:
+            worker, publisher = UnixSocketBackend(path=path), UnixSocketBackend(path=path)
+            queue = worker.subscribe('user:1')
+            await asyncio.get_running_loop().run_in_executor(None, publisher.publish, 'user:1', {'type': 'ping'})
+            self.assertEqual(await asyncio.wait_for(queue.get(), 1), {'type': 'ping'})
+            asyncio.get_running_loop().remove_reader(worker.sock.fileno())
+            worker.sock.close()
+
+
+class ReadYourWritesTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.patient = self.make_user('patient')
+        self.client = self.client_for(self.patient)
+
+    def test_write_pins_user_to_primary(self):
+        self.client.get('/api/users/profile/')
+        self.assertFalse(is_pinned(self.patient))
+        self.client.patch('/api/users/profile/', {'phone': '555-0100'})
+        self.assertTrue(is_pinned(self.patient))
+
+
+class MetricsTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        for histogram in HISTOGRAMS:
+            histogram.reset()
+        self.doctor = self.make_user('drhouse', role='doctor', is_verified=True)
+        self.patient = self.make_user('patient')
+        Appointment.objects.create(patient=self.patient, doctor=self.doctor, date=date(2030, 3, 4), time=time(9, 0))
+        self.client = self.client_for(self.patient)
+
+    def server_timing(self, response):
+        return dict(part.strip().split(';', 1) for part in response['Server-Timing'].split(','))
+
+    def test_server_timing_counts_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/appointments/')
+        timing = self.server_timing(response)
+        self.assertEqual(set(timing), {'app', 'db', 'serialize'})
+        self.assertIn(f'desc="{len(queries)} queries"', timing['db'])
+
+    def test_metrics_by_view(self):
+        self.client.get('/api/appointments/')
+        self.client.get('/api/my-medical-profile/')
+        self.client.get('/api/users/doctors/')
+        APIClient().post('/api/auth/login/', {'username': 'patient', 'password': 'Secret@123'})
+
+        body = self.client.get('/metrics').content.decode()
+        for view in ('api.AppointmentViewSet.list', 'api.UserViewSet.profile_details',
+                     'accounts.UserViewSet.doctors', 'accounts.CustomTokenObtainPairView.post'):
+            self.assertIn(f'medicare_db_queries_per_request_count{{view="{view}"}} 1', body)
+        self.assertIn('medicare_request_duration_seconds_bucket{view="api.AppointmentViewSet.list",'
+                      'method="GET",status="200",le="+Inf"} 1', body)
+        self.assertIn('# TYPE medicare_serializer_duration_seconds histogram', body)
+
+    @override_settings(SLOW_REQUEST_SECONDS=0)
+    def test_slow_requests_log_their_sql(self):
+        with self.assertLogs('api.metrics', 'WARNING') as logs:
+            self.client.get('/api/appointments/')
+        self.assertIn('api.AppointmentViewSet.list', logs.output[0])
+        self.assertIn('FROM "api_appointment"', logs.output[0])
+
+    @override_settings(METRICS_TOKEN='scrape')
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)  # a user's JWT isn't the token
+        self.assertEqual(APIClient().get('/metrics', HTTP_AUTHORIZATION='Bearer scrape').status_code, 200)
+
+
+class SeedDataTests(TestCase):
+
+    def test_seeds_consistent_skewed_data(self):
+        call_command('seed_data', doctors=20, patients=200, appointments=3000, past_days=60, future_days=14,
+                     batch_size=500, stdout=io.StringIO())
+        appointments = Appointment.objects.filter(doctor__username__startswith='seed_')
+        self.assertGreater(appointments.count(), 2500)
+        self.assertFalse(appointments.filter(date__week_day__in=[1, 7]).exists())  # no weekends
+        # Only upcoming days still have pending/confirmed bookings without completions
+        today = date.today()
+        self.assertFalse(appointments.filter(date__gt=today, status='completed').exists())
+        self.assertGreater(appointments.filter(date__lt=today, status='completed').count(),
+                           appointments.filter(date__lt=today).count() // 2)
+        # Popular doctors get far more than an even share
+        busiest = appointments.values('doctor').annotate(n=Count('pk')).order_by('-n').first()['n']
+        self.assertGreater(busiest, 2 * appointments.count() / 20)
+        self.assertTrue(PatientProfile.objects.filter(user__username__startswith='seed_').exists())
+        self.assertTrue(self.client.login(username='seed_patient0', password='Seed@123'))
+
+
+class ExportTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        self.doctor = self.make_user('drhouse', role='doctor', is_verified=True)
+        self.other = self.make_user('drwho', role='doctor', is_verified=True)
+        self.patient = self.make_user('patient')
+        self.admin = self.make_user('admin', role='admin')
+        for day, hour, doctor in ((4, 10, self.doctor), (4, 9, self.other), (5, 9, self.doctor), (9, 9, self.other)):
+            Appointment.objects.create(patient=self.patient, doctor=doctor, date=date(2030, 3, day), time=time(hour, 0))
+
+    def export(self, user, **params):
+        response = self.client_for(user).get('/api/appointments/export/', params)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_csv_in_date_order_one_query_per_day(self):
+        with CaptureQueriesContext(connection) as queries:
+            response, body = self.export(self.admin)
+        self.assertEqual(len(queries), 1 + 3)  # the days, then each day's rows
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('attachment;', response['Content-Disposition'])
+        lines = body.splitlines()
+        self.assertEqual(lines[0].split(',')[:4], ['id', 'date', 'time', 'status'])
+        self.assertEqual([line.split(',')[1:3] for line in lines[1:]], [
+            ['2030-03-04', '09:00:00'], ['2030-03-04', '10:00:00'], ['2030-03-05', '09:00:00'], ['2030-03-09', '09:00:00'],
+        ])
+        self.assertIn('Drhouse Test', lines[2])
+        self.assertIn('Patient Test', lines[2])
+
+    def test_ndjson_with_filters(self):
+        _, body = self.export(self.admin, type='ndjson', doctor=self.doctor.pk, **{'from': '2030-03-05', 'to': '2030-03-31'})
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([(row['date'], row['doctor_id']) for row in rows], [('2030-03-05', self.doctor.pk)])
+        self.assertEqual(rows[0]['doctor_name'], 'Drhouse Test')
+
+    def test_scoped_to_visible_appointments(self):
+        _, body = self.export(self.other)
+        self.assertEqual(len(body.splitlines()), 1 + 2)
+
+    def test_csv_cells_are_not_formulas(self):
+        User.objects.filter(pk=self.doctor.pk).update(first_name='=HYPERLINK("http://evil")', specialization='@SUM(1)')
+        _, body = self.export(self.admin, doctor=self.doctor.pk)
+        row = next(csv.reader(io.StringIO(body.splitlines()[1])))
+        self.assertEqual(row[5:7], ['\'=HYPERLINK("http://evil") Test', "'@SUM(1)"])
+        _, body = self.export(self.admin, type='ndjson', doctor=self.doctor.pk)
+        self.assertEqual(json.loads(body.splitlines()[0])['specialization'], '@SUM(1)')  # only CSV is opened as a sheet
+
+    def test_rejects_bad_parameters(self):
+        client = self.client_for(self.admin)
+        self.assertEqual(client.get('/api/appointments/export/', {'type': 'xml'}).status_code, 400)
+        self.assertEqual(client.get('/api/appointments/export/', {'from': '2030-02-31'}).status_code, 400)
+        self.assertEqual(client.get('/api/appointments/export/', {'to': 'yesterday'}).status_code, 400)
+
+    def test_command_writes_the_same_rows(self):
+        _, body = self.export(self.admin)
+        with tempfile.NamedTemporaryFile('r', suffix='.csv', newline='') as output:
+            call_command('export_appointments', output=output.name, stderr=io.StringIO())
+            self.assertEqual(output.read(), body)
+
+
+HAS_REPLICA = 'replica' in settings.DATABASES
+
+
+# Tasks for JobTests; jobs name them by dotted path, so they live at module level
+job_calls = []
+
+
+@task
+def record_job_call(value=None):
+    job_calls.append(value)
+
+
+@task(max_attempts=2)
+def failing_job():
+    raise RuntimeError("boom")
+
+
+class JobTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        job_calls.clear()
+        self.doctor = self.make_user('drhouse', role='doctor', is_verified=True)
+        self.patient = self.make_user('patient')
+
+    def work(self, **kwargs):
+        return Worker(poll_interval=0, **kwargs).run(burst=True)
+
+    def test_booking_confirmation_sent_by_worker(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client_for(self.patient).post('/api/appointments/', {
+                'doctor': self.doctor.id, 'date': '2030-03-04', 'time': '10:00',
+            })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(mail.outbox, [])  # not in the request
+        job = Job.objects.get()
+        self.assertEqual((job.task, job.kwargs), ('api.tasks.send_booking_confirmation',
+                                                  {'appointment_id': response.data['id']}))
+
+        out = io.StringIO()
+        call_command('run_jobs', '--burst', '--threads', '1', stdout=out)
+        self.assertIn('stopped after 1 jobs', out.getvalue())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['patient@medicare.com'])
+        self.assertIn('Drhouse Test', mail.outbox[0].body)
+        self.assertEqual(Job.objects.get().status, Job.SUCCEEDED)
+
+    def test_rolled_back_enqueue_is_dropped(self):
+        with self.assertRaises(ZeroDivisionError), transaction.atomic():
+            record_job_call.enqueue(value=1)
+            1 / 0
+        self.assertFalse(Job.objects.exists())
+
+    def test_retries_with_backoff_then_fails(self):
+        job = failing_job.enqueue()
+        with self.assertLogs('api.jobs', 'WARNING'):
+            self.assertEqual(self.work(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertGreater(job.run_at, timezone.now() + settings.JOB_RETRY_BACKOFF * 0.7)
+        self.assertIn('RuntimeError: boom', job.last_error)
+        self.assertEqual(self.work(), 0)  # not due yet
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        with self.assertLogs('api.jobs', 'ERROR'):
+            self.work()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+
+    def test_delayed_and_keyed_jobs(self):
+        record_job_call.enqueue(value='later', delay=timedelta(minutes=5))
+        self.assertIsNotNone(record_job_call.enqueue(value='once', key='only-one'))
+        self.assertIsNone(record_job_call.enqueue(value='twice', key='only-one'))
+        self.assertEqual(self.work(), 1)
+        self.assertEqual(job_calls, ['once'])
+
+        Job.objects.filter(status=Job.QUEUED).update(run_at=timezone.now())
+        self.work()
+        self.assertEqual(job_calls, ['once', 'later'])
+
+    def test_unknown_task_fails(self):
+        enqueue('api.tests.job_calls', max_attempts=1)
+        with self.assertLogs('api.jobs', 'ERROR'):
+            self.work()
+        self.assertIn('is not a @task', Job.objects.get().last_error)
+
+    def test_lost_jobs_are_requeued(self):
+        job = record_job_call.enqueue()
+        Job.objects.filter(pk=job.pk).update(status=Job.RUNNING, attempts=1,
+                                             locked_at=timezone.now() - settings.JOB_LEASE * 2)
+        with self.assertLogs('api.jobs', 'WARNING'):
+            sweep()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.work()
+        self.assertEqual(job_calls, [None])
+
+    @override_settings(JOB_SCHEDULE={'api.tests.record_job_call': timedelta(minutes=5)})
+    def test_schedule_runs_once_per_period_across_workers(self):
+        for _ in range(3):
+            Worker().maintain()
+        self.assertEqual(Job.objects.filter(task='api.tests.record_job_call').count(), 1)
+
+    @override_settings(JOBS_RUN_EAGERLY=True)
+    def test_eager_mode_runs_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            record_job_call.enqueue(value='now')
+            self.assertEqual(job_calls, [])
+        self.assertEqual(job_calls, ['now'])
+        self.assertEqual(Job.objects.get().status, Job.SUCCEEDED)
+
+
+class ThreadedJobWorkerTests(TransactionTestCase):
+    """Worker threads use their own connections, so the jobs must be committed."""
+
+    def test_threads_run_every_job_once(self):
+        job_calls.clear()
+        for value in range(20):
+            record_job_call.enqueue(value=value)
+        self.assertEqual(Worker(threads=4, poll_interval=0).run(burst=True), 20)
+        self.assertEqual(sorted(job_calls), list(range(20)))
+        self.assertEqual(Job.objects.filter(status=Job.SUCCEEDED).count(), 20)
+
+
+class ReminderTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        MemoryNotifier.sent.clear()
+        self.doctor = self.make_user('drhouse', role='doctor', is_verified=True)
+        self.patient = self.make_user('patient')
+
+    def book(self, starts_in):
+        starts = timezone.localtime() + starts_in
+        return Appointment.objects.create(patient=self.patient, doctor=self.doctor, date=starts.date(),
+                                          time=starts.time().replace(microsecond=0))
+
+    def test_remind_at_follows_the_schedule(self):
+        appointment = Appointment.objects.create(patient=self.patient, doctor=self.doctor,
+                                                 date=date(2030, 3, 4), time=time(10, 0))
+        expected = timezone.make_aware(datetime(2030, 3, 4, 10, 0)) - settings.REMINDER_LEAD
+        self.assertEqual(appointment.remind_at, expected)
+
+        appointment = Appointment.objects.get(pk=appointment.pk)
+        appointment.time = time(11, 0)
+        appointment.save(update_fields=['time'])
+        self.assertEqual(Appointment.objects.get().remind_at, expected + timedelta(hours=1))
+
+        # Sent: editing the notes mustn't re-arm it
+        Appointment.objects.update(remind_at=None)
+        appointment = Appointment.objects.get()
+        appointment.notes = 'Bring the X-rays'
+        appointment.save()
+        self.assertIsNone(Appointment.objects.get().remind_at)
+
+        appointment.status = 'confirmed'
+        appointment.save()
+        self.assertEqual(Appointment.objects.get().remind_at, expected + timedelta(hours=1))
+        appointment.status = 'cancelled'
+        appointment.save(update_fields=['status'])
+        self.assertIsNone(Appointment.objects.get().remind_at)
+
+    def test_bulk_cancel_clears_reminders(self):
+        appointment = self.book(timedelta(days=3))
+        self.client_for(self.doctor).post('/api/appointments/bulk-status/',
+                                          {'ids': [appointment.pk], 'status': 'cancelled'}, format='json')
+        self.assertIsNone(Appointment.objects.get().remind_at)
+
+    def test_sends_each_due_reminder_once(self):
+        soon = self.book(timedelta(hours=2))
+        later = self.book(timedelta(days=3))
+        out = io.StringIO()
+        call_command('send_reminders', stdout=out)
+        self.assertIn('Sent 1 reminders', out.getvalue())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['patient@medicare.com'])
+        self.assertIn('Reminder', mail.outbox[0].subject)
+        soon.refresh_from_db()
+        later.refresh_from_db()
+        self.assertIsNone(soon.remind_at)
+        self.assertIsNotNone(later.remind_at)
+
+        call_command('send_reminders', stdout=io.StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+
+    @override_settings(REMINDER_NOTIFIER={'BACKEND': 'api.reminders.MemoryNotifier'})
+    def test_failed_batch_comes_due_after_the_lease(self):
+        appointment = self.book(timedelta(hours=2))
+        with patch.object(MemoryNotifier, 'send', side_effect=ConnectionError), \
+                self.assertLogs('api.reminders', 'ERROR'):
+            self.assertEqual(send_due(), 0)
+        appointment.refresh_from_db()
+        self.assertGreater(appointment.remind_at, timezone.now())
+        self.assertEqual(send_due(), 0)  # leased
+
+        lease_until, batch = claim(now=timezone.now() + settings.REMINDER_LEASE * 2)
+        self.assertEqual(dispatch(lease_until, batch, MemoryNotifier()), 1)
+        self.assertEqual(MemoryNotifier.sent, [appointment.pk])
+
+    def test_busy_database_is_retried(self):
+        appointment = self.book(timedelta(hours=2))
+        busy = OperationalError('database table is locked: api_appointment')
+        with patch('api.reminders.claim', side_effect=[busy, reminders.claim(), (None, [])]), \
+                patch.object(reminders, 'RETRY_DELAY', 0):
+            self.assertEqual(send_due(notifier=MemoryNotifier()), 1)
+        self.assertEqual(MemoryNotifier.sent, [appointment.pk])
+        self.assertIsNone(Appointment.objects.get().remind_at)
+
+    def test_reschedule_during_send_keeps_the_new_reminder(self):
+        appointment = self.book(timedelta(hours=2))
+        lease_until, batch = claim()
+        self.assertEqual([claimed.pk for claimed in batch], [appointment.pk])
+
+        appointment = Appointment.objects.get()
+        appointment.date += timedelta(days=7)
+        appointment.save()
+        dispatch(lease_until, batch, MemoryNotifier())
+        self.assertEqual(Appointment.objects.get().remind_at, appointment.remind_at)
+        self.assertGreater(appointment.remind_at, timezone.now())
+
+    def test_rebuild_leaves_due_reminders_unless_asked(self):
+        due, later = self.book(timedelta(hours=2)), self.book(timedelta(days=3))
+        expected = dict(Appointment.objects.values_list('pk', 'remind_at'))
+        Appointment.objects.update(remind_at=None)  # as after bulk_create
+
+        call_command('rebuild_reminders', stdout=io.StringIO())
+        self.assertEqual(dict(Appointment.objects.values_list('pk', 'remind_at')),
+                         {due.pk: None, later.pk: expected[later.pk]})
+        call_command('rebuild_reminders', '--include-due', stdout=io.StringIO())
+        self.assertEqual(dict(Appointment.objects.values_list('pk', 'remind_at')), expected)
+
+
+class ThreadedReminderTests(UserFactoryMixin, TransactionTestCase):
+
+    def test_concurrent_senders_send_each_reminder_once(self):
+        MemoryNotifier.sent.clear()
+        doctor, patient = self.make_user('drhouse', role='doctor'), self.make_user('patient')
+        starts = timezone.localtime() + timedelta(hours=1)
+        for minutes in range(0, 600, 15):
+            slot = starts + timedelta(minutes=minutes)
+            Appointment.objects.create(patient=patient, doctor=doctor, date=slot.date(),
+                                       time=slot.time().replace(microsecond=0))
+
+        def work():
+            try:
+                send_due(batch_size=5, notifier=MemoryNotifier())
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(MemoryNotifier.sent), sorted(Appointment.objects.values_list('pk', flat=True)))
+        self.assertFalse(Appointment.objects.exclude(remind_at=None).exists())
+
+
+@skipUnless(HAS_REPLICA, "run with DJANGO_SETTINGS_MODULE=config.settings.replica_test")
+@override_settings(DATABASE_REPLICAS=['replica'], CHANGE_FEED_SETTLE=timedelta(0))
+class ReplicaRoutingTests(QueryBudgetTestCase):
+    """Primary and replica are separate databases here: rows exist only where a test puts them."""
+    databases = {'default', 'replica'} if HAS_REPLICA else {'default'}
+    replica = 'replica'
+
+    def setUp(self):
+        cache.clear()
+        unavailable.clear()
+        self.doctor = self.make_user('drhouse', role='doctor', is_verified=True)
+        self.patient = self.make_user('patient', phone='primary')
+        self.replicate(self.doctor, self.patient)
+        self.on_primary = Appointment.objects.create(patient=self.patient, doctor=self.doctor,
+                                                     date=date(2030, 3, 4), time=time(9, 0))
+        self.on_replica = Appointment(id=self.on_primary.id + 1, patient=self.patient, doctor=self.doctor,
+                                      date=date(2030, 3, 5), time=time(9, 0))
+        self.replicate(self.on_replica)
+        self.client = self.client_for(self.patient)
+
+    def replicate(self, *instances):
+        for instance in instances:
+            type(instance).objects.using(self.replica).bulk_create([copy.copy(instance)])
+
+    def listed(self):
+        return [row['id'] for row in self.client.get('/api/appointments/').data]
+
+    def test_opted_in_reads_use_the_replica(self):
+        self.assertEqual(self.listed(), [self.on_replica.id])
+        self.assertEqual(self.client.get(f'/api/appointments/{self.on_replica.id}/').status_code, 200)
+        # The change feed isn't opted in
+        feed = self.client.get('/api/appointments/changes/', {'since': 0}).data['changes']
+        self.assertEqual([change['id'] for change in feed], [self.on_primary.id])
+
+    def test_reads_after_a_write_use_the_primary(self):
+        User.objects.using(self.replica).filter(pk=self.patient.pk).update(phone='replica')
+        self.assertEqual(self.client.get('/api/users/profile/').data['phone'], 'replica')
+
+        self.client.patch('/api/users/profile/', {'phone': 'updated'})
+        self.assertEqual(self.client.get('/api/users/profile/').data['phone'], 'updated')
+        self.assertEqual(self.listed(), [self.on_primary.id])
+
+        cache.delete(pin_key(self.patient.pk))  # the pin expires
+        self.assertEqual(self.listed(), [self.on_replica.id])
+
+    def test_unreachable_replica_falls_back_to_primary(self):
+        with patch.object(connections[self.replica], 'ensure_connection', side_effect=OperationalError('down')):
+            with self.assertLogs('api.routers', 'WARNING'):
+                self.assertEqual(self.listed(), [self.on_primary.id])
+        self.assertIn(self.replica, unavailable)
+        self.assertEqual(self.listed(), [self.on_primary.id])  # skipped until REPLICA_RETRY_SECONDS pass
@@ -1,14 +1,17 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import AppointmentViewSet, UserViewSet
+from .views import AppointmentViewSet, AvailabilityViewSet, StatsViewSet, UserViewSet
 
 router = DefaultRouter()
 # REMOVED: router.register(r'users', ...) <--- THIS WAS THE PROBLEM
 router.register(r'appointments', AppointmentViewSet, basename='appointment')
+router.register(r'stats', StatsViewSet, basename='stats')
 
 urlpatterns = [
     # Keep this for the profile page
     path('my-medical-profile/', UserViewSet.as_view({'get': 'profile_details', 'patch': 'profile_details'}), name='my-medical-profile'),
     
+    path('doctors/<int:pk>/availability/', AvailabilityViewSet.as_view({'get': 'retrieve'}), name='doctor-availability'),
+
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,17 +1,52 @@
+import random
+import time
+from datetime import timedelta
+
 from rest_framework import viewsets, status, permissions
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import ValidationError
 from django.contrib.auth import get_user_model
-from .models import Appointment, PatientProfile
+from django.db import IntegrityError, OperationalError, router, transaction
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from .models import Appointment, AppointmentChange, PatientProfile
+from .pagination import AppointmentKeysetPagination
+from .stats import default_range, get_stats, invalidate_stats
+from .availability import SlotUnavailable, batched_rebuilds, claim_slot, free_slots, lock_day, rebuild_day
+from .idempotency import IdempotentCreateMixin
+from .routers import ReplicaReadsMixin
+from .conditional import Validators, conditional_response, representation_key
+from .changes import read_changes, latest_cursor, record_updates
+from .events import STATUS_CHANGED, appointment_payload, publish_on_commit
+from .export import CONTENT_TYPES, encode, filter_appointments, rows
 from .serializers import (
     UserSerializer, 
     AppointmentSerializer, 
-    PatientProfileSerializer
+    AppointmentSummarySerializer,
+    PatientProfileSerializer,
+    BulkIdsSerializer,
+    BulkStatusSerializer,
+    query_list,
 )
 
 User = get_user_model()
 
+SLOT_TAKEN = 'This time slot is already booked.'
+
+
+def optional_date(value):
+    """A YYYY-MM-DD query parameter, or None if absent; ValueError if malformed or impossible."""
+    if not value:
+        return None
+    parsed = parse_date(value)  # None for malformed input, ValueError for e.g. 2030-02-31
+    if parsed is None:
+        raise ValueError(value)
+    return parsed
+
 class UserViewSet(viewsets.ViewSet):
     """
     Handles ONLY the specific Medical Profile actions.
@@ -25,8 +60,8 @@ class UserViewSet(viewsets.ViewSet):
         profile, created = PatientProfile.objects.get_or_create(user=user)
 
         if request.method == 'GET':
-            serializer = PatientProfileSerializer(profile)
-            return Response(serializer.data)
+            validators = Validators.for_instance(profile, key=representation_key(request))
+            return conditional_response(request, validators, lambda: Response(PatientProfileSerializer(profile).data))
         
         elif request.method == 'PATCH':
             serializer = PatientProfileSerializer(profile, data=request.data, partial=True)
@@ -35,17 +70,292 @@ class UserViewSet(viewsets.ViewSet):
                 return Response(serializer.data)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class AppointmentViewSet(viewsets.ModelViewSet):
+class StatsViewSet(viewsets.ViewSet):
+    """
+    Dashboard numbers computed in the database instead of in the browser.
+    Doctors and patients see their own appointments; admins see everything
+    plus user counts. ?from=YYYY-MM-DD&to=YYYY-MM-DD sets the per-day window.
+    """
+    permission_classes = [IsAuthenticated]
+    max_range_days = 366
+
+    def list(self, request):
+        start, end = default_range()
+        try:
+            start = parse_date(request.query_params.get('from', '')) or start
+            end = parse_date(request.query_params.get('to', '')) or end
+        except ValueError:
+            raise ValidationError({'detail': 'Dates must be valid YYYY-MM-DD values.'})
+        if start > end or (end - start).days > self.max_range_days:
+            raise ValidationError({'detail': f'Range must be ascending and at most {self.max_range_days} days.'})
+        return Response(get_stats(request.user, start, end))
+
+class AvailabilityViewSet(viewsets.ViewSet):
+    """
+    Free slots of one verified doctor, read from the per-day occupancy bitmaps.
+    ?from=YYYY-MM-DD&to=YYYY-MM-DD, defaults to the next 7 days.
+    """
+    permission_classes = [permissions.AllowAny]
+    max_range_days = 92
+
+    def retrieve(self, request, pk=None):
+        doctor = get_object_or_404(User, pk=pk, role='doctor', is_verified=True)
+        today = timezone.localdate()
+        try:
+            start = parse_date(request.query_params.get('from', '')) or today
+            end = parse_date(request.query_params.get('to', '')) or start + timedelta(days=6)
+        except ValueError:
+            raise ValidationError({'detail': 'Dates must be valid YYYY-MM-DD values.'})
+        if start > end or (end - start).days >= self.max_range_days:
+            raise ValidationError({'detail': f'Range must be ascending and at most {self.max_range_days} days.'})
+        return Response({
+            'doctor': doctor.id,
+            'slot_minutes': doctor.slot_minutes,
+            'days': free_slots(doctor, start, end),
+        })
+
+class AppointmentViewSet(ReplicaReadsMixin, IdempotentCreateMixin, viewsets.ModelViewSet):
     serializer_class = AppointmentSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = AppointmentKeysetPagination
+    # Not 'changes': its cursor must not skip entries a lagging replica lacks
+    replica_actions = ('list', 'retrieve', 'export')
+    booking_attempts = 5
+    max_bulk_items = 200
+    change_feed_limit = 500
 
-    def get_queryset(self):
+    def scope(self, queryset):
+        """Doctors see their own appointments, patients theirs, admins everything."""
         user = self.request.user
         if user.role == 'doctor':
-            return Appointment.objects.filter(doctor=user).order_by('-date')
+            return queryset.filter(doctor=user)
         elif user.role == 'patient':
-            return Appointment.objects.filter(patient=user).order_by('-date')
-        return Appointment.objects.all().order_by('-date')
+            return queryset.filter(patient=user)
+        return queryset
+
+    def is_summary(self):
+        return self.action in ('list', 'retrieve', 'changes') and self.request.query_params.get('view') == 'summary'
+
+    def get_serializer_class(self):
+        return AppointmentSummarySerializer if self.is_summary() else AppointmentSerializer
+
+    def related_fields(self):
+        # Related rows the response embeds: patient, doctor and (when serialized)
+        # their profiles. Relations the response won't use (?fields=,
+        # ?view=summary) are left out.
+        fields, expand = query_list(self.request, 'fields'), query_list(self.request, 'expand')
+        related = []
+        for person in ('patient', 'doctor'):
+            if fields and f'{person}_details' not in fields:
+                continue
+            related.append(person)
+            if not self.is_summary() or f'{person}_details' in expand:
+                related.append(f'{person}__profile')
+        return related
+
+    def get_queryset(self):
+        # Load the related rows in the same query so the nested UserSerializers
+        # don't fire extra queries per row.
+        queryset = Appointment.objects.select_related(*self.related_fields())
+        return self.scope(queryset).order_by('-date')
+
+    def list(self, request, *args, **kwargs):
+        # The validators cover every row the list embeds, so editing a doctor's
+        # or patient's profile also changes the ETag.
+        fields = ['updated_at'] + [f'{name}__updated_at' for name in self.related_fields()]
+        validators = Validators.for_queryset(
+            self.scope(Appointment.objects.all()), fields, key=representation_key(request)
+        )
+        build = super().list
+        return conditional_response(request, validators, lambda: build(request, *args, **kwargs))
+
+    def run_in_transaction(self, func):
+        """Run func() in one transaction, retrying on deadlock / lock wait timeout."""
+        for attempt in range(1, self.booking_attempts + 1):
+            try:
+                with transaction.atomic():
+                    return func()
+            except OperationalError:
+                # SQLite reports these as "database is locked"; the transaction was
+                # rolled back, so just try again.
+                if attempt == self.booking_attempts:
+                    raise
+                time.sleep(random.uniform(0, 0.01 * 2 ** attempt))
+
+    def claim_and_save(self, serializer, **kwargs):
+        instance = serializer.instance
+        data = serializer.validated_data
+        doctor = data.get('doctor') or instance.doctor
+        day = data.get('date') or instance.date
+        start = data.get('time') or instance.time
+        holds_slot = Appointment.slot_marker(data.get('status') or getattr(instance, 'status', 'pending'))
+        previous = getattr(instance, '_stored_slot', None)
+
+        # Claiming a slot takes the doctor-day row lock, so concurrent bookings of
+        # that day queue up here. Status-only updates skip the lock entirely.
+        if holds_slot and previous != (doctor.pk, day, start):
+            claim_slot(doctor, day, start, replacing=previous)
+        serializer.save(**kwargs)
+
+    def save_booking(self, serializer, **kwargs):
+        try:
+            self.run_in_transaction(lambda: self.claim_and_save(serializer, **kwargs))
+        except (SlotUnavailable, IntegrityError):
+            # IntegrityError: 'unique_active_doctor_slot' backstop
+            raise ValidationError({'time': [SLOT_TAKEN]})
 
     def perform_create(self, serializer):
-        serializer.save(patient=self.request.user)
\ No newline at end of file
+        self.save_booking(serializer, patient=self.request.user)
+
+    def perform_update(self, serializer):
+        self.save_booking(serializer)
+
+    # --- Bulk operations: one request and one transaction for a whole batch ---
+
+    @action(detail=False, methods=['post'], url_path='bulk-create')
+    def bulk_create(self, request):
+        """{"appointments": [{doctor, date, time, notes, ...}, ...]} -> per-item results."""
+        items = request.data.get('appointments') if isinstance(request.data, dict) else None
+        if not isinstance(items, list) or not 0 < len(items) <= self.max_bulk_items:
+            raise ValidationError({'appointments': [f'Send a list of 1 to {self.max_bulk_items} appointments.']})
+
+        def create_all():
+            # Fresh serializers per attempt: a retried transaction must not see saved instances.
+            serializers = [self.get_serializer(data=item) for item in items]
+            valid = [serializer.is_valid() for serializer in serializers]
+            # Lock every doctor-day up front in a fixed order so concurrent batches can't deadlock.
+            days = {(s.validated_data['doctor'], s.validated_data['date']) for s, ok in zip(serializers, valid) if ok}
+            for doctor, day in sorted(days, key=lambda key: (key[0].pk, key[1])):
+                lock_day(doctor, day)
+
+            results = []
+            for index, (serializer, ok) in enumerate(zip(serializers, valid)):
+                if not ok:
+                    results.append({'index': index, 'ok': False, 'errors': serializer.errors})
+                    continue
+                try:
+                    with transaction.atomic():  # savepoint: a taken slot doesn't undo the others
+                        self.claim_and_save(serializer, patient=request.user)
+                except (SlotUnavailable, IntegrityError):
+                    results.append({'index': index, 'ok': False, 'errors': {'time': [SLOT_TAKEN]}})
+                else:
+                    results.append({'index': index, 'ok': True, 'data': serializer.data})
+            return results
+
+        return Response({'results': self.run_in_transaction(create_all)})
+
+    @action(detail=False, methods=['post'], url_path='bulk-status')
+    def bulk_status(self, request):
+        """{"ids": [...], "status": "confirmed" | "cancelled" | "completed"} in one UPDATE."""
+        params = BulkStatusSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        ids, new_status = params.validated_data['ids'], params.validated_data['status']
+        allowed_from = Appointment.STATUS_TRANSITIONS[new_status]
+
+        def transition():
+            current = dict(
+                self.scope(Appointment.objects.filter(id__in=ids)).select_for_update().values_list('id', 'status')
+            )
+            changed = [pk for pk in ids if current.get(pk) in allowed_from]
+            changes = {'status': new_status, 'holds_slot': Appointment.slot_marker(new_status),
+                       'updated_at': timezone.now()}
+            if new_status not in Appointment.REMINDED_STATUSES:
+                changes['remind_at'] = None  # what save() would do: nothing left to remind of
+            Appointment.objects.filter(id__in=changed).update(**changes)
+            record_updates(changed)  # update() skips the change-feed and push signals too
+            rows = Appointment.objects.filter(id__in=changed).values_list('id', 'patient_id', 'doctor_id', 'date', 'time')
+            for row in rows:
+                publish_on_commit(STATUS_CHANGED, appointment_payload(*row, new_status), previous_status=current[row[0]])
+            if Appointment.slot_marker(new_status) is None:
+                # update() skips the signals that maintain the occupancy bitmaps
+                days = set(Appointment.objects.filter(id__in=changed).values_list('doctor_id', 'date'))
+                doctors = User.objects.in_bulk({doctor_id for doctor_id, _ in days})
+                for doctor_id, day in days:
+                    rebuild_day(doctors[doctor_id], day)
+            return current, set(changed)
+
+        current, changed = self.run_in_transaction(transition)
+        if changed:
+            invalidate_stats()
+
+        results = []
+        for pk in ids:
+            if pk in changed:
+                results.append({'id': pk, 'ok': True, 'status': new_status})
+            elif pk in current:
+                results.append({'id': pk, 'ok': False,
+                                'error': f'Cannot change a {current[pk]} appointment to {new_status}.'})
+            else:
+                results.append({'id': pk, 'ok': False, 'error': 'Not found.'})
+        return Response({'results': results})
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """
+        ?since=<cursor>: appointments created, updated or deleted after the cursor,
+        with the cursor to send next time. Without ?since, just the current cursor.
+        """
+        log = self.scope(AppointmentChange.objects.all())
+        if 'since' not in request.query_params:
+            return Response({'cursor': latest_cursor(log), 'changes': [], 'has_more': False})
+        try:
+            since = int(request.query_params['since'])
+        except ValueError:
+            since = -1
+        if since < 0:
+            raise ValidationError({'since': ['Cursor must be a non-negative integer.']})
+
+        actions, cursor, has_more = read_changes(log, since, self.change_feed_limit)
+        upserts = [pk for pk, kind in actions.items() if kind == AppointmentChange.UPSERT]
+        # Current state of each changed row, scoped like the list; one that is gone
+        # (or no longer visible to this user) is reported as deleted.
+        rows = self.get_queryset().in_bulk(upserts)
+        data = dict(zip(rows, self.get_serializer(list(rows.values()), many=True).data))
+        changes = [
+            {'id': pk, 'action': AppointmentChange.UPSERT, 'appointment': data[pk]} if pk in data
+            else {'id': pk, 'action': AppointmentChange.DELETE}
+            for pk in actions
+        ]
+        return Response({'cursor': cursor, 'changes': changes, 'has_more': has_more})
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        ?type=csv|ndjson&from=YYYY-MM-DD&to=YYYY-MM-DD&doctor=<id>: every visible
+        appointment in range as a streamed file, flat rows in date/time order.
+        """
+        kind = request.query_params.get('type', 'csv')
+        if kind not in CONTENT_TYPES:
+            raise ValidationError({'type': [f'Choose one of: {", ".join(CONTENT_TYPES)}.']})
+        try:
+            start, end = (optional_date(request.query_params.get(name)) for name in ('from', 'to'))
+            doctor = int(request.query_params.get('doctor') or 0)
+        except ValueError:
+            raise ValidationError({'detail': 'Dates must be YYYY-MM-DD and doctor an id.'})
+        # Bound to the database chosen now: routing state ends before the body streams
+        queryset = self.scope(Appointment.objects.using(router.db_for_read(Appointment)))
+        queryset = filter_appointments(queryset, start, end, doctor)
+        response = StreamingHttpResponse(encode(rows(queryset), kind), content_type=CONTENT_TYPES[kind])
+        filename = f"appointments-{start or 'start'}-{end or 'end'}.{kind}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    @action(detail=False, methods=['post'], url_path='bulk-delete')
+    def bulk_delete(self, request):
+        """{"ids": [...]} deleted with one DELETE ... WHERE id IN."""
+        params = BulkIdsSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        ids = params.validated_data['ids']
+
+        def delete():
+            found = self.scope(Appointment.objects.filter(id__in=ids))
+            with batched_rebuilds():
+                deleted = {appointment.pk for appointment in found}
+                Appointment.objects.filter(id__in=deleted).delete()
+            return deleted
+
+        deleted = self.run_in_transaction(delete)
+        return Response({'results': [
+            {'id': pk, 'ok': True} if pk in deleted else {'id': pk, 'ok': False, 'error': 'Not found.'}
+            for pk in ids
+        ]})
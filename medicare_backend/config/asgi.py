@@ -13,4 +13,10 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up. /api/events/ (Server-Sent Events) is served
+# outside Django's handler; see api/push.py.
+from api.push import with_event_stream  # noqa: E402
+
+application = with_event_stream(django_application)
@@ -0,0 +1,19 @@
+"""
+DJANGO_ENV picks the profile layered over base.py: dev (the default), test or
+prod. `manage.py test` defaults it to test. A profile can also be named
+directly, e.g. DJANGO_SETTINGS_MODULE=config.settings.prod.
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+DJANGO_ENV = os.environ.get('DJANGO_ENV', 'dev')
+
+if DJANGO_ENV == 'prod':
+    from .prod import *  # noqa: F401,F403
+elif DJANGO_ENV == 'test':
+    from .test import *  # noqa: F401,F403
+elif DJANGO_ENV == 'dev':
+    from .dev import *  # noqa: F401,F403
+else:
+    raise ImproperlyConfigured(f"DJANGO_ENV must be dev, test or prod, not {DJANGO_ENV!r}")
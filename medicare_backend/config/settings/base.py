@@ -0,0 +1,308 @@
+"""
+Settings shared by every profile. config/settings/__init__.py layers dev.py,
+test.py or prod.py on top, chosen by DJANGO_ENV; anything deployment-specific
+is read from the environment here or there.
+"""
+import os
+from pathlib import Path
+from datetime import timedelta
+
+
+def env_bool(name, default=False):
+    value = os.environ.get(name)
+    return default if value is None else value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def env_list(name, default=()):
+    value = os.environ.get(name)
+    return list(default) if value is None else [item.strip() for item in value.split(',') if item.strip()]
+
+
+# Build paths
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+
+# Security
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', 'medicare-secret-key-1234567890-change-in-production')
+# Off unless a profile or DJANGO_DEBUG turns it on: with DEBUG every SQL query
+# a request runs is kept in memory
+DEBUG = env_bool('DJANGO_DEBUG')
+ALLOWED_HOSTS = env_list('DJANGO_ALLOWED_HOSTS', ['localhost', '127.0.0.1'])
+
+# Applications
+INSTALLED_APPS = [
+    'django.contrib.admin',
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    
+    # Third-party apps
+    'rest_framework',
+    'corsheaders',
+    'rest_framework_simplejwt',
+    
+    # Local apps
+    'api',
+    'accounts',
+]
+
+# Middleware
+MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
+    'corsheaders.middleware.CorsMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'api.middleware.CompressionMiddleware',
+    'api.middleware.ReplicaRoutingMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+# URLs
+ROOT_URLCONF = 'config.urls'
+WSGI_APPLICATION = 'config.wsgi.application'
+
+# Templates (REQUIRED for admin)
+TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': [],
+        'APP_DIRS': True,
+        'OPTIONS': {
+            'context_processors': [
+                'django.template.context_processors.debug',
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+            ],
+        },
+    },
+]
+
+# Database - MySQL
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.mysql',
+        'NAME': os.environ.get('DB_NAME', 'medicare_db'),
+        'USER': os.environ.get('DB_USER', 'root'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', 'sql@123'),  # Your MySQL password
+        'HOST': os.environ.get('DB_HOST', 'localhost'),
+        'PORT': os.environ.get('DB_PORT', '3306'),
+        'OPTIONS': {
+            'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
+            'charset': 'utf8mb4',
+        },
+        # Keep connections open between requests (Django's connection reuse; it
+        # has no pool for MySQL) and check them before reuse
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+    }
+}
+
+# Read replicas: DATABASE_REPLICA_HOSTS=replica-1,replica-2 adds aliases
+# 'replica1', 'replica2' with the primary's credentials. api/routers.py sends
+# opted-in GET reads there and keeps users who just wrote on the primary.
+for number, host in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_HOSTS', '').split(',')), start=1):
+    DATABASES[f'replica{number}'] = {**DATABASES['default'], 'HOST': host.strip(), 'TEST': {'MIRROR': 'default'}}
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['api.routers.ReplicaRouter']
+# Longer than the worst replication lag you expect
+REPLICA_PIN_SECONDS = 5
+# How long an unreachable replica is skipped
+REPLICA_RETRY_SECONDS = 30
+
+# CORS (Allow frontend connections)
+CORS_ALLOW_ALL_ORIGINS = True
+CORS_ALLOW_CREDENTIALS = True
+
+# REST Framework
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': (
+        # JWTAuthentication that builds read-only users from token claims
+        'accounts.authentication.ClaimsJWTAuthentication',
+    ),
+    'DEFAULT_PERMISSION_CLASSES': [
+        'rest_framework.permissions.AllowAny',
+    ],
+    # orjson when installed, stdlib json otherwise
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    # Proxies in front of the app: client IPs (login throttling) are read from
+    # X-Forwarded-For only that many hops deep. 0 trusts REMOTE_ADDR alone;
+    # without this setting DRF would take whatever X-Forwarded-For a client sends.
+    'NUM_PROXIES': int(os.environ.get('DJANGO_NUM_PROXIES', 0)),
+}
+
+# Response compression (api.middleware.CompressionMiddleware): Brotli if the
+# 'brotli' package is installed and accepted, gzip otherwise
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_BROTLI_QUALITY = 5
+
+# Request metrics (api/metrics.py): per-view histograms at /metrics, which
+# METRICS_TOKEN (if set; prod requires it) guards as "Authorization: Bearer
+# <token>"; a Server-Timing header on every response; and a warning with the
+# costliest SLOW_REQUEST_SQL_LIMIT statements for requests slower than
+# SLOW_REQUEST_SECONDS
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN') or None
+SERVER_TIMING_HEADER = True
+SLOW_REQUEST_SECONDS = float(os.environ.get('SLOW_REQUEST_SECONDS', 1))
+SLOW_REQUEST_SQL_LIMIT = 5
+
+# JWT Authentication
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
+    'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
+    'AUTH_HEADER_TYPES': ('Bearer',),
+}
+
+# Full User rows for authenticated writes are kept per process this many
+# seconds (accounts.authentication.UserCache)
+AUTH_USER_CACHE_TTL = 30
+AUTH_USER_CACHE_SIZE = 10_000
+
+# Cache: per process here; prod.py picks a shared backend from the environment
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'medicare',
+    }
+}
+
+# Doctor directory (/api/users/doctors/) read-through cache; dropped whenever a
+# doctor row changes
+DOCTOR_DIRECTORY_CACHE = 'default'
+DOCTOR_DIRECTORY_CACHE_TIMEOUT = 300
+
+# Doctor search index (accounts/search.py): DatabaseIndex tables, or
+# MemoryIndex (per process, rebuilt on first search) for SQLite test runs
+DOCTOR_SEARCH_BACKEND = 'accounts.search.DatabaseIndex'
+
+# Dashboard stats (/api/stats/) are cached this many seconds and dropped on any
+# appointment or user write
+STATS_CACHE_TIMEOUT = 60
+
+# Stored responses for POST /api/appointments/ retries sent with an Idempotency-Key
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+
+# Appointment change feed (api/changes.py): entries younger than SETTLE are held
+# back until concurrent transactions have committed; prune_appointment_changes
+# deletes entries older than RETENTION (clients with older cursors get 410)
+CHANGE_FEED_SETTLE = timedelta(seconds=2)
+CHANGE_FEED_RETENTION = timedelta(days=30)
+
+# Pub/sub behind the /api/events/ stream (api/events.py). With several ASGI
+# workers on one host use 'api.events.UnixSocketBackend' with
+# 'OPTIONS': {'path': '/tmp/medicare-events'} so every worker sees every event
+EVENT_BROKER = {
+    'BACKEND': 'api.events.InMemoryBackend',
+}
+
+# Background jobs (api/jobs.py, run by `manage.py run_jobs`): attempts before a
+# job is left failed, the retry backoff (doubling, capped), how long a job may
+# run before it is presumed lost with its worker, and how long succeeded jobs
+# are kept
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_BACKOFF = timedelta(seconds=10)
+JOB_RETRY_BACKOFF_MAX = timedelta(hours=1)
+JOB_LEASE = timedelta(minutes=10)
+JOB_RETENTION = timedelta(days=7)
+# Periodic tasks: dotted @task path -> interval, run once per interval across all workers
+JOB_SCHEDULE = {
+    'api.tasks.prune_appointment_changes': timedelta(days=1),
+    'api.tasks.send_due_reminders': timedelta(minutes=1),
+}
+# JOBS_RUN_EAGERLY=1 runs each job in the web process right after its
+# transaction commits, for local development without a worker
+JOBS_RUN_EAGERLY = env_bool('JOBS_RUN_EAGERLY')
+
+# Appointment reminders (api/reminders.py), sent REMINDER_LEAD before each
+# pending or confirmed appointment by the scheduled send_due_reminders task.
+# A claimed batch whose worker dies comes due again after REMINDER_LEASE.
+# REMINDER_NOTIFIER delivers them: 'api.reminders.EmailNotifier', or
+# 'api.reminders.LogNotifier' to only log them
+REMINDER_LEAD = timedelta(hours=int(os.environ.get('REMINDER_LEAD_HOURS', 24)))
+REMINDER_LEASE = timedelta(minutes=5)
+REMINDER_NOTIFIER = {
+    'BACKEND': 'api.reminders.EmailNotifier',
+}
+
+# Outgoing mail (booking confirmations and reminders, sent by the job worker):
+# printed to the worker's console unless EMAIL_HOST is set
+if os.environ.get('EMAIL_HOST'):
+    EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+    EMAIL_HOST = os.environ['EMAIL_HOST']
+    EMAIL_PORT = int(os.environ.get('EMAIL_PORT', 587))
+    EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', '')
+    EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', '')
+    EMAIL_USE_TLS = env_bool('EMAIL_USE_TLS', True)
+else:
+    EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'MediCare <no-reply@medicare.com>')
+
+# Custom User Model
+AUTH_USER_MODEL = 'accounts.User'
+
+# Password validation
+# Username or email login in one indexed query
+AUTHENTICATION_BACKENDS = ['accounts.backends.EmailOrUsernameBackend']
+
+# PASSWORD_HASHER_PROFILE=fast swaps PBKDF2 for a cheap hasher so tests and
+# benchmarks can create/log in thousands of users. Never use it in production:
+# hashes made with it are trivially reversible, and PBKDF2 hashes can't be checked.
+PASSWORD_HASHER_PROFILE = os.environ.get('PASSWORD_HASHER_PROFILE', 'default')
+if PASSWORD_HASHER_PROFILE == 'fast':
+    PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+# Login attempts per client IP, and failed logins per username/email: bursts of
+# 'capacity', refilled at 'rate' per second (in-memory, per process; None disables).
+# DISABLE_LOGIN_RATE_LIMIT=1 is for load tests, which log in from one address.
+LOGIN_RATE_LIMIT = None if env_bool('DISABLE_LOGIN_RATE_LIMIT') else {'capacity': 10, 'rate': 10 / 60}
+
+AUTH_PASSWORD_VALIDATORS = [
+    # ...
+    {
+        'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
+        'OPTIONS': {
+            'min_length': 8, # Change this number to whatever you want
+        }
+    },
+    # ...
+]
+
+# Internationalization
+LANGUAGE_CODE = 'en-us'
+TIME_ZONE = 'UTC'
+USE_I18N = True
+USE_TZ = True
+
+# Static files
+STATIC_URL = 'static/'
+STATIC_ROOT = os.environ.get('DJANGO_STATIC_ROOT', BASE_DIR / 'staticfiles')
+
+# Logging: everything to stderr, where the process manager collects it
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'plain': {'format': '%(asctime)s %(levelname)s %(name)s %(message)s'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'plain'},
+    },
+    'root': {'handlers': ['console'], 'level': os.environ.get('DJANGO_LOG_LEVEL', 'INFO')},
+    'loggers': {
+        # Replaces Django's default, which logs to the console only with DEBUG
+        'django': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+        # DEBUG here logs every SQL statement
+        'django.db.backends': {'level': 'INFO'},
+    },
+}
+
+# Default primary key field
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
\ No newline at end of file
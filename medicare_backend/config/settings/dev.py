@@ -0,0 +1,7 @@
+"""
+Local development: DEBUG on (DJANGO_DEBUG=false turns it off) and the local
+MySQL from base.py.
+"""
+from .base import *  # noqa: F401,F403
+
+DEBUG = env_bool('DJANGO_DEBUG', True)  # noqa: F405
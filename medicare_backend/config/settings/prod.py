@@ -0,0 +1,125 @@
+"""
+Production: DEBUG off, secrets and hosts from the environment, and the
+settings that matter for throughput: cached templates, long-lived database
+connections, a cache shared by every worker and no browsable API.
+
+Required: DJANGO_SECRET_KEY, DJANGO_ALLOWED_HOSTS (comma separated),
+METRICS_TOKEN.
+Optional: DB_* (see base.py), DB_CONN_MAX_AGE, REDIS_URL or
+MEMCACHED_LOCATION, DJANGO_CACHE_DIR, DJANGO_CORS_ALLOWED_ORIGINS,
+DJANGO_SECURE_SSL_REDIRECT, DJANGO_LOG_LEVEL, DJANGO_STATIC_ROOT,
+DJANGO_NUM_PROXIES.
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .base import *  # noqa: F401,F403
+
+
+def required(name):
+    value = os.environ.get(name, '').strip()
+    if not value:
+        raise ImproperlyConfigured(f"Set the {name} environment variable for DJANGO_ENV=prod")
+    return value
+
+
+DEBUG = False
+SECRET_KEY = required('DJANGO_SECRET_KEY')
+ALLOWED_HOSTS = env_list('DJANGO_ALLOWED_HOSTS') or [required('DJANGO_ALLOWED_HOSTS')]  # noqa: F405
+# /metrics names every view and its latencies: never public here
+METRICS_TOKEN = required('METRICS_TOKEN')
+
+# Metrics outermost, so request times include all the rest. Then security:
+# plain-HTTP redirects and HSTS cost nothing else. CORS ahead of anything that
+# can answer on its own (CommonMiddleware's redirects), and compression ahead
+# of the rest so every body it lets through is compressed.
+MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'corsheaders.middleware.CorsMiddleware',
+    'api.middleware.CompressionMiddleware',
+    'api.middleware.ReplicaRoutingMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+# Behind a proxy that terminates TLS and sets X-Forwarded-Proto
+SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
+SECURE_SSL_REDIRECT = env_bool('DJANGO_SECURE_SSL_REDIRECT', True)  # noqa: F405
+SESSION_COOKIE_SECURE = True
+CSRF_COOKIE_SECURE = True
+
+# Unset keeps the frontend's any-origin access; a list restricts it
+CORS_ALLOWED_ORIGINS = env_list('DJANGO_CORS_ALLOWED_ORIGINS')  # noqa: F405
+CORS_ALLOW_ALL_ORIGINS = not CORS_ALLOWED_ORIGINS
+
+# Templates parsed once per process. Django caches by default when no loaders
+# are given; spelled out so adding a loader later can't silently drop it.
+TEMPLATES = [{
+    **TEMPLATES[0],  # noqa: F405
+    'APP_DIRS': False,
+    'OPTIONS': {
+        **TEMPLATES[0]['OPTIONS'],  # noqa: F405
+        'context_processors': [
+            processor for processor in TEMPLATES[0]['OPTIONS']['context_processors']  # noqa: F405
+            if processor != 'django.template.context_processors.debug'
+        ],
+        'loaders': [
+            ('django.template.loaders.cached.Loader', [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ]),
+        ],
+    },
+}]
+
+# Connections outlive many requests (gunicorn's sync workers run one request
+# at a time, so this is one connection per worker and alias)
+for database in DATABASES.values():  # noqa: F405
+    database['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', 600))
+
+# Replica pins, the doctor directory and stats cache versions only hold across
+# workers in a shared cache. Redis or Memcached when configured; otherwise
+# files, which at least every worker on one host shares.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+            'KEY_PREFIX': 'medicare',
+        }
+    }
+elif os.environ.get('MEMCACHED_LOCATION'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': env_list('MEMCACHED_LOCATION'),  # noqa: F405
+            'KEY_PREFIX': 'medicare',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('DJANGO_CACHE_DIR', '/var/tmp/medicare-cache'),
+        }
+    }
+
+# JSON only: the browsable API renders forms that run extra queries. Behind
+# the one proxy SECURE_PROXY_SSL_HEADER assumes, unless DJANGO_NUM_PROXIES says otherwise.
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,  # noqa: F405
+    'DEFAULT_RENDERER_CLASSES': ['api.renderers.FastJSONRenderer'],
+    'NUM_PROXIES': int(os.environ.get('DJANGO_NUM_PROXIES', 1)),
+}
+
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    # Hashed file names, so static files can be cached by browsers indefinitely
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.ManifestStaticFilesStorage'},
+}
@@ -0,0 +1,31 @@
+"""
+Primary and replica stand-ins on two local SQLite files, to exercise the
+replica router (api/routers.py) without MySQL:
+
+    DJANGO_SETTINGS_MODULE=config.settings.replica_test python manage.py test
+
+Nothing replicates between the files; ReplicaRoutingTests writes to each one
+directly to see which a request read.
+"""
+import tempfile
+from pathlib import Path
+
+from .test import *  # noqa: F401,F403
+
+DATA_DIR = Path(tempfile.gettempdir())
+
+
+def sqlite(name):
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': DATA_DIR / f'medicare_{name}.sqlite3',
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
+        'TEST': {'NAME': DATA_DIR / f'test_medicare_{name}.sqlite3'},
+    }
+
+
+DATABASES = {'default': sqlite('primary'), 'replica': sqlite('replica')}
+# Off for the rest of the suite, whose rows exist on the primary only;
+# ReplicaRoutingTests turns it on.
+DATABASE_REPLICAS = []
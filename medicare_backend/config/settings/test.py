@@ -0,0 +1,28 @@
+"""
+Test runs: SQLite, so `python manage.py test` needs no MySQL server, and a
+cheap password hasher. MySQL-only tests skip themselves; run them with
+DJANGO_ENV=dev python manage.py test.
+"""
+import tempfile
+from pathlib import Path
+
+from .base import *  # noqa: F401,F403
+
+DEBUG = False
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': Path(tempfile.gettempdir()) / 'medicare_test.sqlite3',
+        'OPTIONS': {'timeout': 30},
+    }
+}
+DATABASE_REPLICAS = []
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+# Expected 4xx responses would otherwise log a warning each
+LOGGING['loggers']['django']['level'] = 'ERROR'  # noqa: F405
+
+# Workers in tests run only the jobs a test queues
+JOB_SCHEDULE = {}
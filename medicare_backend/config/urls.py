@@ -1,14 +1,19 @@
 from django.contrib import admin
 from django.urls import path, include
+from django.views.decorators.cache import never_cache
 from rest_framework_simplejwt.views import TokenRefreshView
 from accounts.views import CustomTokenObtainPairView
+from api.metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+
+    # Prometheus scrape endpoint (api/metrics.py)
+    path('metrics', metrics_view),
     
     # Login & Auth
     path('api/auth/login/', CustomTokenObtainPairView.as_view()),
-    path('api/auth/refresh/', TokenRefreshView.as_view()),
+    path('api/auth/refresh/', never_cache(TokenRefreshView.as_view())),
     
     # Users & Doctors (Matches 'api/users/')
     path('api/', include('accounts.urls')), 